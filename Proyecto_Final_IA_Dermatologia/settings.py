@@ -20,6 +20,39 @@ SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-x+hb#da2=lf87z
 
 # Configuración para Gemini AI
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+AI_TEXT_CACHE_TTL = int(os.getenv('AI_TEXT_CACHE_TTL', 60 * 60 * 24 * 30))  # Vigencia de los textos generados (30 días)
+AI_TEXT_CACHE_VARIANTS = int(os.getenv('AI_TEXT_CACHE_VARIANTS', 3))  # Variantes de texto guardadas por condición
+AI_TEXT_CACHE_LRU_SIZE = int(os.getenv('AI_TEXT_CACHE_LRU_SIZE', 64))  # Entradas de la caché LRU en memoria
+AI_TEXT_CACHE_LOCAL_TTL = int(os.getenv('AI_TEXT_CACHE_LOCAL_TTL', 300))  # Segundos que la LRU en memoria confía en la tabla
+AI_GEMINI_MODE = os.getenv('AI_GEMINI_MODE', 'split')  # 'split' (dos peticiones) o 'structured' (una petición JSON)
+AI_GEMINI_DEADLINE = float(os.getenv('AI_GEMINI_DEADLINE', 20))  # Plazo total en segundos para generar reporte y tratamiento
+AI_GEMINI_MAX_CONCURRENCY = int(os.getenv('AI_GEMINI_MAX_CONCURRENCY', 8))  # Llamadas simultáneas a Gemini por proceso
+AI_GEMINI_BREAKER_THRESHOLD = int(os.getenv('AI_GEMINI_BREAKER_THRESHOLD', 5))  # Fallos consecutivos que abren el circuito
+AI_GEMINI_BREAKER_COOLDOWN = float(os.getenv('AI_GEMINI_BREAKER_COOLDOWN', 60))  # Segundos antes de volver a probar Gemini
+
+# Configuración de la transmisión de resultados por SSE
+AI_STREAM_FLUSH_INTERVAL = float(os.getenv('AI_STREAM_FLUSH_INTERVAL', 0.3))  # Segundos entre guardados del texto parcial de Gemini
+AI_STREAM_POLL_INTERVAL = float(os.getenv('AI_STREAM_POLL_INTERVAL', 0.5))  # Segundos entre consultas del endpoint SSE
+AI_STREAM_TIMEOUT = int(os.getenv('AI_STREAM_TIMEOUT', 300))  # Duración máxima de una conexión SSE
+
+# Configuración del motor de inferencia (micro-batching)
+AI_BATCH_MAX_SIZE = int(os.getenv('AI_BATCH_MAX_SIZE', 8))  # Máximo de imágenes por pasada del modelo
+AI_BATCH_MAX_WAIT_MS = float(os.getenv('AI_BATCH_MAX_WAIT_MS', 10))  # Espera máxima para completar un lote
+AI_BATCH_UPLOAD_MAX_IMAGES = int(os.getenv('AI_BATCH_UPLOAD_MAX_IMAGES', 20))  # Imágenes por subida múltiple (y por pasada del lote)
+AI_OVERLAY_MAX_SIDE = int(os.getenv('AI_OVERLAY_MAX_SIDE', 1024))  # Lado máximo de la imagen base del Grad-CAM (0 = sin límite)
+
+# Configuración del renderizado diferido del Grad-CAM
+AI_GRADCAM_SIZES = (256, 512, 1024)  # Tamaños (lado mayor) en los que se renderiza la superposición
+AI_GRADCAM_DEFAULT_SIZE = int(os.getenv('AI_GRADCAM_DEFAULT_SIZE', 512))  # Tamaño de la página de resultados
+AI_THUMBNAIL_WIDTHS = (256, 512)  # Anchos de las miniaturas (WebP y JPEG) de las imágenes subidas
+AI_GRADCAM_CACHE_MAX_BYTES = int(os.getenv('AI_GRADCAM_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # Límite de la caché en disco
+
+# Configuración de la cola de análisis en segundo plano
+AI_ANALYSIS_WORKERS = int(os.getenv('AI_ANALYSIS_WORKERS', 4))  # Hilos del comando run_analysis_workers
+AI_ANALYSIS_POLL_INTERVAL = float(os.getenv('AI_ANALYSIS_POLL_INTERVAL', 1.0))  # Segundos entre consultas a la cola
+AI_ANALYSIS_MAX_ATTEMPTS = int(os.getenv('AI_ANALYSIS_MAX_ATTEMPTS', 3))  # Reintentos antes de marcar como fallido
+AI_ANALYSIS_JOB_TIMEOUT = int(os.getenv('AI_ANALYSIS_JOB_TIMEOUT', 600))  # Segundos para considerar abandonado un trabajo
+AI_ANALYSIS_RETRY_BACKOFF = int(os.getenv('AI_ANALYSIS_RETRY_BACKOFF', 30))  # Espera base (s) entre reintentos, se duplica en cada uno
 
 # Configuración de entorno
 DEBUG = True
@@ -35,6 +68,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'apps.Dermatologia_IA.apps.DermatologiaIaConfig',
     'apps.core.apps.CoreConfig',
     'apps.auth.apps.AuthConfig',
@@ -151,6 +185,11 @@ EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+REPORT_EMAIL_BATCH_SIZE = int(os.getenv('REPORT_EMAIL_BATCH_SIZE', 20))  # Emails enviados por conexión SMTP
+REPORT_EMAIL_MAX_ATTEMPTS = int(os.getenv('REPORT_EMAIL_MAX_ATTEMPTS', 5))  # Reintentos antes de marcar como fallido
+REPORT_EMAIL_RETRY_BACKOFF = int(os.getenv('REPORT_EMAIL_RETRY_BACKOFF', 60))  # Espera base (s) entre reintentos, se duplica en cada uno
+REPORT_EMAIL_POLL_INTERVAL = float(os.getenv('REPORT_EMAIL_POLL_INTERVAL', 5))  # Segundos entre consultas a la bandeja de salida
+REPORT_EMAIL_SEND_TIMEOUT = int(os.getenv('REPORT_EMAIL_SEND_TIMEOUT', 600))  # Segundos para considerar abandonado un envío
 
 # Archivos estáticos y media
 STATIC_URL = 'static/'
@@ -162,6 +201,14 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Caché de reportes PDF (fuera de MEDIA_ROOT: contienen datos del paciente)
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', str(BASE_DIR / 'cache' / 'reports'))
+REPORT_IMAGE_DPI = int(os.getenv('REPORT_IMAGE_DPI', 150))  # Resolución de las imágenes del PDF (0 = incrustar el original)
+REPORT_JPEG_QUALITY = int(os.getenv('REPORT_JPEG_QUALITY', 75))  # Calidad JPEG de las imágenes del PDF
+REPORT_IMAGE_GRAYSCALE = os.getenv('REPORT_IMAGE_GRAYSCALE', 'True') == 'True'  # Un canal para imágenes sin color
+REPORT_EXPORT_WORKERS = int(os.getenv('REPORT_EXPORT_WORKERS', 4))  # Hilos que generan los PDF de una exportación ZIP
+PATIENT_SEARCH_TRIGRAM_CHECK_TTL = int(os.getenv('PATIENT_SEARCH_TRIGRAM_CHECK_TTL', 300))  # Segundos entre comprobaciones de pg_trgm
+
 # Configuración de usuario personalizado y rutas de autenticación
 AUTH_USER_MODEL = 'AUTH.User'
 PASSWORD_RESET_URL = '/auth/password_reset/'
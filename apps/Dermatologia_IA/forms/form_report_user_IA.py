@@ -43,3 +43,13 @@ class SkinImageForm(forms.ModelForm):
       'sex': 'Selecciona el sexo del paciente.',
       'anatom_site_general': 'Selecciona la zona general donde se encuentra la lesión.',
     }
+
+
+class SkinImageBatchForm(forms.ModelForm):
+  """Datos del paciente compartidos por todas las imágenes de una subida múltiple"""
+
+  class Meta:
+    model = SkinImage
+    fields = ['first_name', 'last_name', 'dni', 'phone', 'email', 'age_approx', 'sex']
+    labels = {field: SkinImageForm.Meta.labels[field] for field in fields}
+    widgets = {field: SkinImageForm.Meta.widgets[field] for field in fields}
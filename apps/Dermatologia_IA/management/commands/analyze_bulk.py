@@ -0,0 +1,222 @@
+# core/Dermatologia_IA/management/commands/analyze_bulk.py
+import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+import numpy as np
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.aiComponents import ai_components, index_to_class
+from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+from apps.Dermatologia_IA.utils.gradcamRenderer import encode_heatmap
+from apps.Dermatologia_IA.utils.predictionCache import compute_content_hash
+from apps.core.utils.analytics import record_processed
+
+IMAGE_EXTENSIONS = ('', '.jpg', '.jpeg', '.png')
+PATIENT_DEFAULTS = {
+  'first_name': 'Importación',
+  'last_name': 'Masiva',
+  'dni': '',
+  'phone': '',
+  'email': '',
+}
+
+
+def _preprocess(image_path):
+  """Decodifica y preprocesa una imagen (función de módulo para poder usarse en un pool de procesos)"""
+  img_array, _ = AIProcessor.preprocess_image_for_model(image_path, model_only=True)
+  return img_array
+
+
+def make_pool(kind, workers):
+  """
+  Pool para el preprocesado. El de procesos arranca con 'spawn': el comando ya
+  cargó TensorFlow y hacer fork de un proceso con sus hilos y su estado no es
+  seguro. Cada worker parte de un intérprete limpio y solo configura Django.
+  """
+  if kind == 'process':
+    return ProcessPoolExecutor(
+      max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    )
+  return ThreadPoolExecutor(max_workers=workers)
+
+
+class Command(BaseCommand):
+  help = ("Analiza un directorio de imágenes con los metadatos de un CSV y guarda los resultados "
+          "como SkinImage. Es reanudable: las imágenes ya analizadas se omiten.")
+
+  def add_arguments(self, parser):
+    parser.add_argument('directory', help='Directorio con las imágenes.')
+    parser.add_argument('csv_path', help='CSV con una fila por imagen.')
+    parser.add_argument('--image-column', default='image',
+                        help='Columna del CSV con el nombre del archivo (la extensión es opcional).')
+    parser.add_argument('--batch-size', type=int, default=32,
+                        help='Imágenes por pasada del modelo y por transacción.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Workers que decodifican y preprocesan las imágenes.')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                        help="Tipo de pool para el preprocesado (los procesos arrancan con 'spawn').")
+    parser.add_argument('--limit', type=int, default=None, help='Procesar como máximo N imágenes.')
+
+  def _resolve_image(self, directory, name):
+    for extension in IMAGE_EXTENSIONS:
+      path = os.path.join(directory, name + extension)
+      if os.path.isfile(path):
+        return path
+    return None
+
+  def _read_rows(self, options):
+    """Lee el CSV y descarta las imágenes inexistentes o ya analizadas"""
+    rows = []
+    with open(options['csv_path'], newline='', encoding='utf-8') as csv_file:
+      reader = csv.DictReader(csv_file)
+      if options['image_column'] not in (reader.fieldnames or []):
+        raise CommandError(f"El CSV no tiene la columna '{options['image_column']}'.")
+      for row in reader:
+        path = self._resolve_image(options['directory'], row[options['image_column']])
+        if path is None:
+          self.stdout.write(self.style.WARNING(f"Imagen no encontrada: {row[options['image_column']]}"))
+          continue
+        row['path'] = path
+        row['age_approx'] = self._parse_age(row.get('age_approx'))
+        row['sex'] = row.get('sex') or 'unknown'
+        row['anatom_site_general'] = row.get('anatom_site_general') or 'unknown'
+        with open(path, 'rb') as image_file:
+          row['content_hash'] = compute_content_hash(
+            image_file, row['age_approx'], row['sex'], row['anatom_site_general']
+          )
+        rows.append(row)
+
+    done = set(
+      SkinImage.objects
+      .filter(content_hash__in=[row['content_hash'] for row in rows], processed=True)
+      .values_list('content_hash', flat=True)
+    )
+    pending = [row for row in rows if row['content_hash'] not in done]
+    self.stdout.write(f"{len(rows)} imágenes en el CSV, {len(rows) - len(pending)} ya analizadas")
+    return pending[:options['limit']] if options['limit'] else pending
+
+  @staticmethod
+  def _parse_age(value):
+    try:
+      return min(max(int(float(value)), 0), 120)
+    except (TypeError, ValueError):
+      return 50
+
+  def _save_chunk(self, rows, preds, indices, heatmaps):
+    """
+    Guarda un lote con bulk_create en una sola transacción. Los textos de Gemini
+    se resuelven antes, una vez por condición del lote; si el lote no llega a
+    guardarse se borran las imágenes ya copiadas al almacenamiento.
+    """
+    conditions = [index_to_class.get(int(idx), 'Condición desconocida') for idx in indices]
+    texts = {condition: AIProcessor.generate_ai_content(condition) for condition in set(conditions)}
+    model_version = ai_components.model_version
+
+    saved_names = []
+    try:
+      skin_images = []
+      for row, pred, idx, heatmap, condition in zip(rows, preds, indices, heatmaps, conditions):
+        with open(row['path'], 'rb') as image_file:
+          image_name = default_storage.save(f"skin_images/{os.path.basename(row['path'])}", File(image_file))
+        saved_names.append(image_name)
+        ai_report, ai_treatment = texts[condition]
+        skin_images.append(SkinImage(
+          **{field: row.get(field) or default for field, default in PATIENT_DEFAULTS.items()},
+          image=image_name,
+          age_approx=row['age_approx'],
+          sex=row['sex'],
+          anatom_site_general=row['anatom_site_general'],
+          content_hash=row['content_hash'],
+          condition=condition,
+          confidence=float(pred[int(idx)] * 100),
+          model_version=model_version,
+          gradcam_heatmap=encode_heatmap(heatmap) if heatmap is not None else None,
+          ai_report=ai_report,
+          ai_treatment=ai_treatment,
+          processed=True,
+          status=SkinImage.STATUS_DONE,
+        ))
+
+      with transaction.atomic():
+        SkinImage.objects.bulk_create(skin_images)
+        record_processed(skin_images)
+    except Exception:
+      # Sin filas que las referencien, las copias quedarían huérfanas en MEDIA_ROOT
+      for image_name in saved_names:
+        default_storage.delete(image_name)
+      raise
+
+  def handle(self, *args, **options):
+    if not os.path.isdir(options['directory']):
+      raise CommandError(f"Directorio no encontrado: {options['directory']}")
+    if not ai_components.warm_up():
+      raise CommandError("Sistema de IA no disponible (modelo o preprocesador no encontrados).")
+
+    rows = self._read_rows(options)
+    if not rows:
+      self.stdout.write(self.style.SUCCESS("No hay imágenes pendientes."))
+      return
+
+    batch_size = max(1, options['batch_size'])
+    encoder = ai_components.metadata_encoder
+    model = ai_components.keras_model
+    processed = failed = 0
+    started = time.perf_counter()
+
+    with make_pool(options['pool'], options['workers']) as pool:
+      chunks = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+      # El preprocesado del siguiente lote avanza en el pool mientras se infiere el actual
+      pending = [pool.submit(_preprocess, row['path']) for row in chunks[0]] if chunks else []
+      for n, chunk in enumerate(chunks):
+        futures = pending
+        if n + 1 < len(chunks):
+          pending = [pool.submit(_preprocess, row['path']) for row in chunks[n + 1]]
+
+        chunk_rows, inputs = [], []
+        for row, future in zip(chunk, futures):
+          img_array = future.result()
+          if img_array is None:
+            failed += 1
+            self.stdout.write(self.style.WARNING(f"No se pudo preprocesar: {row['path']}"))
+            continue
+          chunk_rows.append(row)
+          inputs.append(img_array[0])
+        if not chunk_rows:
+          continue
+
+        metadata = [{
+          'age_approx': row['age_approx'],
+          'sex': row['sex'],
+          'anatom_site_general': row['anatom_site_general'],
+          'dataset': 'ISIC',
+        } for row in chunk_rows]
+        if encoder is not None:
+          meta = encoder.encode_rows(metadata)
+        else:
+          meta = np.vstack([
+            AIProcessor.preprocess_metadata_for_model(row, ai_components.metadata_preprocessor) for row in metadata
+          ])
+        preds, indices, heatmaps = AIProcessor.predict_with_gradcam(
+          np.stack(inputs), meta, model
+        )
+        self._save_chunk(chunk_rows, preds, indices, heatmaps)
+
+        processed += len(chunk_rows)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+          f"{processed}/{len(rows)} imágenes ({processed / elapsed:.1f} imágenes/s)"
+        )
+
+    elapsed = time.perf_counter() - started
+    self.stdout.write(self.style.SUCCESS(
+      f"Analizadas {processed} imágenes en {elapsed:.1f} s ({processed / elapsed:.1f} imágenes/s); "
+      f"fallidas: {failed}"
+    ))
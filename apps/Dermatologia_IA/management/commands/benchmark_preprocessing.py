@@ -0,0 +1,80 @@
+# core/Dermatologia_IA/management/commands/benchmark_preprocessing.py
+import os
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class Command(BaseCommand):
+  help = ("Compara el tiempo de decodificación y la memoria pico del preprocesado a resolución "
+          "completa frente a la decodificación reducida con imagen base limitada y a la de solo modelo.")
+
+  def add_arguments(self, parser):
+    parser.add_argument('paths', nargs='+', help='Imágenes o directorios con imágenes.')
+    parser.add_argument('--runs', type=int, default=3, help='Repeticiones por imagen.')
+    parser.add_argument('--overlay-max-side', type=int, default=settings.AI_OVERLAY_MAX_SIDE,
+                        help='Lado máximo de la imagen base en el modo reducido.')
+
+  def _collect_images(self, paths):
+    images = []
+    for path in paths:
+      if os.path.isdir(path):
+        images.extend(
+          os.path.join(path, name) for name in sorted(os.listdir(path))
+          if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+      elif os.path.isfile(path):
+        images.append(path)
+    if not images:
+      raise CommandError("No se encontraron imágenes para el benchmark.")
+    return images
+
+  def _measure(self, image_path, overlay_max_side, model_only, runs):
+    timings, peaks = [], []
+    for _ in range(runs):
+      tracemalloc.start()
+      start = time.perf_counter()
+      img_array, overlay_base = AIProcessor.preprocess_image_for_model(
+        image_path, overlay_max_side=overlay_max_side, model_only=model_only
+      )
+      timings.append(time.perf_counter() - start)
+      peaks.append(tracemalloc.get_traced_memory()[1])
+      tracemalloc.stop()
+      if img_array is None:
+        raise CommandError(f"No se pudo preprocesar: {image_path}")
+    base = f"{overlay_base.shape[1]}x{overlay_base.shape[0]}" if overlay_base is not None else '-'
+    return statistics.median(timings), max(peaks), base
+
+  def handle(self, *args, **options):
+    images = self._collect_images(options['paths'])
+    runs = options['runs']
+    modes = [
+      ('completa', 0, False),
+      ('reducida', options['overlay_max_side'], False),
+      ('solo modelo', None, True),
+    ]
+    AIProcessor.preprocess_image_for_model(images[0])  # Calentamiento de imports
+
+    totals = {label: ([], []) for label, _, _ in modes}
+    for image_path in images:
+      for label, overlay_max_side, model_only in modes:
+        seconds, peak, base = self._measure(image_path, overlay_max_side, model_only, runs)
+        totals[label][0].append(seconds)
+        totals[label][1].append(peak)
+        self.stdout.write(
+          f"{os.path.basename(image_path)} [{label}]: {seconds * 1000:.1f} ms, "
+          f"pico {peak / 2 ** 20:.1f} MiB, base {base}"
+        )
+
+    for label, (timings, peaks) in totals.items():
+      self.stdout.write(self.style.SUCCESS(
+        f"Decodificación {label}: mediana {statistics.median(timings) * 1000:.1f} ms, "
+        f"pico mediano {statistics.median(peaks) / 2 ** 20:.1f} MiB ({len(images)} imágenes)"
+      ))
@@ -0,0 +1,62 @@
+# core/Dermatologia_IA/management/commands/benchmark_reports.py
+import io
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.generateReport import build_report_pdf
+
+
+class Command(BaseCommand):
+  help = ("Mide el tamaño y el tiempo de generación de los reportes PDF incrustando las imágenes "
+          "originales frente a imágenes remuestreadas a la resolución de impresión.")
+
+  def add_arguments(self, parser):
+    parser.add_argument('--limit', type=int, default=20, help='Reportes más recientes a generar.')
+    parser.add_argument('--runs', type=int, default=3, help='Repeticiones por reporte.')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[settings.REPORT_IMAGE_DPI],
+                        help='Resoluciones a comparar con las imágenes originales.')
+    parser.add_argument('--quality', type=int, default=settings.REPORT_JPEG_QUALITY, help='Calidad JPEG.')
+    parser.add_argument('--no-grayscale', action='store_true',
+                        help='No guardar con un canal las imágenes sin color.')
+
+  def _measure(self, skin_image, runs, **image_options):
+    timings = []
+    for _ in range(runs):
+      output = io.BytesIO()
+      start = time.perf_counter()
+      build_report_pdf(skin_image, output, **image_options)
+      timings.append(time.perf_counter() - start)
+    return len(output.getvalue()), statistics.median(timings)
+
+  def handle(self, *args, **options):
+    reports = list(SkinImage.objects.filter(processed=True).order_by('-uploaded_at')[:options['limit']])
+    if not reports:
+      raise CommandError("No hay reportes procesados para medir.")
+
+    modes = [('original', {'dpi': 0})] + [
+      (f'{dpi} dpi', {'dpi': dpi, 'quality': options['quality'], 'grayscale': not options['no_grayscale']})
+      for dpi in options['dpi'] if dpi > 0
+    ]
+    # Calentamiento: fuentes de ReportLab y renderizado de los Grad-CAM en caché
+    for _, image_options in modes:
+      build_report_pdf(reports[0], io.BytesIO(), **image_options)
+
+    results = {label: ([], []) for label, _ in modes}
+    for si in reports:
+      line = []
+      for label, image_options in modes:
+        size, seconds = self._measure(si, options['runs'], **image_options)
+        results[label][0].append(size)
+        results[label][1].append(seconds)
+        line.append(f"{label} {size / 1024:.0f} KiB / {seconds * 1000:.0f} ms")
+      self.stdout.write(f"ID {si.id}: " + ", ".join(line))
+
+    for label, (sizes, timings) in results.items():
+      self.stdout.write(self.style.SUCCESS(
+        f"PDF {label}: tamaño mediano {statistics.median(sizes) / 1024:.0f} KiB, "
+        f"tiempo mediano {statistics.median(timings) * 1000:.0f} ms ({len(reports)} reportes)"
+      ))
@@ -0,0 +1,47 @@
+# core/Dermatologia_IA/management/commands/benchmark_startup.py
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Comprueba qué librerías de IA quedan importadas tras cargar las URLs del proyecto
+IMPORT_PROBE = (
+  "import os, sys, django;"
+  "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_Final_IA_Dermatologia.settings');"
+  "django.setup();"
+  "from django.urls import get_resolver; get_resolver().url_patterns;"
+  "print(','.join(m for m in ('tensorflow', 'pandas', 'cv2', 'joblib', 'google.generativeai') if m in sys.modules))"
+)
+
+
+class Command(BaseCommand):
+  help = "Mide el tiempo de arranque de 'manage.py check' y 'manage.py migrate --plan'."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--runs', type=int, default=5, help='Repeticiones por comando.')
+
+  def _time_command(self, args, runs):
+    timings = []
+    for _ in range(runs):
+      start = time.perf_counter()
+      subprocess.run([sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+      timings.append(time.perf_counter() - start)
+    return timings
+
+  def handle(self, *args, **options):
+    runs = options['runs']
+    for args in (['check'], ['migrate', '--plan']):
+      timings = self._time_command(args, runs)
+      self.stdout.write(
+        f"manage.py {' '.join(args)}: mediana {statistics.median(timings):.2f}s "
+        f"(mín {min(timings):.2f}s, máx {max(timings):.2f}s, {runs} ejecuciones)"
+      )
+
+    probe = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=settings.BASE_DIR,
+                           capture_output=True, text=True, check=False)
+    loaded = probe.stdout.strip() or 'ninguna'
+    self.stdout.write(f"Librerías de IA importadas al cargar las URLs: {loaded}")
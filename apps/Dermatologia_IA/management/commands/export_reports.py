@@ -0,0 +1,52 @@
+# core/Dermatologia_IA/management/commands/export_reports.py
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.Dermatologia_IA.utils.reportExport import filter_reports, stream_reports_zip
+
+
+class Command(BaseCommand):
+  help = "Exporta a un ZIP los reportes PDF de un paciente y/o de un rango de fechas."
+
+  def add_arguments(self, parser):
+    parser.add_argument('output', help='Ruta del archivo ZIP a crear.')
+    parser.add_argument('--dni', help='DNI del paciente.')
+    parser.add_argument('--from', dest='date_from', help='Fecha de subida inicial (AAAA-MM-DD).')
+    parser.add_argument('--to', dest='date_to', help='Fecha de subida final (AAAA-MM-DD).')
+    parser.add_argument('--workers', type=int, default=settings.REPORT_EXPORT_WORKERS,
+                        help='Hilos que generan los PDF que no están en caché.')
+
+  def _parse_date(self, value):
+    if not value:
+      return None
+    parsed = parse_date(value)
+    if parsed is None:
+      raise CommandError(f"Fecha no válida: {value} (use AAAA-MM-DD)")
+    return parsed
+
+  def handle(self, *args, **options):
+    queryset = filter_reports(
+      dni=options['dni'],
+      date_from=self._parse_date(options['date_from']),
+      date_to=self._parse_date(options['date_to']),
+    )
+    total = queryset.count()
+    if not total:
+      raise CommandError("No hay reportes procesados con esos filtros.")
+
+    started = time.perf_counter()
+    tmp_path = f"{options['output']}.tmp"
+    with open(tmp_path, 'wb') as output:
+      for chunk in stream_reports_zip(queryset.iterator(chunk_size=200), workers=options['workers']):
+        output.write(chunk)
+    os.replace(tmp_path, options['output'])
+
+    elapsed = time.perf_counter() - started
+    self.stdout.write(self.style.SUCCESS(
+      f"Exportados {total} reportes a {options['output']} "
+      f"({os.path.getsize(options['output']) / 2 ** 20:.1f} MiB, {elapsed:.1f} s)"
+    ))
@@ -0,0 +1,58 @@
+# core/Dermatologia_IA/management/commands/measure_page_weight.py
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.gradcamRenderer import legacy_overlay_path, render_overlay
+from apps.Dermatologia_IA.utils.thumbnails import ensure_thumbnail
+
+
+def _size(path):
+  return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+class Command(BaseCommand):
+  help = ("Mide el peso en imágenes de las páginas de reportes: originales y Grad-CAM a tamaño "
+          "completo frente a miniaturas WebP/JPEG en el ancho que usa la página. Las tarjetas del "
+          "listado y de inicio solo muestran la imagen, sin Grad-CAM.")
+
+  def add_arguments(self, parser):
+    parser.add_argument('--limit', type=int, default=20, help='Reportes más recientes a medir.')
+    parser.add_argument('--width', type=int, default=max(settings.AI_THUMBNAIL_WIDTHS),
+                        help='Ancho de miniatura que descargaría el navegador.')
+
+  def handle(self, *args, **options):
+    width = options['width']
+    if width not in settings.AI_THUMBNAIL_WIDTHS:
+      raise CommandError(f"El ancho debe ser uno de {settings.AI_THUMBNAIL_WIDTHS}")
+    reports = list(SkinImage.objects.filter(processed=True).order_by('-uploaded_at')[:options['limit']])
+    if not reports:
+      raise CommandError("No hay reportes procesados para medir.")
+
+    totals = {'original': 0, 'webp': 0, 'jpg': 0}
+    cards = {'original': 0, 'webp': 0, 'jpg': 0}
+    for si in reports:
+      gradcam_full = legacy_overlay_path(si) or render_overlay(si, max(settings.AI_GRADCAM_SIZES), 'jpg')
+      before = _size(si.image.path) + _size(gradcam_full)
+      after = {
+        fmt: _size(ensure_thumbnail(si, width, fmt)) + _size(render_overlay(si, width, fmt) or gradcam_full)
+        for fmt in ('webp', 'jpg')
+      }
+      totals['original'] += before
+      cards['original'] += _size(si.image.path)
+      for fmt, size in after.items():
+        totals[fmt] += size
+        cards[fmt] += _size(ensure_thumbnail(si, width, fmt))
+      self.stdout.write(
+        f"ID {si.id}: original {before / 1024:.0f} KiB, WebP {after['webp'] / 1024:.0f} KiB, "
+        f"JPEG {after['jpg'] / 1024:.0f} KiB"
+      )
+
+    for label, sums in (('reportes', totals), ('tarjetas', cards)):
+      self.stdout.write(self.style.SUCCESS(
+        f"{len(reports)} {label} — antes: {sums['original'] / 1024:.0f} KiB; "
+        f"WebP: {sums['webp'] / 1024:.0f} KiB ({sums['webp'] / max(sums['original'], 1):.1%}); "
+        f"JPEG: {sums['jpg'] / 1024:.0f} KiB ({sums['jpg'] / max(sums['original'], 1):.1%})"
+      ))
@@ -0,0 +1,53 @@
+# core/Dermatologia_IA/management/commands/refresh_ai_texts.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Dermatologia_IA.utils.aiComponents import ai_components, condition_classes
+from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+from apps.Dermatologia_IA.utils.aiTextCache import ai_text_store
+
+
+class Command(BaseCommand):
+  help = "Regenera con Gemini las variantes en caché del reporte y tratamiento de cada condición."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--conditions', nargs='+', choices=condition_classes, default=condition_classes,
+                        help='Condiciones a regenerar (por defecto todas).')
+    parser.add_argument('--variants', type=int, default=settings.AI_TEXT_CACHE_VARIANTS,
+                        help='Variantes a generar por condición.')
+    parser.add_argument('--mode', choices=['split', 'structured'], default=settings.AI_GEMINI_MODE,
+                        help='Peticiones separadas o una sola petición JSON (por defecto AI_GEMINI_MODE).')
+    parser.add_argument('--purge-expired', action='store_true',
+                        help='Eliminar antes las variantes vencidas.')
+
+  def handle(self, *args, **options):
+    if ai_components.gemini_model is None:
+      raise CommandError("Gemini AI no está configurado (GEMINI_API_KEY).")
+
+    if options['purge_expired']:
+      self.stdout.write(f"Variantes vencidas eliminadas: {ai_text_store.purge_expired()}")
+
+    stored = failed = 0
+    elapsed = []
+    for condition in options['conditions']:
+      for variant in range(options['variants']):
+        started = time.perf_counter()
+        ai_report, ai_treatment = AIProcessor.request_ai_content(condition, mode=options['mode'])
+        elapsed.append(time.perf_counter() - started)
+        if ai_report and ai_treatment:
+          ai_text_store.put(condition, ai_report, ai_treatment, variant=variant, mode=options['mode'])
+          stored += 1
+        else:
+          failed += 1
+          self.stdout.write(self.style.WARNING(f"No se pudo generar {condition} (variante {variant})."))
+      self.stdout.write(f"{condition}: {options['variants']} variantes procesadas")
+
+    if elapsed:
+      elapsed.sort()
+      self.stdout.write(
+        f"Latencia modo {options['mode']}: media {sum(elapsed) / len(elapsed) * 1000:.0f} ms, "
+        f"p50 {elapsed[len(elapsed) // 2] * 1000:.0f} ms, máx. {elapsed[-1] * 1000:.0f} ms"
+      )
+    self.stdout.write(self.style.SUCCESS(f"Textos guardados: {stored}, fallidos: {failed}"))
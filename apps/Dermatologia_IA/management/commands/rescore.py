@@ -0,0 +1,133 @@
+# core/Dermatologia_IA/management/commands/rescore.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.aiComponents import ai_components, index_to_class
+from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+from apps.Dermatologia_IA.utils.gradcamRenderer import encode_heatmap
+from apps.core.utils.analytics import record_rescored
+
+RESCORE_FIELDS = ('id', 'image', 'uploaded_at', 'age_approx', 'sex', 'anatom_site_general', 'condition',
+                  'confidence', 'model_version', 'ai_report', 'ai_treatment')
+UPDATE_FIELDS = ['condition', 'confidence', 'model_version', 'gradcam_heatmap', 'gradcam_path', 'ai_report',
+                 'ai_treatment']
+
+
+class Command(BaseCommand):
+  help = ("Vuelve a puntuar con el modelo actual las imágenes procesadas por una versión anterior "
+          "(o sin versión registrada).")
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=32, help='Imágenes por pasada del modelo.')
+    parser.add_argument('--chunk-size', type=int, default=500,
+                        help='Filas leídas por consulta del cursor (.iterator).')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Hilos que decodifican imágenes en paralelo (límite de concurrencia).')
+    parser.add_argument('--limit', type=int, default=None, help='Puntuar como máximo N filas.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Ejecutar la inferencia sin guardar e informar cuántas filas cambiarían.')
+
+  def _rescore_batch(self, batch, pool, dry_run):
+    """
+    Returns:
+        Tupla de (filas puntuadas, filas cuyo diagnóstico cambia, filas fallidas)
+    """
+    results = list(pool.map(
+      lambda si: AIProcessor.preprocess_image_for_model(si.image.path, model_only=True)[0], batch
+    ))
+    rows = [(si, img) for si, img in zip(batch, results) if img is not None]
+    failed = len(batch) - len(rows)
+    if not rows:
+      return 0, 0, failed
+
+    metadata = [{
+      'age_approx': si.age_approx,
+      'sex': si.sex,
+      'anatom_site_general': si.anatom_site_general,
+      'dataset': 'ISIC',
+    } for si, _ in rows]
+    encoder = ai_components.metadata_encoder
+    if encoder is not None:
+      meta = encoder.encode_rows(metadata)
+    else:
+      meta = np.vstack([
+        AIProcessor.preprocess_metadata_for_model(row, ai_components.metadata_preprocessor) for row in metadata
+      ])
+    preds, indices, heatmaps = AIProcessor.predict_with_gradcam(
+      np.stack([img[0] for _, img in rows]), meta, ai_components.keras_model
+    )
+
+    changed = 0
+    model_version = ai_components.model_version
+    previous = []
+    for (si, _), pred, idx, heatmap in zip(rows, preds, indices, heatmaps):
+      idx = int(idx)
+      condition = index_to_class.get(idx, 'Condición desconocida')
+      if condition != si.condition:
+        changed += 1
+        if not dry_run:
+          si.ai_report, si.ai_treatment = AIProcessor.generate_ai_content(condition)
+      if dry_run:
+        continue
+      previous.append(SimpleNamespace(
+        uploaded_at=si.uploaded_at, anatom_site_general=si.anatom_site_general,
+        condition=si.condition, confidence=si.confidence,
+      ))
+      si.condition = condition
+      si.confidence = float(pred[idx] * 100)
+      si.model_version = model_version
+      si.gradcam_heatmap = encode_heatmap(heatmap) if heatmap is not None else None
+      si.gradcam_path = None
+
+    if not dry_run:
+      SkinImage.objects.bulk_update([si for si, _ in rows], UPDATE_FIELDS)
+      record_rescored(zip(previous, [si for si, _ in rows]))
+    return len(rows), changed, failed
+
+  def handle(self, *args, **options):
+    if not ai_components.warm_up():
+      raise CommandError("Sistema de IA no disponible (modelo o preprocesador no encontrados).")
+    model_version = ai_components.model_version
+    stale = (
+      SkinImage.objects
+      .filter(processed=True)
+      .filter(Q(model_version__isnull=True) | ~Q(model_version=model_version))
+      .only(*RESCORE_FIELDS)
+      .order_by('id')
+    )
+    total = stale.count()
+    if options['limit']:
+      total = min(total, options['limit'])
+      stale = stale[:options['limit']]
+    self.stdout.write(f"Versión actual del modelo: {model_version}. Filas desactualizadas: {total}")
+    if not total:
+      return
+
+    batch_size = max(1, options['batch_size'])
+    scored = changed = failed = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+      batch = []
+      for skin_image in stale.iterator(chunk_size=options['chunk_size']):
+        batch.append(skin_image)
+        if len(batch) < batch_size:
+          continue
+        counts = self._rescore_batch(batch, pool, options['dry_run'])
+        scored, changed, failed = scored + counts[0], changed + counts[1], failed + counts[2]
+        batch = []
+        self.stdout.write(f"{scored + failed}/{total} filas ({scored / (time.perf_counter() - started):.1f} imágenes/s)")
+      if batch:
+        counts = self._rescore_batch(batch, pool, options['dry_run'])
+        scored, changed, failed = scored + counts[0], changed + counts[1], failed + counts[2]
+
+    verb = 'cambiarían' if options['dry_run'] else 'cambiaron'
+    self.stdout.write(self.style.SUCCESS(
+      f"Puntuadas {scored} filas; {changed} {verb} de diagnóstico; fallidas: {failed}"
+      + (" (simulación, no se guardó nada)" if options['dry_run'] else "")
+    ))
@@ -0,0 +1,33 @@
+# core/Dermatologia_IA/management/commands/run_analysis_workers.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.Dermatologia_IA.utils.aiComponents import ai_components
+from apps.Dermatologia_IA.utils.analysisPipeline import AnalysisWorkerPool
+
+
+class Command(BaseCommand):
+  help = "Inicia el pool de workers que procesa la cola de análisis de imágenes."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--workers', type=int, default=settings.AI_ANALYSIS_WORKERS,
+                        help='Número de hilos worker.')
+    parser.add_argument('--poll-interval', type=float, default=settings.AI_ANALYSIS_POLL_INTERVAL,
+                        help='Segundos de espera cuando la cola está vacía.')
+    parser.add_argument('--no-warm-up', action='store_true',
+                        help='No precargar TensorFlow, el modelo y Gemini antes de iniciar.')
+
+  def handle(self, *args, **options):
+    if not options['no_warm_up'] and not ai_components.warm_up():
+      self.stdout.write(self.style.WARNING("Sistema de IA no disponible: los trabajos fallarán hasta que exista el modelo."))
+    pool = AnalysisWorkerPool(workers=options['workers'], poll_interval=options['poll_interval'])
+    pool.start()
+    self.stdout.write(self.style.SUCCESS(f"Workers de análisis iniciados: {options['workers']}"))
+    try:
+      while True:
+        time.sleep(1)
+    except KeyboardInterrupt:
+      self.stdout.write("Deteniendo workers de análisis...")
+      pool.stop()
@@ -0,0 +1,35 @@
+# core/Dermatologia_IA/management/commands/run_email_worker.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.Dermatologia_IA.utils.reportOutbox import send_pending_emails
+
+
+class Command(BaseCommand):
+  help = "Envía los emails de reportes encolados, por lotes y reutilizando la conexión SMTP."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=settings.REPORT_EMAIL_BATCH_SIZE,
+                        help='Emails enviados por conexión.')
+    parser.add_argument('--poll-interval', type=float, default=settings.REPORT_EMAIL_POLL_INTERVAL,
+                        help='Segundos de espera cuando la bandeja está vacía.')
+    parser.add_argument('--once', action='store_true',
+                        help='Vaciar la bandeja de los emails listos y terminar.')
+
+  def handle(self, *args, **options):
+    self.stdout.write(self.style.SUCCESS("Worker de email iniciado."))
+    try:
+      while True:
+        close_old_connections()
+        sent, failed = send_pending_emails(options['batch_size'])
+        if sent or failed:
+          self.stdout.write(f"Lote enviado: {sent} enviados, {failed} con error")
+          continue
+        if options['once']:
+          return
+        time.sleep(options['poll_interval'])
+    except KeyboardInterrupt:
+      self.stdout.write("Deteniendo worker de email...")
@@ -0,0 +1,47 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_processed_as_done(apps, schema_editor):
+    SkinImage = apps.get_model('Dermatologia_IA', 'SkinImage')
+    SkinImage.objects.filter(processed=True).update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinimage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Completado'), ('failed', 'Fallido')], default='pending', help_text='Estado del análisis de IA.', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='skinimage',
+            name='error_message',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_processed_as_done, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('skin_image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='Dermatologia_IA.skinimage')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='analysisjob_status_created')],
+            },
+        ),
+    ]
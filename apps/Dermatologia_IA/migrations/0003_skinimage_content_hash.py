@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0002_skinimage_status_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 de la imagen y sus metadatos normalizados.', max_length=64, null=True),
+        ),
+    ]
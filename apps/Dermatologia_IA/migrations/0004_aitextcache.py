@@ -0,0 +1,29 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0003_skinimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AITextCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('condition', models.CharField(max_length=50)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('model_name', models.CharField(max_length=100)),
+                ('variant', models.PositiveSmallIntegerField(default=0)),
+                ('report', models.TextField()),
+                ('treatment', models.TextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('condition', 'prompt_version', 'model_name', 'variant'), name='aitextcache_unique_variant')],
+            },
+        ),
+    ]
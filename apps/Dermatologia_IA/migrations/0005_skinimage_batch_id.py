@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0004_aitextcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinimage',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, help_text='Lote de subida múltiple al que pertenece la imagen.', null=True),
+        ),
+    ]
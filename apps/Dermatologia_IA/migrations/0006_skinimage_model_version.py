@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0005_skinimage_batch_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinimage',
+            name='model_version',
+            field=models.CharField(blank=True, db_index=True, help_text='Huella del modelo y del preprocesador que produjeron el diagnóstico.', max_length=16, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0006_skinimage_model_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skinimage',
+            name='gradcam_heatmap',
+            field=models.BinaryField(blank=True, editable=False, help_text='Heatmap Grad-CAM de baja resolución en float16 (.npy).', null=True),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0008_reportemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skinimage',
+            index=models.Index(condition=models.Q(('processed', True)), fields=['-uploaded_at', '-id'], name='skinimage_processed_recent'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0009_skinimage_processed_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skinimage',
+            index=models.Index(fields=['-uploaded_at'], name='skinimage_uploaded_at'),
+        ),
+        migrations.AddIndex(
+            model_name='skinimage',
+            index=models.Index(condition=models.Q(('processed', True)), fields=['dni', '-uploaded_at', '-id'], name='skinimage_processed_dni'),
+        ),
+        migrations.AddIndex(
+            model_name='skinimage',
+            index=models.Index(condition=models.Q(('processed', True)), fields=['condition', '-uploaded_at', '-id'], name='skinimage_processed_condition'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+TRIGRAM_INDEXES = {
+    'skinimage_first_name_trgm': 'first_name',
+    'skinimage_last_name_trgm': 'last_name',
+    'skinimage_email_trgm': 'email',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Instala pg_trgm si es posible y crea los índices GIN; sin permisos la búsqueda usa icontains"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError as e:
+        print(f"\n  No se pudo instalar pg_trgm ({e}); se omiten los índices de búsqueda por trigramas.")
+        return
+
+    table = schema_editor.quote_name(apps.get_model('Dermatologia_IA', 'SkinImage')._meta.db_table)
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} ON {table} '
+            f'USING gin ({schema_editor.quote_name(column)} gin_trgm_ops) WHERE processed'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dermatologia_IA', '0010_skinimage_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
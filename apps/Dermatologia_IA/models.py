@@ -1,9 +1,24 @@
 # core/Dermatologia_IA/models.py
+from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.urls import reverse
+from django.utils import timezone
 
 
 class SkinImage(models.Model):
+  # Estados del análisis en segundo plano
+  STATUS_PENDING = 'pending'
+  STATUS_RUNNING = 'running'
+  STATUS_DONE = 'done'
+  STATUS_FAILED = 'failed'
+  STATUS_CHOICES = [
+    (STATUS_PENDING, 'Pendiente'),
+    (STATUS_RUNNING, 'En proceso'),
+    (STATUS_DONE, 'Completado'),
+    (STATUS_FAILED, 'Fallido'),
+  ]
+
   # Información del paciente
   first_name = models.CharField(
     max_length=100,
@@ -29,10 +44,43 @@ class SkinImage(models.Model):
   image = models.ImageField(upload_to='skin_images/')
   uploaded_at = models.DateTimeField(auto_now_add=True)
   processed = models.BooleanField(default=False)
+  status = models.CharField(
+    max_length=10,
+    choices=STATUS_CHOICES,
+    default=STATUS_PENDING,
+    help_text="Estado del análisis de IA."
+  )
+  error_message = models.TextField(blank=True, null=True)
+  content_hash = models.CharField(
+    max_length=64,
+    blank=True,
+    null=True,
+    db_index=True,
+    help_text="SHA-256 de la imagen y sus metadatos normalizados."
+  )
+  batch_id = models.UUIDField(
+    blank=True,
+    null=True,
+    db_index=True,
+    help_text="Lote de subida múltiple al que pertenece la imagen."
+  )
   condition = models.CharField(max_length=50, blank=True, null=True)
   location = models.CharField(max_length=50, blank=True, null=True)
   confidence = models.FloatField(blank=True, null=True)
+  model_version = models.CharField(
+    max_length=16,
+    blank=True,
+    null=True,
+    db_index=True,
+    help_text="Huella del modelo y del preprocesador que produjeron el diagnóstico."
+  )
   gradcam_path = models.CharField(max_length=255, blank=True, null=True)
+  gradcam_heatmap = models.BinaryField(
+    blank=True,
+    null=True,
+    editable=False,
+    help_text="Heatmap Grad-CAM de baja resolución en float16 (.npy)."
+  )
   ai_report = models.TextField(blank=True, null=True)
   ai_treatment = models.TextField(blank=True, null=True)
 
@@ -90,9 +138,146 @@ class SkinImage(models.Model):
     help_text="Localización anatómica general de la lesión."
   )
 
+  class Meta:
+    indexes = [
+      # Listado de reportes paginado por (uploaded_at, id) descendente
+      models.Index(
+        fields=['-uploaded_at', '-id'],
+        name='skinimage_processed_recent',
+        condition=models.Q(processed=True),
+      ),
+      # Imágenes recientes de la página de inicio (incluye las no procesadas)
+      models.Index(fields=['-uploaded_at'], name='skinimage_uploaded_at'),
+      # Reportes de un paciente y por condición, ya ordenados por fecha
+      models.Index(
+        fields=['dni', '-uploaded_at', '-id'],
+        name='skinimage_processed_dni',
+        condition=models.Q(processed=True),
+      ),
+      models.Index(
+        fields=['condition', '-uploaded_at', '-id'],
+        name='skinimage_processed_condition',
+        condition=models.Q(processed=True),
+      ),
+    ]
+
+  @property
+  def gradcam_url(self):
+    """URL de la superposición Grad-CAM (renderizada bajo demanda) o el JPEG antiguo"""
+    if self.gradcam_heatmap:
+      return self._gradcam_image_url(settings.AI_GRADCAM_DEFAULT_SIZE, 'jpg')
+    return self.gradcam_path
+
+  @property
+  def gradcam_webp_srcset(self):
+    """srcset WebP de la superposición Grad-CAM (vacío para filas con JPEG antiguo)"""
+    return self._gradcam_srcset('webp')
+
+  @property
+  def gradcam_jpeg_srcset(self):
+    return self._gradcam_srcset('jpg')
+
+  def _gradcam_image_url(self, size, fmt):
+    return reverse('dermatology:gradcam_image', kwargs={'image_id': self.id, 'size': size, 'fmt': fmt})
+
+  def _gradcam_srcset(self, fmt):
+    if not self.gradcam_heatmap:
+      return ''
+    return ', '.join(f'{self._gradcam_image_url(size, fmt)} {size}w' for size in sorted(settings.AI_GRADCAM_SIZES))
+
+  @property
+  def thumbnail_url(self):
+    """Miniatura JPEG más pequeña, para tarjetas y listados"""
+    from apps.Dermatologia_IA.utils.thumbnails import thumbnail_url
+    return thumbnail_url(self, min(settings.AI_THUMBNAIL_WIDTHS), 'jpg')
+
+  @property
+  def thumbnail_webp_srcset(self):
+    from apps.Dermatologia_IA.utils.thumbnails import thumbnail_srcset
+    return thumbnail_srcset(self, 'webp')
+
+  @property
+  def thumbnail_jpeg_srcset(self):
+    from apps.Dermatologia_IA.utils.thumbnails import thumbnail_srcset
+    return thumbnail_srcset(self, 'jpg')
+
   def __str__(self):
     status = self.condition or ('Procesada' if self.processed else 'Pendiente')
     age_str = f"Edad: {self.age_approx}" if self.age_approx is not None else "Edad: ?"
     sex_str = f"Sexo: {self.get_sex_display()}" if self.sex else "Sexo: ?"
     site_str = f"Locación: {self.get_anatom_site_general_display()}" if self.anatom_site_general else "Locación: ?"
     return f"Imagen {self.id} ({status}) - {age_str}, {sex_str}, {site_str}"
+
+
+class AnalysisJob(models.Model):
+  """Trabajo de análisis encolado en la base de datos y consumido por los workers"""
+  skin_image = models.ForeignKey(SkinImage, on_delete=models.CASCADE, related_name='analysis_jobs')
+  status = models.CharField(
+    max_length=10,
+    choices=SkinImage.STATUS_CHOICES,
+    default=SkinImage.STATUS_PENDING
+  )
+  attempts = models.PositiveSmallIntegerField(default=0)
+  last_error = models.TextField(blank=True, null=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+  next_attempt_at = models.DateTimeField(default=timezone.now)
+  started_at = models.DateTimeField(blank=True, null=True)
+  finished_at = models.DateTimeField(blank=True, null=True)
+
+  class Meta:
+    ordering = ['created_at']
+    indexes = [
+      models.Index(fields=['status', 'created_at'], name='analysisjob_status_created'),
+    ]
+
+  def __str__(self):
+    return f"Trabajo {self.id} - Imagen {self.skin_image_id} ({self.get_status_display()})"
+
+
+class AITextCache(models.Model):
+  """Textos de Gemini (reporte y tratamiento) generados por condición"""
+  condition = models.CharField(max_length=50)
+  prompt_version = models.CharField(max_length=20)
+  model_name = models.CharField(max_length=100)
+  variant = models.PositiveSmallIntegerField(default=0)
+  report = models.TextField()
+  treatment = models.TextField()
+  created_at = models.DateTimeField(default=timezone.now)
+  expires_at = models.DateTimeField()
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(
+        fields=['condition', 'prompt_version', 'model_name', 'variant'],
+        name='aitextcache_unique_variant'
+      ),
+    ]
+
+  def __str__(self):
+    return f"{self.condition} ({self.model_name}, {self.prompt_version}, variante {self.variant})"
+
+
+class ReportEmail(models.Model):
+  """Email con un reporte PDF en la bandeja de salida, enviado por el worker de correo"""
+  skin_image = models.ForeignKey(SkinImage, on_delete=models.CASCADE, related_name='report_emails')
+  email_address = models.EmailField()
+  status = models.CharField(
+    max_length=10,
+    choices=SkinImage.STATUS_CHOICES,
+    default=SkinImage.STATUS_PENDING
+  )
+  attempts = models.PositiveSmallIntegerField(default=0)
+  last_error = models.TextField(blank=True, null=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+  next_attempt_at = models.DateTimeField(default=timezone.now)
+  started_at = models.DateTimeField(blank=True, null=True)
+  sent_at = models.DateTimeField(blank=True, null=True)
+
+  class Meta:
+    ordering = ['created_at']
+    indexes = [
+      models.Index(fields=['status', 'next_attempt_at'], name='reportemail_status_next'),
+    ]
+
+  def __str__(self):
+    return f"Email {self.id} - Imagen {self.skin_image_id} a {self.email_address} ({self.get_status_display()})"
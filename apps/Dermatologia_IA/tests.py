@@ -1,3 +1,784 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core import mail
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, StandardScaler
+
+from apps.Dermatologia_IA.management.commands.analyze_bulk import Command as AnalyzeBulkCommand
+from apps.Dermatologia_IA.management.commands.analyze_bulk import _preprocess, make_pool
+from apps.Dermatologia_IA.models import AITextCache, AnalysisJob, ReportEmail, SkinImage
+from apps.Dermatologia_IA.views.view_report_user_IA import ReportListView
+from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+from apps.Dermatologia_IA.utils.aiTextCache import AITextStore
+from apps.Dermatologia_IA.utils.analysisPipeline import claim_next_jobs, enqueue_analysis, process_jobs
+from apps.Dermatologia_IA.utils.circuitBreaker import CircuitBreaker
+from apps.Dermatologia_IA.utils.gradcamRenderer import (
+  cache_dir, decode_heatmap, encode_heatmap, evict_cache, render_overlay,
+)
+from apps.Dermatologia_IA.utils.metadataEncoder import METADATA_COLUMNS, MetadataEncoder
+from apps.Dermatologia_IA.utils.pagination import InvalidCursor, KeysetPaginator
+from apps.Dermatologia_IA.utils.patientSearch import search_reports
+from apps.Dermatologia_IA.utils.pdfImages import prepare_pdf_image
+from apps.Dermatologia_IA.utils.reportCache import get_cached_report, report_version
+from apps.Dermatologia_IA.utils.reportExport import filter_reports, stream_reports_zip
+from apps.core.views.views import HomeView
+from apps.Dermatologia_IA.utils.reportOutbox import enqueue_report_email, send_pending_emails
+
+CATEGORICAL_COLUMNS = ['sex', 'anatom_site_general', 'dataset']
+
+
+@override_settings(AI_ANALYSIS_MAX_ATTEMPTS=2)
+class AnalysisJobRetryTest(TestCase):
+  """Cola de análisis: un trabajo fallido espera `next_attempt_at` antes de reintentarse"""
+
+  def setUp(self):
+    self.skin_image = SkinImage.objects.create(
+      first_name='Ana', last_name='Pérez', dni='0102030405', image='skin_images/a.jpg', age_approx=40,
+    )
+    patcher = mock.patch(
+      'apps.Dermatologia_IA.utils.analysisPipeline.run_analysis', side_effect=RuntimeError('sin modelo')
+    )
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_failed_job_is_retried_with_backoff(self):
+    job = enqueue_analysis(self.skin_image)
+    process_jobs(claim_next_jobs())
+    job.refresh_from_db()
+    self.assertEqual((job.status, job.attempts, job.last_error), (SkinImage.STATUS_PENDING, 1, 'sin modelo'))
+    self.assertGreater(job.next_attempt_at, timezone.now())
+    self.assertEqual(claim_next_jobs(), [])
+
+    AnalysisJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+    process_jobs(claim_next_jobs())
+    job.refresh_from_db()
+    self.assertEqual((job.status, job.attempts), (SkinImage.STATUS_FAILED, 2))
+
+
+@skipUnless(importlib.util.find_spec('tensorflow'), "Requiere TensorFlow")
+class AITextStoreTest(TestCase):
+  """LRU en memoria de los textos de Gemini"""
+
+  @override_settings(AI_TEXT_CACHE_LOCAL_TTL=300)
+  def test_local_entry_expires_before_table_row(self):
+    store = AITextStore(max_entries=8)
+    store.put('Nevus', 'Reporte', 'Tratamiento', mode='split')
+    self.assertEqual(store.get('Nevus', mode='split'), ('Reporte', 'Tratamiento'))
+
+    # Otro proceso actualiza la tabla: esta LRU no se entera hasta que caduca su entrada
+    AITextCache.objects.update(report='Nuevo reporte')
+    self.assertEqual(store.get('Nevus', mode='split'), ('Reporte', 'Tratamiento'))
+    with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=301)):
+      self.assertEqual(store.get('Nevus', mode='split'), ('Nuevo reporte', 'Tratamiento'))
+
+
+class AnalyzeBulkTest(TestCase):
+  """Preprocesado en procesos y guardado por lotes de analyze_bulk"""
+
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+    self.paths = []
+    for i in range(3):
+      path = os.path.join(self.media_root, f'source_{i}.png')
+      with open(path, 'wb') as image_file:
+        image_file.write(b'imagen')
+      self.paths.append(path)
+
+  def _rows(self):
+    return [
+      {'path': path, 'age_approx': 40, 'sex': 'male', 'anatom_site_general': 'torso', 'content_hash': f'{i:064x}'}
+      for i, path in enumerate(self.paths)
+    ]
+
+  def _stored_images(self):
+    directory = os.path.join(self.media_root, 'skin_images')
+    return os.listdir(directory) if os.path.isdir(directory) else []
+
+  @skipUnless(importlib.util.find_spec('cv2'), "Requiere OpenCV")
+  def test_process_pool_preprocesses_like_the_command(self):
+    import cv2
+    path = os.path.join(self.media_root, 'photo.jpg')
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 255, (300, 400, 3), dtype=np.uint8))
+    with make_pool('process', 1) as pool:
+      np.testing.assert_allclose(pool.submit(_preprocess, path).result(), _preprocess(path))
+
+  def test_texts_resolved_once_per_condition(self):
+    preds = np.full((3, 8), 0.1)
+    with override_settings(MEDIA_ROOT=self.media_root), \
+        mock.patch.object(AIProcessor, 'generate_ai_content', return_value=('Reporte', 'Tratamiento')) as texts:
+      AnalyzeBulkCommand()._save_chunk(self._rows(), preds, [0, 0, 1], [None] * 3)
+    self.assertEqual(texts.call_count, 2)
+    self.assertEqual(SkinImage.objects.filter(ai_report='Reporte').count(), 3)
+    self.assertEqual(len(self._stored_images()), 3)
+
+  def test_failed_chunk_removes_stored_images(self):
+    preds = np.full((3, 8), 0.1)
+    with override_settings(MEDIA_ROOT=self.media_root), \
+        mock.patch.object(AIProcessor, 'generate_ai_content', return_value=('Reporte', 'Tratamiento')), \
+        mock.patch.object(SkinImage.objects, 'bulk_create', side_effect=RuntimeError('sin base de datos')):
+      with self.assertRaises(RuntimeError):
+        AnalyzeBulkCommand()._save_chunk(self._rows(), preds, [0, 1, 2], [None] * 3)
+    self.assertEqual(self._stored_images(), [])
+    self.assertFalse(SkinImage.objects.exists())
+
+
+class FusedGradcamParityTest(SimpleTestCase):
+  """La pasada fusionada coincide con predict + Grad-CAM por separado"""
+
+  def _build_model(self, preprocess_image=False):
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(0)
+    base_input = tf.keras.Input(shape=(32, 32, 3))
+    x = tf.keras.layers.Conv2D(4, 3, activation='relu')(base_input)
+    x = tf.keras.layers.Conv2D(8, 3, name='last_conv')(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    base_model = tf.keras.Model(base_input, x, name='base_model')
+
+    image_input = tf.keras.Input(shape=(32, 32, 3))
+    metadata_input = tf.keras.Input(shape=(5,))
+    image = tf.keras.layers.Rescaling(0.5)(image_input) if preprocess_image else image_input
+    # Rama de metadatos con la misma forma que la salida de la capa base
+    metadata = tf.keras.layers.Dense(8, activation='relu')(metadata_input)
+    merged = tf.keras.layers.Concatenate()([base_model(image), metadata])
+    output = tf.keras.layers.Dense(3, activation='softmax')(merged)
+    return tf.keras.Model([image_input, metadata_input], output)
+
+  def _inputs(self):
+    rng = np.random.default_rng(0)
+    return rng.random((3, 32, 32, 3), dtype=np.float32), rng.random((3, 5), dtype=np.float32)
+
+  def test_matches_two_pass_inference(self):
+    full_model = self._build_model()
+    images, metadata = self._inputs()
+
+    self.assertIsNotNone(AIProcessor.get_fused_function(full_model))
+    probabilities, indices, heatmaps = AIProcessor.predict_with_gradcam(images, metadata, full_model)
+
+    expected = full_model.predict([images, metadata], verbose=0)
+    np.testing.assert_allclose(probabilities, expected, atol=1e-5)
+    np.testing.assert_array_equal(indices, np.argmax(expected, axis=1))
+    # Al menos un heatmap no nulo para que la comparación no sea trivial
+    self.assertAlmostEqual(max(float(heatmap.max()) for heatmap in heatmaps), 1.0, places=5)
+    for i in range(len(images)):
+      heatmap, layer_name = AIProcessor.calculate_gradcam_image_only(images[i:i + 1], full_model, int(indices[i]))
+      self.assertEqual(layer_name, 'last_conv')
+      np.testing.assert_allclose(heatmaps[i], heatmap, atol=1e-4)
+
+  def test_unsupported_graph_falls_back_to_two_passes(self):
+    # La capa base no recibe la imagen directamente: no se puede fusionar sin cambiar la entrada
+    full_model = self._build_model(preprocess_image=True)
+    images, metadata = self._inputs()
+
+    self.assertIsNone(AIProcessor.get_fused_function(full_model))
+    probabilities, indices, heatmaps = AIProcessor.predict_with_gradcam(images, metadata, full_model)
+    np.testing.assert_allclose(probabilities, full_model.predict([images, metadata], verbose=0), atol=1e-6)
+    self.assertEqual(len(heatmaps), len(images))
+
+
+@skipUnless(
+  importlib.util.find_spec('cv2') and importlib.util.find_spec('tensorflow'), "Requiere OpenCV y TensorFlow"
+)
+class ModelOnlyPreprocessingTest(SimpleTestCase):
+  """El tensor con decodificación reducida coincide con el de la decodificación completa"""
+
+  def test_matches_full_decode_resize(self):
+    import cv2
+    from tensorflow.keras.applications.resnet50 import preprocess_input
+    # Imagen suave (gradientes) de 1600x1200 guardada como JPEG
+    y, x = np.mgrid[0:1200, 0:1600].astype(np.float32)
+    image = np.stack([x / 1600 * 255, y / 1200 * 255, (x + y) / 2800 * 255], axis=2).astype(np.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'photo.jpg')
+      cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+      baseline = cv2.resize(cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB), (224, 224),
+                            interpolation=cv2.INTER_LINEAR)
+      baseline = preprocess_input(baseline.astype(np.float32))
+      full_tensor, _ = AIProcessor.preprocess_image_for_model(path, overlay_max_side=0)
+      capped_tensor, overlay_base = AIProcessor.preprocess_image_for_model(path, overlay_max_side=1024)
+      tensor, overlay = AIProcessor.preprocess_image_for_model(path, model_only=True)
+
+    np.testing.assert_allclose(full_tensor[0], baseline, atol=1e-4)
+    # Limitar la imagen base del Grad-CAM no cambia lo que ve el modelo
+    self.assertEqual(overlay_base.shape, (768, 1024, 3))
+    np.testing.assert_allclose(capped_tensor[0], baseline, atol=1e-4)
+    self.assertIsNone(overlay)
+    self.assertEqual(tensor.shape, (1, 224, 224, 3))
+    self.assertLess(float(np.abs(tensor[0] - baseline).mean()), 2.0)
+    self.assertLess(float(np.abs(tensor[0] - baseline).max()), 12.0)
+
+
+class MetadataEncoderParityTest(SimpleTestCase):
+  """El codificador vectorizado debe producir exactamente la salida del ColumnTransformer"""
+
+  training_rows = pd.DataFrame({
+    'age_approx': [15, 30, 45, 60, 75, 85, 40, 55],
+    'sex': ['male', 'female', 'unknown', 'male', 'female', 'male', 'female', 'unknown'],
+    'anatom_site_general': ['face', 'back', 'anterior torso', 'lower extremity',
+                            'upper extremity', 'head/neck', 'unknown', 'palms/soles'],
+    'dataset': ['ISIC', 'ISIC', 'HAM10000', 'ISIC', 'BCN20000', 'ISIC', 'HAM10000', 'ISIC'],
+  })
+
+  sample_rows = [
+    {'age_approx': 52, 'sex': 'female', 'anatom_site_general': 'back', 'dataset': 'ISIC'},
+    {'age_approx': '37', 'sex': 'male', 'anatom_site_general': 'face', 'dataset': 'ISIC'},
+    {'age_approx': None, 'sex': 'unknown', 'anatom_site_general': 'scalp', 'dataset': 'ISIC'},
+    {'age_approx': 'n/a', 'sex': None, 'anatom_site_general': 'palms/soles', 'dataset': 'OTRO'},
+    {'age_approx': 120, 'sex': 'male', 'anatom_site_general': 'head/neck', 'dataset': 'HAM10000'},
+  ]
+
+  def _fit(self, numeric, categorical):
+    preprocessor = ColumnTransformer([
+      ('num', numeric, ['age_approx']),
+      ('cat', categorical, CATEGORICAL_COLUMNS),
+    ])
+    return preprocessor.fit(self.training_rows)
+
+  def _sklearn_output(self, preprocessor, row):
+    output = AIProcessor.preprocess_metadata_for_model(row, preprocessor)
+    return output.toarray() if hasattr(output, 'toarray') else output
+
+  def _assert_parity(self, preprocessor):
+    encoder = MetadataEncoder.from_column_transformer(preprocessor)
+    expected = np.vstack([self._sklearn_output(preprocessor, row) for row in self.sample_rows])
+
+    for i, row in enumerate(self.sample_rows):
+      np.testing.assert_array_equal(encoder.encode(row), expected[i:i + 1])
+    np.testing.assert_array_equal(encoder.encode_rows(self.sample_rows), expected)
+    np.testing.assert_array_equal(
+      encoder.encode_batch(*(np.array([row[c] for row in self.sample_rows], dtype=object) for c in METADATA_COLUMNS)),
+      expected
+    )
+
+  def test_standard_scaler_and_one_hot(self):
+    self._assert_parity(self._fit(StandardScaler(), OneHotEncoder(handle_unknown='ignore', sparse_output=False)))
+
+  def test_pipelines_with_imputers(self):
+    numeric = Pipeline([('imputer', SimpleImputer(strategy='median')), ('scaler', MinMaxScaler())])
+    categorical = Pipeline([
+      ('imputer', SimpleImputer(strategy='constant', fill_value='unknown')),
+      ('onehot', OneHotEncoder(handle_unknown='ignore')),
+    ])
+    self._assert_parity(self._fit(numeric, categorical))
+
+  def test_dropped_category(self):
+    self._assert_parity(self._fit(StandardScaler(), OneHotEncoder(drop='first', sparse_output=False,
+                                                                  handle_unknown='ignore')))
+
+  def test_unknown_category_rejected_when_encoder_errors(self):
+    encoder = MetadataEncoder.from_column_transformer(
+      self._fit(StandardScaler(), OneHotEncoder(handle_unknown='error', sparse_output=False))
+    )
+    with self.assertRaises(ValueError):
+      encoder.encode({'age_approx': 40, 'sex': 'male', 'anatom_site_general': 'face', 'dataset': 'OTRO'})
+
+  def test_unsupported_transformer(self):
+    preprocessor = self._fit(StandardScaler(), OneHotEncoder(handle_unknown='ignore'))
+    preprocessor.transformers_[0] = ('num', object(), ['age_approx'])
+    with self.assertRaises(ValueError):
+      MetadataEncoder.from_column_transformer(preprocessor)
+
+
+class FakeClock:
+  """Reloj manual para el circuit breaker"""
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class FakeGemini:
+  """Sustituto local de GenerativeModel con latencia y errores configurables; respeta el timeout"""
+
+  def __init__(self, delay=0.0, error=None):
+    self.delay = delay
+    self.error = error
+    self.calls = 0
+    self.timeouts = []
+    self._lock = threading.Lock()
+
+  def generate_content(self, prompt, generation_config=None, request_options=None, stream=False):
+    timeout = (request_options or {}).get('timeout')
+    with self._lock:
+      self.calls += 1
+      self.timeouts.append(timeout)
+    if timeout is not None and self.delay > timeout:
+      time.sleep(timeout)
+      raise TimeoutError(f"Timeout de {timeout}s")
+    time.sleep(self.delay)
+    if self.error is not None:
+      raise self.error
+    if stream:
+      return [SimpleNamespace(text=word + ' ') for word in prompt.split()[:5]]
+    if (generation_config or {}).get('response_mime_type') == 'application/json':
+      return SimpleNamespace(text=json.dumps({'report': 'R' * 600, 'treatment': f"Tratamiento: {prompt[:40]}"}))
+    return SimpleNamespace(text=f"  Respuesta para: {prompt}  ")
+
+
+class GeminiCircuitBreakerTest(SimpleTestCase):
+  """Generación concurrente con plazo y circuit breaker frente a un Gemini falso"""
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=self.clock)
+    self.executor = ThreadPoolExecutor(max_workers=4)
+
+  def tearDown(self):
+    self.executor.shutdown(wait=True)
+
+  def _request(self, gemini, deadline=1.0):
+    return AIProcessor.request_ai_content('MEL', gemini_model=gemini, breaker=self.breaker,
+                                          deadline=deadline, executor=self.executor)
+
+  def test_generations_run_concurrently(self):
+    gemini = FakeGemini(delay=0.2)
+    started = time.monotonic()
+    report, treatment = self._request(gemini)
+    self.assertLess(time.monotonic() - started, 0.35)
+    self.assertTrue(report.startswith('Respuesta para: Describe'))
+    self.assertTrue(treatment.startswith('Respuesta para: Recomendaciones'))
+    self.assertLessEqual(len(report), 500)
+    self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+  def test_streaming_reports_partial_text(self):
+    updates = []
+    report, treatment = AIProcessor.request_ai_content(
+      'NV', gemini_model=FakeGemini(), breaker=self.breaker, deadline=1.0, executor=self.executor,
+      mode='split', on_progress=updates.append
+    )
+    self.assertEqual(report, 'Describe brevemente (máx. 500 caracteres)')
+    self.assertTrue(treatment.startswith('Recomendaciones breves'))
+    self.assertTrue(updates)
+    self.assertEqual(updates[-1]['report'].strip(), report)
+
+  def test_deadline_returns_without_texts(self):
+    started = time.monotonic()
+    self.assertEqual(self._request(FakeGemini(delay=0.5), deadline=0.05), (None, None))
+    self.assertLess(time.monotonic() - started, 0.3)
+    stats = self.breaker.get_stats()
+    self.assertEqual(stats['consecutive_failures'], 1)
+    self.assertEqual(stats['timeouts'], 1)
+
+  def test_calls_carry_the_remaining_deadline_as_sdk_timeout(self):
+    gemini = FakeGemini(delay=5.0)
+    self._request(gemini, deadline=0.2)
+    self.assertEqual(len(gemini.timeouts), 2)
+    self.assertTrue(all(0 < timeout <= 0.2 for timeout in gemini.timeouts))
+    # El SDK corta las llamadas al vencer su timeout: el pool queda libre sin esperar los 5 s
+    started = time.monotonic()
+    self.executor.shutdown(wait=True)
+    self.assertLess(time.monotonic() - started, 1.0)
+
+  def test_sdk_timeout_counts_as_timeout(self):
+    self.assertEqual(self._request(FakeGemini(error=TimeoutError('deadline'))), (None, None))
+    self.assertEqual(self.breaker.get_stats()['timeouts'], 1)
+    self._request(FakeGemini(error=RuntimeError('503')))
+    self.assertEqual(self.breaker.get_stats()['timeouts'], 1)
+    self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+  def test_breaker_opens_and_recovers_after_cooldown(self):
+    failing = FakeGemini(error=RuntimeError('503'))
+    self._request(failing)
+    self._request(failing)
+    self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    calls = failing.calls
+    self.assertEqual(self._request(failing), (None, None))
+    self.assertEqual(failing.calls, calls)
+
+    self.clock.now += 30
+    self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+    report, treatment = self._request(FakeGemini())
+    self.assertIsNotNone(report)
+    self.assertIsNotNone(treatment)
+    self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+  def test_failed_probe_reopens_breaker(self):
+    self.breaker.record_failure()
+    self.breaker.record_failure()
+    self.clock.now += 30
+    self.assertTrue(self.breaker.allow_request())
+    self.assertFalse(self.breaker.allow_request())
+    self.breaker.record_failure()
+    self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class StructuredGeminiContentTest(SimpleTestCase):
+  """Modo estructurado: una sola petición JSON con los dos campos"""
+
+  def test_single_request_returns_both_fields(self):
+    gemini = FakeGemini()
+    breaker = CircuitBreaker()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+      report, treatment = AIProcessor.request_ai_content('BCC', gemini_model=gemini, breaker=breaker,
+                                                         deadline=1.0, executor=executor, mode='structured')
+    self.assertEqual(gemini.calls, 1)
+    self.assertEqual(report, 'R' * 500)
+    self.assertTrue(treatment.startswith('Tratamiento:'))
+
+  def test_parse_falls_back_per_field(self):
+    self.assertEqual(AIProcessor.parse_structured_content('no es json'), (None, None))
+    self.assertEqual(AIProcessor.parse_structured_content('{"report": "Texto"}'), ('Texto', None))
+    self.assertEqual(
+      AIProcessor.parse_structured_content('```json\n{"report": " A ", "treatment": 3}\n```'),
+      ('A', None)
+    )
+    self.assertEqual(AIProcessor.parse_structured_content('[1, 2]'), (None, None))
+
+
+class GradcamStorageTest(SimpleTestCase):
+  """Heatmap compacto en float16 y expulsión de la caché de superposiciones"""
+
+  def test_heatmap_round_trip(self):
+    heatmap = np.random.default_rng(0).random((7, 7)).astype(np.float32)
+    heatmap[0, 0] = np.nan
+    data = encode_heatmap(heatmap)
+    self.assertLess(len(data), 256)
+    decoded = decode_heatmap(memoryview(data))
+    self.assertEqual(decoded.shape, (7, 7))
+    self.assertEqual(decoded[0, 0], 0.0)
+    np.testing.assert_allclose(decoded[1:], heatmap[1:], atol=1e-3)
+
+  def test_eviction_removes_least_recently_used(self):
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+      os.makedirs(cache_dir())
+      for i in range(5):
+        path = os.path.join(cache_dir(), f'{i}_512_abc.jpg')
+        with open(path, 'wb') as overlay:
+          overlay.write(b'x' * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+      self.assertEqual(evict_cache(max_bytes=300), 3)
+      self.assertEqual(sorted(os.listdir(cache_dir())), ['3_512_abc.jpg', '4_512_abc.jpg'])
+
+  @skipUnless(importlib.util.find_spec('cv2'), "Requiere OpenCV")
+  def test_concurrent_renders_leave_no_temp_files(self):
+    import cv2
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+      image_path = os.path.join(media_root, 'photo.jpg')
+      cv2.imwrite(image_path, np.full((300, 400, 3), 128, np.uint8))
+      skin_image = SimpleNamespace(
+        id=1, image=SimpleNamespace(path=image_path), gradcam_path=None,
+        gradcam_heatmap=encode_heatmap(np.eye(7, dtype=np.float32)),
+      )
+      with ThreadPoolExecutor(max_workers=4) as pool:
+        paths = set(pool.map(lambda _: render_overlay(skin_image, 256), range(8)))
+
+      self.assertEqual(len(paths), 1)
+      self.assertEqual(os.listdir(cache_dir()), [os.path.basename(paths.pop())])
+
+class ReportCacheTest(SimpleTestCase):
+  """Caché de PDF por versión de contenido"""
+
+  def _skin_image(self, **fields):
+    values = dict(
+      id=7, first_name='Ana', last_name='Pérez', dni='0102030405', phone='', email='ana@example.com',
+      uploaded_at='2025-01-01T10:00:00', age_approx=40, sex='female', anatom_site_general='torso',
+      condition='Nevus', confidence=91.5, gradcam_path=None, ai_report='Reporte', ai_treatment='Tratamiento',
+      gradcam_heatmap=encode_heatmap(np.zeros((7, 7))), image=SimpleNamespace(name='skin_images/a.jpg'),
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+  def test_version_changes_with_report_content(self):
+    skin_image = self._skin_image()
+    self.assertEqual(report_version(skin_image), report_version(self._skin_image()))
+    self.assertNotEqual(report_version(skin_image), report_version(self._skin_image(ai_report='Otro')))
+    self.assertNotEqual(
+      report_version(skin_image), report_version(self._skin_image(gradcam_heatmap=encode_heatmap(np.ones((7, 7)))))
+    )
+
+  def test_builds_once_and_drops_stale_versions(self):
+    def fake_build(skin_image, output):
+      with open(output, 'wb') as pdf:
+        pdf.write(b'%PDF-' + skin_image.ai_report.encode('utf-8'))
+
+    with tempfile.TemporaryDirectory() as cache, override_settings(REPORT_CACHE_DIR=cache), \
+        mock.patch('apps.Dermatologia_IA.utils.reportCache.build_report_pdf', side_effect=fake_build) as build:
+      first_path, first_version = get_cached_report(self._skin_image())
+      self.assertEqual(get_cached_report(self._skin_image()), (first_path, first_version))
+      self.assertEqual(build.call_count, 1)
+
+      second_path, second_version = get_cached_report(self._skin_image(ai_report='Actualizado'))
+      self.assertNotEqual(first_version, second_version)
+      self.assertEqual(build.call_count, 2)
+      self.assertEqual(os.listdir(cache), [os.path.basename(second_path)])
+
+
+class PdfImageTest(SimpleTestCase):
+  """Remuestreo y recompresión de las imágenes del PDF"""
+
+  def _write_image(self, directory, pixels):
+    from PIL import Image
+    path = os.path.join(directory, 'source.png')
+    Image.fromarray(pixels).save(path)
+    return path
+
+  def test_resamples_to_print_resolution(self):
+    from PIL import Image
+    pixels = np.random.default_rng(0).integers(0, 255, (1200, 1600, 3), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+      path = self._write_image(directory, pixels)
+      with Image.open(prepare_pdf_image(path, (2.5, 2.5), dpi=150, quality=75, grayscale=True)) as image:
+        self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (375, 375)))
+      self.assertEqual(prepare_pdf_image(path, (2.5, 2.5), dpi=0), path)
+
+  def test_grayscale_only_when_no_color(self):
+    from PIL import Image
+    gray = np.repeat(np.random.default_rng(1).integers(0, 255, (100, 100, 1), dtype=np.uint8), 3, axis=2)
+    with tempfile.TemporaryDirectory() as directory:
+      path = self._write_image(directory, gray)
+      with Image.open(prepare_pdf_image(path, (2.5, 2.5), dpi=150, quality=75, grayscale=True)) as image:
+        self.assertEqual((image.mode, image.size), ('L', (100, 100)))
+      with Image.open(prepare_pdf_image(path, (2.5, 2.5), dpi=150, quality=75, grayscale=False)) as image:
+        self.assertEqual(image.mode, 'RGB')
+
+
+@override_settings(
+  EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+  DEFAULT_FROM_EMAIL='derma@example.com',
+  REPORT_EMAIL_MAX_ATTEMPTS=2,
+  REPORT_EMAIL_RETRY_BACKOFF=60,
+)
+class ReportOutboxTest(TestCase):
+  """Bandeja de salida de emails: envío por lotes, reintentos y estado por mensaje"""
+
+  def setUp(self):
+    self.pdf = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    self.pdf.write(b'%PDF-1.4')
+    self.pdf.close()
+    self.addCleanup(os.remove, self.pdf.name)
+    patcher = mock.patch(
+      'apps.Dermatologia_IA.utils.sendReportEmail.get_cached_report', return_value=(self.pdf.name, 'v')
+    )
+    self.get_cached_report = patcher.start()
+    self.addCleanup(patcher.stop)
+    self.skin_image = SkinImage.objects.create(
+      first_name='Ana', last_name='Pérez', dni='0102030405', image='skin_images/a.jpg', age_approx=40,
+      processed=True, status=SkinImage.STATUS_DONE, condition='Nevus', confidence=90.0,
+    )
+
+  def test_sends_batch_and_records_status(self):
+    enqueue_report_email(self.skin_image, 'a@example.com')
+    enqueue_report_email(self.skin_image, 'b@example.com')
+    self.assertEqual(len(mail.outbox), 0)
+
+    self.assertEqual(send_pending_emails(), (2, 0))
+    self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com'])
+    self.assertEqual(mail.outbox[0].attachments[0][1], b'%PDF-1.4')
+    self.assertEqual(ReportEmail.objects.filter(status=SkinImage.STATUS_DONE, sent_at__isnull=False).count(), 2)
+    self.assertEqual(send_pending_emails(), (0, 0))
+
+  def test_failed_email_is_retried_with_backoff(self):
+    email = enqueue_report_email(self.skin_image, 'a@example.com')
+    self.get_cached_report.side_effect = OSError('disco lleno')
+
+    self.assertEqual(send_pending_emails(), (0, 1))
+    email.refresh_from_db()
+    self.assertEqual((email.status, email.attempts, email.last_error), (SkinImage.STATUS_PENDING, 1, 'disco lleno'))
+    self.assertGreater(email.next_attempt_at, timezone.now())
+    self.assertEqual(send_pending_emails(), (0, 0))
+
+    ReportEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+    self.assertEqual(send_pending_emails(), (0, 1))
+    email.refresh_from_db()
+    self.assertEqual((email.status, email.attempts), (SkinImage.STATUS_FAILED, 2))
+    self.assertEqual(len(mail.outbox), 0)
+
+
+class ReportExportTest(SimpleTestCase):
+  """Exportación de reportes en un ZIP transmitido por partes"""
+
+  def test_streams_reports_in_order_and_lists_errors(self):
+    with tempfile.TemporaryDirectory() as directory:
+      def fake_cached_report(skin_image):
+        if skin_image.id == 2:
+          raise OSError('imagen no encontrada')
+        path = os.path.join(directory, f'{skin_image.id}.pdf')
+        with open(path, 'wb') as pdf:
+          pdf.write(b'%PDF-' + bytes([skin_image.id]) * 200000)
+        return path, 'v'
+
+      skin_images = [SimpleNamespace(id=i, uploaded_at=datetime(2025, 1, i)) for i in (1, 2, 3)]
+      with mock.patch('apps.Dermatologia_IA.utils.reportExport.get_cached_report', side_effect=fake_cached_report):
+        chunks = list(stream_reports_zip(iter(skin_images), workers=2))
+
+    self.assertGreater(len(chunks), 3)
+    self.assertTrue(all(chunks))
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+      self.assertEqual(archive.namelist(), [
+        '2025-01-01_reporte_dermatologico_1.pdf', '2025-01-03_reporte_dermatologico_3.pdf', 'errores.txt',
+      ])
+      self.assertEqual(archive.read('2025-01-03_reporte_dermatologico_3.pdf'), b'%PDF-' + b'\x03' * 200000)
+      self.assertIn('ID 2: imagen no encontrada', archive.read('errores.txt').decode('utf-8'))
+
+
+class KeysetPaginatorTest(TestCase):
+  """Paginación por cursor sobre (uploaded_at, id)"""
+
+  def setUp(self):
+    base = timezone.now()
+    for i in range(7):
+      skin_image = SkinImage.objects.create(
+        first_name=f'P{i}', image='skin_images/a.jpg', age_approx=40, processed=True
+      )
+      # Dos filas con la misma fecha para comprobar el desempate por id
+      SkinImage.objects.filter(pk=skin_image.pk).update(uploaded_at=base - timedelta(minutes=min(i, 5)))
+    self.expected = list(SkinImage.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+
+  def _ids(self, page):
+    return [skin_image.id for skin_image in page]
+
+  def test_walks_forward_and_back_without_gaps(self):
+    paginator = KeysetPaginator(SkinImage.objects.filter(processed=True), per_page=3)
+    first = paginator.page()
+    second = paginator.page(after=first.next_cursor)
+    third = paginator.page(after=second.next_cursor)
+    self.assertEqual(self._ids(first) + self._ids(second) + self._ids(third), self.expected)
+    self.assertFalse(first.has_previous())
+    self.assertFalse(third.has_next())
+
+    self.assertEqual(self._ids(paginator.page(before=third.previous_cursor)), self._ids(second))
+    back_to_first = paginator.page(before=second.previous_cursor)
+    self.assertEqual(self._ids(back_to_first), self._ids(first))
+    self.assertFalse(back_to_first.has_previous())
+
+  def test_rejects_malformed_cursor(self):
+    paginator = KeysetPaginator(SkinImage.objects.all(), per_page=3)
+    with self.assertRaises(InvalidCursor):
+      paginator.page(after='no-es-un-cursor')
+
+
+# Filas de la tabla sintética del plan de consultas (ajustable para pruebas más realistas)
+EXPLAIN_SEED_ROWS = int(os.getenv('EXPLAIN_SEED_ROWS', 50000))
+SEED_CONDITIONS = ['Nevus', 'Melanoma', 'Queratosis seborreica', 'Carcinoma basocelular',
+                   'Queratosis actínica', 'Dermatofibroma', 'Lesión vascular', 'Carcinoma escamoso']
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN de índices parciales solo en PostgreSQL")
+class SkinImageQueryPlanTest(TestCase):
+  """Comprueba con EXPLAIN que las consultas de las vistas usan índices sobre una tabla grande"""
+
+  @classmethod
+  def setUpTestData(cls):
+    SkinImage.objects.bulk_create(
+      (
+        SkinImage(
+          first_name=f'Paciente{i}', last_name='Sintético', dni=f'{i % (EXPLAIN_SEED_ROWS // 4):010d}',
+          image='skin_images/seed.jpg', age_approx=20 + i % 60, processed=i % 10 != 0,
+          condition=SEED_CONDITIONS[i % len(SEED_CONDITIONS)],
+        )
+        for i in range(EXPLAIN_SEED_ROWS)
+      ),
+      batch_size=5000,
+    )
+    table = connection.ops.quote_name(SkinImage._meta.db_table)
+    with connection.cursor() as cursor:
+      cursor.execute(f"UPDATE {table} SET uploaded_at = NOW() - id * INTERVAL '1 minute'")
+      cursor.execute(f"ANALYZE {table}")
+
+  def assertUsesIndex(self, queryset, index_name=None):
+    plan = queryset.explain()
+    self.assertNotIn('Seq Scan', plan, plan)
+    self.assertRegex(plan, r'Index (Only )?Scan|Bitmap Index Scan', plan)
+    if index_name:
+      self.assertIn(index_name, plan, plan)
+
+  def test_home_recent_images(self):
+    self.assertUsesIndex(HomeView()._get_recent_images(), 'skinimage_uploaded_at')
+
+  def test_report_list_pages(self):
+    paginator = KeysetPaginator(ReportListView().get_queryset(), per_page=20)
+    middle = SkinImage.objects.filter(processed=True).order_by('-uploaded_at', '-id')[EXPLAIN_SEED_ROWS // 2]
+    cursor = paginator.encode_cursor(middle)
+    self.assertUsesIndex(paginator.page_queryset(), 'skinimage_processed_recent')
+    self.assertUsesIndex(paginator.page_queryset(after=cursor), 'skinimage_processed_recent')
+    self.assertUsesIndex(paginator.page_queryset(before=cursor), 'skinimage_processed_recent')
+
+  def test_patient_reports_by_dni(self):
+    self.assertUsesIndex(filter_reports(dni=f'{123:010d}'), 'skinimage_processed_dni')
+
+  def test_reports_by_date_range(self):
+    today = timezone.localdate()
+    self.assertUsesIndex(filter_reports(date_from=today - timedelta(days=2), date_to=today))
+
+  def test_reports_by_condition(self):
+    self.assertUsesIndex(
+      SkinImage.objects.filter(processed=True, condition='Melanoma').order_by('-uploaded_at', '-id')[:20]
+    )
+
+
+class PatientSearchTest(TestCase):
+  """Búsqueda de reportes por DNI, nombre o email"""
+
+  def setUp(self):
+    for first_name, last_name, dni, email in [
+      ('María', 'Rodríguez', '0912345678', 'maria.rodriguez@example.com'),
+      ('Carlos', 'Rodriguez', '0923456789', 'carlos@example.com'),
+      ('Ana', 'Pérez', '0934567890', 'ana.perez@example.com'),
+    ]:
+      SkinImage.objects.create(
+        first_name=first_name, last_name=last_name, dni=dni, email=email,
+        image='skin_images/a.jpg', age_approx=40, processed=True,
+      )
+
+  def _names(self, query):
+    return sorted(search_reports(SkinImage.objects.filter(processed=True), query).values_list('first_name', flat=True))
+
+  def _assert_results(self):
+    self.assertEqual(self._names('0934567890'), ['Ana'])
+    self.assertEqual(self._names('0934'), [])
+    self.assertEqual(self._names('carlos rodriguez'), ['Carlos'])
+    self.assertEqual(self._names('ana.perez@example'), ['Ana'])
+    self.assertEqual(self._names(''), ['Ana', 'Carlos', 'María'])
+
+  def test_fallback_without_trigram_extension(self):
+    with mock.patch('apps.Dermatologia_IA.utils.patientSearch.trigram_available', return_value=False):
+      self._assert_results()
+      self.assertEqual(self._names('Rodr'), ['Carlos', 'María'])
+
+  @override_settings(PATIENT_SEARCH_TRIGRAM_CHECK_TTL=300)
+  def test_trigram_check_is_repeated_after_ttl(self):
+    from apps.Dermatologia_IA.utils import patientSearch
+    cursor = mock.MagicMock()
+    cursor.__enter__.return_value.fetchone.side_effect = [None, (1,)]
+    fake_connection = SimpleNamespace(alias='trgm-ttl', vendor='postgresql', cursor=lambda: cursor)
+    clock = FakeClock()
+    with mock.patch.object(patientSearch, 'connection', fake_connection), \
+        mock.patch.object(patientSearch.time, 'monotonic', clock), \
+        mock.patch.dict(patientSearch._trigram_available, clear=True):
+      self.assertFalse(patientSearch.trigram_available())
+      clock.now += 299
+      self.assertFalse(patientSearch.trigram_available())
+      self.assertEqual(cursor.__enter__.return_value.execute.call_count, 1)
+      # Tras instalar la extensión se detecta sin reiniciar el proceso
+      clock.now += 1
+      self.assertTrue(patientSearch.trigram_available())
+
+  @skipUnless(connection.vendor == 'postgresql', "pg_trgm solo existe en PostgreSQL")
+  def test_trigram_search_tolerates_typos(self):
+    from apps.Dermatologia_IA.utils.patientSearch import trigram_available
+    if not trigram_available():
+      self.skipTest("Extensión pg_trgm no instalada")
+    self._assert_results()
+    self.assertEqual(self._names('Rodrigues'), ['Carlos'])
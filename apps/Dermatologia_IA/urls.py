@@ -2,17 +2,40 @@
 from django.urls import path
 
 from .views.generateReport_and_sendReportEmail import GenerateReportView, SendReportEmailView
-from .views.view_report_user_IA import UploadImageView, ProcessImageView, ReportListView, ReportDetailView
+from .views.view_report_export import ReportExportView
+from .views.view_report_user_IA import (
+    UploadImageView,
+    BatchUploadView,
+    BatchStatusView,
+    ProcessImageView,
+    ReportListView,
+    ReportSearchView,
+    ReportDetailView,
+    AnalysisStatusView,
+    AnalysisStreamView,
+    GradcamImageView,
+    ThumbnailView,
+    AIStatsView,
+)
 
 app_name = 'dermatology'
 
 urlpatterns = [
     path('upload/', UploadImageView.as_view(), name='upload_image'),
+    path('upload/batch/', BatchUploadView.as_view(), name='upload_batch'),
+    path('batch/<uuid:batch_id>/status/', BatchStatusView.as_view(), name='batch_status'),
     path('process/<int:image_id>/', ProcessImageView.as_view(), name='process_image'),
+    path('process/<int:image_id>/status/', AnalysisStatusView.as_view(), name='analysis_status'),
+    path('process/<int:image_id>/stream/', AnalysisStreamView.as_view(), name='analysis_stream'),
+    path('gradcam/<int:image_id>/<int:size>.<str:fmt>', GradcamImageView.as_view(), name='gradcam_image'),
+    path('thumbnail/<int:image_id>/<int:width>.<str:fmt>', ThumbnailView.as_view(), name='thumbnail'),
     path('reports/list/', ReportListView.as_view(), name='report_list'),
+    path('reports/search/', ReportSearchView.as_view(), name='report_search'),
     path('report_details/<int:image_id>/', ReportDetailView.as_view(), name='report_detail'),
+    path('ai/stats/', AIStatsView.as_view(), name='ai_stats'),
 
     # URL para generar el reporte PDF y enviarlo por email
     path('generate/report/<int:image_id>/', GenerateReportView.as_view(), name='generate_report'),
     path('send_report_email/<int:image_id>/', SendReportEmailView.as_view(), name='send_report_email'),
+    path('reports/export/', ReportExportView.as_view(), name='report_export'),
 ]
@@ -0,0 +1,195 @@
+# core/Dermatologia_IA/utils/aiComponents.py
+"""
+Cargador perezoso de los componentes de IA (TensorFlow, joblib, Gemini).
+
+Importar este módulo no importa TensorFlow, pandas, cv2, joblib ni
+google.generativeai: cada componente se importa y carga en su primer uso,
+de modo que los comandos de manage.py y las rutas que no usan IA no pagan
+el arranque de TensorFlow. `warm_up()` permite precargarlos explícitamente.
+"""
+
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+
+from apps.Dermatologia_IA.utils.circuitBreaker import CircuitBreaker
+
+# --- Configuración de Rutas de los Componentes de IA ---
+RESULTS_DIR = os.path.join(settings.BASE_DIR, 'Entrenamiento_IA', 'RESULTADOS_DEL_MODELO_ENTRENADO')
+MODEL_FILENAME = 'Modelo_IA_Entrenada.keras'
+PREPROCESSOR_FILENAME = 'metadata_preprocessor.joblib'
+MODEL_PATH = os.path.join(RESULTS_DIR, MODEL_FILENAME)
+PREPROCESSOR_PATH = os.path.join(RESULTS_DIR, PREPROCESSOR_FILENAME)
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-latest'
+
+all_possible_classes_in_data = ['AK', 'BCC', 'BKL', 'DF', 'MEL', 'NV', 'SCC', 'VASC']
+condition_classes = sorted(all_possible_classes_in_data)
+index_to_class = {i: name for i, name in enumerate(condition_classes)}
+
+_NOT_LOADED = object()
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_model_version(paths=(MODEL_PATH, PREPROCESSOR_PATH)):
+  """
+  Huella SHA-256 (16 caracteres) del contenido del modelo y del preprocesador.
+  Se guarda en la caché de Django por ruta, tamaño y fecha de modificación para
+  que cada proceso no tenga que leer el modelo completo.
+
+  Returns:
+      str: Huella o None si falta algún archivo.
+  """
+  from django.core.cache import cache
+  try:
+    stats = [(path, os.path.getsize(path), os.path.getmtime(path)) for path in paths]
+  except OSError:
+    return None
+  cache_key = 'model_version:' + hashlib.sha256(repr(stats).encode('utf-8')).hexdigest()
+  version = cache.get(cache_key)
+  if version is None:
+    digest = hashlib.sha256()
+    for path in paths:
+      with open(path, 'rb') as model_file:
+        for chunk in iter(lambda: model_file.read(FINGERPRINT_CHUNK_SIZE), b''):
+          digest.update(chunk)
+    version = digest.hexdigest()[:16]
+    cache.set(cache_key, version, timeout=None)
+  return version
+
+
+class AIComponents:
+  """Contenedor de los componentes de IA que se cargan una sola vez bajo demanda"""
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._keras_model = _NOT_LOADED
+    self._metadata_preprocessor = _NOT_LOADED
+    self._metadata_encoder = _NOT_LOADED
+    self._gemini_model = _NOT_LOADED
+    self._inference_batcher = _NOT_LOADED
+    self._gemini_executor = _NOT_LOADED
+    self._model_version = _NOT_LOADED
+    self.gemini_breaker = CircuitBreaker(
+      failure_threshold=settings.AI_GEMINI_BREAKER_THRESHOLD,
+      reset_timeout=settings.AI_GEMINI_BREAKER_COOLDOWN,
+    )
+
+  def _load_once(self, attr, loader):
+    value = getattr(self, attr)
+    if value is _NOT_LOADED:
+      with self._lock:
+        value = getattr(self, attr)
+        if value is _NOT_LOADED:
+          value = loader()
+          setattr(self, attr, value)
+    return value
+
+  @property
+  def keras_model(self):
+    """Modelo Keras entrenado o None si el archivo no existe"""
+    def load():
+      if not os.path.exists(MODEL_PATH):
+        print(f"Modelo de IA no encontrado en: {MODEL_PATH}")
+        return None
+      from tensorflow.keras.models import load_model
+      print(f"Cargando modelo de IA desde: {MODEL_PATH}")
+      return load_model(MODEL_PATH)
+    return self._load_once('_keras_model', load)
+
+  @property
+  def metadata_preprocessor(self):
+    """ColumnTransformer ajustado para los metadatos o None si no existe"""
+    def load():
+      if not os.path.exists(PREPROCESSOR_PATH):
+        print(f"Preprocesador de metadatos no encontrado en: {PREPROCESSOR_PATH}")
+        return None
+      import joblib
+      return joblib.load(PREPROCESSOR_PATH)
+    return self._load_once('_metadata_preprocessor', load)
+
+  @property
+  def metadata_encoder(self):
+    """Codificador vectorizado derivado del preprocesador o None si no es compatible"""
+    def load():
+      preprocessor = self.metadata_preprocessor
+      if preprocessor is None:
+        return None
+      from apps.Dermatologia_IA.utils.metadataEncoder import MetadataEncoder
+      try:
+        return MetadataEncoder.from_column_transformer(preprocessor)
+      except (AttributeError, ValueError) as e:
+        print(f"Codificador vectorizado no disponible, se usará el preprocesador de sklearn: {e}")
+        return None
+    return self._load_once('_metadata_encoder', load)
+
+  @property
+  def model_version(self):
+    """Huella del modelo y preprocesador en disco (ver `compute_model_version`)"""
+    return self._load_once('_model_version', compute_model_version)
+
+  @property
+  def gemini_model(self):
+    """Cliente de Gemini configurado o None si no hay GEMINI_API_KEY"""
+    def load():
+      if not settings.GEMINI_API_KEY:
+        return None
+      import google.generativeai as genai
+      genai.configure(api_key=settings.GEMINI_API_KEY)
+      return genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return self._load_once('_gemini_model', load)
+
+  @property
+  def gemini_executor(self):
+    """Pool de hilos compartido para las llamadas concurrentes a Gemini"""
+    def load():
+      from concurrent.futures import ThreadPoolExecutor
+      return ThreadPoolExecutor(max_workers=settings.AI_GEMINI_MAX_CONCURRENCY, thread_name_prefix='gemini')
+    return self._load_once('_gemini_executor', load)
+
+  @property
+  def inference_batcher(self):
+    """
+    Motor de micro-batching delante del modelo Keras o None si no hay modelo.
+    Cada elemento se resuelve con (probabilidades, indice_predicho, heatmap_gradcam).
+    """
+    def load():
+      model = self.keras_model
+      if model is None:
+        return None
+      from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+      from apps.Dermatologia_IA.utils.inferenceBatcher import InferenceBatcher
+      return InferenceBatcher(
+        lambda images, metadata: AIProcessor.predict_with_gradcam(images, metadata, model),
+        max_batch_size=settings.AI_BATCH_MAX_SIZE,
+        max_wait_ms=settings.AI_BATCH_MAX_WAIT_MS,
+      )
+    return self._load_once('_inference_batcher', load)
+
+  def is_available(self):
+    """Indica si el modelo y el preprocesador de metadatos están disponibles"""
+    return self.keras_model is not None and self.metadata_preprocessor is not None
+
+  def warm_up(self):
+    """
+    Importa y carga todos los componentes y ejecuta una predicción de prueba para
+    que la primera petición real no pague la construcción del grafo.
+
+    Returns:
+        bool: True si el sistema de IA quedó disponible.
+    """
+    self.gemini_model
+    self.metadata_encoder
+    if not self.is_available():
+      return False
+    import numpy as np
+    model = self.keras_model
+    image_shape = tuple(dim or 1 for dim in model.inputs[0].shape[1:])
+    metadata_shape = tuple(dim or 1 for dim in model.inputs[1].shape[1:])
+    self.inference_batcher.predict(np.zeros(image_shape, dtype=np.float32), np.zeros(metadata_shape, dtype=np.float32))
+    print("Componentes de IA precargados correctamente")
+    return True
+
+
+ai_components = AIComponents()
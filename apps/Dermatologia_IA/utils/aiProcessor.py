@@ -0,0 +1,604 @@
+# core/Dermatologia_IA/utils/aiProcessor.py
+"""
+Lógica de inferencia del módulo de dermatología (preprocesado, Grad-CAM y
+contenido de Gemini). Los componentes pesados se obtienen de `ai_components`
+y las librerías de IA se importan dentro de cada método, en su primer uso.
+"""
+
+import threading
+import time
+import traceback
+import weakref
+
+import numpy as np
+from django.conf import settings
+
+from apps.Dermatologia_IA.utils.aiComponents import (
+  ai_components,
+  condition_classes,
+  index_to_class,
+)
+from apps.Dermatologia_IA.utils.aiTextCache import ai_text_store
+from apps.Dermatologia_IA.utils.metadataEncoder import DEFAULT_AGE, METADATA_COLUMNS
+
+MODEL_INPUT_SIZE = 224
+
+# Prompts de Gemini (al modificarlos, incrementar aiTextCache.PROMPT_VERSION; la caché también separa por modo)
+REPORT_PROMPT = "Describe brevemente (máx. 500 caracteres) la condición {condition}: qué es, síntomas, causas. (Hazte pasar como un doctor real con una especialidad en desmatología)"
+TREATMENT_PROMPT = "Recomendaciones breves (máx. 500 caracteres) para la condición {condition}: tratamientos generales, cuidados, pastillas para tomar o cremas para aplicar en la zona afectada. Consulta dermatólogo esencial. (Hazte pasar como un doctor real con una especialidad en desmatología)"
+GENERATION_CONFIG = {'max_output_tokens': 150, 'temperature': 0.7}
+
+# Modo estructurado: reporte y tratamiento en una sola petición con respuesta JSON
+STRUCTURED_PROMPT = (
+  "Eres un doctor real con una especialidad en dermatología. Para la condición {condition} "
+  "responde únicamente con un objeto JSON con dos campos de texto: "
+  "\"report\": descripción breve (máx. 500 caracteres) de qué es, síntomas y causas; "
+  "\"treatment\": recomendaciones breves (máx. 500 caracteres) con tratamientos generales, cuidados, "
+  "pastillas para tomar o cremas para aplicar en la zona afectada, indicando que consultar a un dermatólogo es esencial."
+)
+STRUCTURED_GENERATION_CONFIG = {
+  'max_output_tokens': 400,
+  'temperature': 0.7,
+  'response_mime_type': 'application/json',
+}
+
+
+# --- Clase AIProcessor ---
+class AIProcessor:
+  """Clase para manejar la lógica de procesamiento con IA"""
+
+  @staticmethod
+  def reduced_decode_flag(image_path, min_side):
+    """
+    Elige el flag de lectura de OpenCV que decodifica un JPEG grande a resolución
+    reducida (1/2, 1/4 u 1/8 directamente en el DCT) sin bajar de `min_side` píxeles.
+
+    Returns:
+        Tupla de (flag_cv2, factor_de_reduccion)
+    """
+    import cv2
+    from PIL import Image
+    try:
+      with Image.open(image_path) as probe:
+        image_format, (width, height) = probe.format, probe.size
+    except Exception:
+      return cv2.IMREAD_COLOR, 1
+    if image_format != 'JPEG':
+      return cv2.IMREAD_COLOR, 1
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+      if max(width, height) / factor >= min_side and min(width, height) / factor >= MODEL_INPUT_SIZE:
+        return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+  @staticmethod
+  def preprocess_image_for_model(image_path, overlay_max_side=None, model_only=False):
+    """
+    Decodifica y preprocesa una imagen para el modelo.
+
+    El tensor del modelo siempre sale de redimensionar con INTER_LINEAR la imagen
+    decodificada (que nunca baja de 224 px en el lado menor), como la decodificación
+    completa original; solo la imagen base del Grad-CAM se limita a `overlay_max_side`.
+
+    Args:
+        image_path: Ruta de la imagen en disco
+        overlay_max_side: Lado máximo de la imagen base para el Grad-CAM. Por defecto
+            `AI_OVERLAY_MAX_SIDE`; con 0 se decodifica a resolución completa.
+        model_only: Solo construir el tensor del modelo (sin imagen base), con la
+            decodificación reducida que conserve 224 px en el lado menor.
+
+    Returns:
+        Tupla de (tensor (1, 224, 224, 3), imagen RGB base para la superposición o None)
+    """
+    import cv2
+    from tensorflow.keras.applications.resnet50 import preprocess_input
+    if overlay_max_side is None:
+      overlay_max_side = settings.AI_OVERLAY_MAX_SIDE
+    try:
+      if model_only:
+        flag, _ = AIProcessor.reduced_decode_flag(image_path, MODEL_INPUT_SIZE)
+      elif overlay_max_side:
+        flag, _ = AIProcessor.reduced_decode_flag(image_path, overlay_max_side)
+      else:
+        flag = cv2.IMREAD_COLOR
+      img = cv2.imread(image_path, flag)
+      if img is None:
+        raise ValueError(f"No se pudo cargar la imagen desde: {image_path}")
+      # Redimensionar antes de convertir a RGB da el mismo resultado con menos memoria
+      img_resized = cv2.resize(img, (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), interpolation=cv2.INTER_LINEAR)
+      img_preprocessed = preprocess_input(cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB))
+      img_array = np.expand_dims(img_preprocessed, axis=0)
+      if model_only:
+        return img_array, None
+
+      height, width = img.shape[:2]
+      if overlay_max_side and max(height, width) > overlay_max_side:
+        scale = overlay_max_side / max(height, width)
+        img = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+      img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+      return img_array, img_rgb
+    except Exception as e:
+      print(f"Error crítico al preprocesar la imagen {image_path}: {e}")
+      traceback.print_exc()
+      return None, None
+
+  @staticmethod
+  def preprocess_metadata_for_model(metadata_dict, fitted_preprocessor, encoder=None):
+    """
+    Codifica los metadatos de una imagen para el modelo.
+
+    Usa el codificador vectorizado (`MetadataEncoder`) cuando está disponible y
+    recurre al ColumnTransformer de sklearn con un DataFrame de pandas si no.
+    """
+    if encoder is not None:
+      try:
+        return encoder.encode(metadata_dict)
+      except Exception as e:
+        print(f"Error en el codificador vectorizado, usando el preprocesador de sklearn: {e}")
+    if not fitted_preprocessor:
+      print("Error crítico: Preprocesador de metadatos no disponible")
+      return None
+    import pandas as pd
+    try:
+      metadata_df = pd.DataFrame([metadata_dict])[METADATA_COLUMNS]
+      metadata_df['age_approx'] = pd.to_numeric(metadata_df['age_approx'], errors='coerce').fillna(DEFAULT_AGE)
+      for col in ['sex', 'anatom_site_general', 'dataset']:
+        metadata_df[col] = metadata_df[col].astype(str).fillna('unknown')
+      processed_metadata = fitted_preprocessor.transform(metadata_df)
+      return processed_metadata
+    except Exception as e:
+      print(f"Error crítico al procesar metadatos: {e}")
+      traceback.print_exc()
+      return None
+
+  # Funciones Grad-CAM compiladas, una por modelo cargado
+  _gradcam_cache = weakref.WeakKeyDictionary()
+  _fused_cache = weakref.WeakKeyDictionary()
+  _gradcam_lock = threading.Lock()
+
+  @staticmethod
+  def resolve_gradcam_layers(full_model):
+    """
+    Localiza la capa base (ResNet50) y su última capa convolucional.
+
+    Returns:
+        Tupla de (capa_base, ultima_capa_convolucional)
+
+    Raises:
+        ValueError: Si el modelo no tiene una capa base o convolucional válida.
+    """
+    import tensorflow as tf
+    base_model_layer = None
+    for name in ['resnet50_base', 'resnet', 'base_model', 'cnn_base']:
+      try:
+        base_model_layer = full_model.get_layer(name)
+        print(f"Modelo base encontrado: {name}")
+        break
+      except ValueError:
+        continue
+    if base_model_layer is None:
+      raise ValueError("No se pudo encontrar una capa base válida en el modelo")
+
+    for layer in reversed(base_model_layer.layers):
+      if isinstance(layer, (tf.keras.layers.Conv2D, tf.keras.layers.DepthwiseConv2D)):
+        print(f"Última capa convolucional encontrada: {layer.name}")
+        return base_model_layer, layer
+    raise ValueError(f"No se encontró capa convolucional en {base_model_layer.name}")
+
+  @classmethod
+  def get_gradcam_function(cls, full_model):
+    """
+    Devuelve la función Grad-CAM compilada para el modelo, construyéndola solo la
+    primera vez. Las llamadas posteriores solo pagan la pasada hacia adelante y atrás.
+
+    Returns:
+        Tupla de (tf.function(imagenes, indice_clase) -> heatmap, nombre_capa)
+    """
+    cached = cls._gradcam_cache.get(full_model)
+    if cached is not None:
+      return cached
+
+    import tensorflow as tf
+    with cls._gradcam_lock:
+      cached = cls._gradcam_cache.get(full_model)
+      if cached is not None:
+        return cached
+
+      base_model_layer, last_conv_layer = cls.resolve_gradcam_layers(full_model)
+      print("Creando modelo para Grad-CAM...")
+      image_only_grad_model = tf.keras.Model(
+        inputs=base_model_layer.input,
+        outputs=[last_conv_layer.output, base_model_layer.output]
+      )
+
+      @tf.function(input_signature=[
+        tf.TensorSpec(shape=tuple(base_model_layer.input.shape), dtype=tf.float32),
+        tf.TensorSpec(shape=[], dtype=tf.int32),
+      ])
+      def gradcam(images, pred_index):
+        with tf.GradientTape() as tape:
+          conv_output_value, base_output_value = image_only_grad_model(images, training=False)
+          tape.watch(conv_output_value)
+          # Usar el índice de la clase predicha o sumar todas las salidas
+          output_for_grads = tf.cond(
+            pred_index >= 0,
+            lambda: tf.reduce_sum(tf.gather(base_output_value, tf.maximum(pred_index, 0), axis=1)),
+            lambda: tf.reduce_sum(base_output_value)
+          )
+        grads = tape.gradient(output_for_grads, conv_output_value)
+        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
+        heatmap = tf.squeeze(tf.matmul(conv_output_value[0], pooled_grads[..., tf.newaxis]))
+        heatmap = tf.maximum(heatmap, 0)  # ReLU para mantener solo activaciones positivas
+        # Normalizar heatmap a [0,1] (un heatmap nulo se mantiene en cero)
+        return tf.math.divide_no_nan(heatmap, tf.reduce_max(heatmap))
+
+      cached = (gradcam, last_conv_layer.name)
+      cls._gradcam_cache[full_model] = cached
+      return cached
+
+  @classmethod
+  def build_fused_model(cls, full_model):
+    """
+    Reconstruye el modelo con la API funcional para que una sola pasada devuelva la
+    salida de la última capa convolucional, la de la capa base y las probabilidades.
+
+    Las capas del grafo externo se vuelven a llamar (compartiendo pesos) siguiendo las
+    conexiones de `full_model.get_config()`. La salida de la capa base solo se conecta
+    donde un nodo la referencia explícitamente; cualquier otra conexión desconocida
+    se rechaza.
+
+    Returns:
+        tf.keras.Model([imagenes, metadatos]) -> [conv, salida_base, probabilidades]
+
+    Raises:
+        ValueError: Si la arquitectura no permite separar la cabeza de clasificación.
+    """
+    import tensorflow as tf
+    base_model_layer, last_conv_layer = cls.resolve_gradcam_layers(full_model)
+    image_only_grad_model = tf.keras.Model(
+      inputs=base_model_layer.input,
+      outputs=[last_conv_layer.output, base_model_layer.output]
+    )
+    config = full_model.get_config()
+    output_layers = config['output_layers']
+    # Con una sola salida keras guarda la referencia sin envolver en una lista
+    if output_layers and isinstance(output_layers[0], str):
+      output_layers = [output_layers]
+    if len(config['input_layers']) != 2 or len(output_layers) != 1:
+      raise ValueError("Se esperaba un modelo con entradas (imagen, metadatos) y una sola salida")
+
+    image_input = tf.keras.Input(shape=full_model.inputs[0].shape[1:])
+    metadata_input = tf.keras.Input(shape=full_model.inputs[1].shape[1:])
+    # (capa, nodo, índice) del grafo original -> tensor equivalente del grafo nuevo
+    tensors = {
+      tuple(config['input_layers'][0]): image_input,
+      tuple(config['input_layers'][1]): metadata_input,
+    }
+
+    def resolve(value):
+      if isinstance(value, dict) and value.get('class_name') == '__keras_tensor__':
+        history = tuple(value['config']['keras_history'])
+        if history not in tensors:
+          raise ValueError(f"Conexión no soportada en la cabeza de clasificación: {history}")
+        return tensors[history]
+      if isinstance(value, (list, tuple)):
+        return type(value)(resolve(item) for item in value)
+      if isinstance(value, dict):
+        return {key: resolve(item) for key, item in value.items()}
+      return value
+
+    conv_output = None
+    for layer_config in config['layers']:
+      name = layer_config['name']
+      if layer_config['class_name'] == 'InputLayer':
+        continue
+      for node_index, node in enumerate(layer_config['inbound_nodes']):
+        args, kwargs = resolve(node['args']), resolve(node['kwargs'])
+        if name == base_model_layer.name:
+          if node_index > 0 or len(args) != 1 or args[0] is not image_input:
+            raise ValueError("La capa base debe aplicarse una sola vez y directamente a la imagen")
+          conv_output, base_output = image_only_grad_model(image_input)
+          tensors[(name, node_index, 0)] = base_output
+          continue
+        outputs = full_model.get_layer(name)(*args, **kwargs)
+        for tensor_index, tensor in enumerate(tf.nest.flatten(outputs)):
+          tensors[(name, node_index, tensor_index)] = tensor
+
+    if conv_output is None:
+      raise ValueError(f"La capa {base_model_layer.name} no está conectada en el modelo")
+    probabilities = tensors.get(tuple(output_layers[0]))
+    if probabilities is None:
+      raise ValueError("No se pudo reconstruir la salida del modelo")
+    return tf.keras.Model(
+      inputs=[image_input, metadata_input],
+      outputs=[conv_output, base_output, probabilities]
+    )
+
+  @classmethod
+  def get_fused_function(cls, full_model):
+    """
+    Devuelve la función compilada que, en una sola pasada hacia adelante bajo un
+    único GradientTape, calcula las probabilidades de clase y el heatmap Grad-CAM
+    de la clase predicha para cada imagen del lote.
+
+    Returns:
+        tf.function(imagenes, metadatos) -> (probabilidades, indices, heatmaps) o
+        None si la arquitectura del modelo no permite separar la cabeza de clasificación.
+    """
+    cached = cls._fused_cache.get(full_model)
+    if cached is not None:
+      return cached or None
+
+    import tensorflow as tf
+    with cls._gradcam_lock:
+      cached = cls._fused_cache.get(full_model)
+      if cached is not None:
+        return cached or None
+      try:
+        fused_model = cls.build_fused_model(full_model)
+      except Exception as e:
+        print(f"Inferencia fusionada no disponible, se usará predicción + Grad-CAM por separado: {e}")
+        cls._fused_cache[full_model] = False
+        return None
+
+      @tf.function(input_signature=[tf.TensorSpec(shape=tuple(t.shape), dtype=tf.float32) for t in fused_model.inputs])
+      def fused(images, metadata):
+        with tf.GradientTape() as tape:
+          conv_output_value, base_output_value, probabilities = fused_model([images, metadata], training=False)
+          tape.watch(conv_output_value)
+          pred_indices = tf.argmax(probabilities, axis=1, output_type=tf.int32)
+          # Misma salida objetivo que calculate_gradcam_image_only, por imagen del lote
+          output_for_grads = tf.reduce_sum(tf.gather(base_output_value, pred_indices, axis=1, batch_dims=1))
+        grads = tape.gradient(output_for_grads, conv_output_value)
+        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+        heatmaps = tf.maximum(tf.einsum('bhwc,bc->bhw', conv_output_value, pooled_grads), 0)
+        heatmaps = tf.math.divide_no_nan(heatmaps, tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True))
+        return probabilities, pred_indices, heatmaps
+
+      cls._fused_cache[full_model] = fused
+      return fused
+
+  @classmethod
+  def predict_with_gradcam(cls, images, metadata, full_model):
+    """
+    Predice un lote y calcula el heatmap Grad-CAM de la clase predicha de cada imagen.
+
+    Args:
+        images: Array (lote, 224, 224, 3) preprocesado
+        metadata: Array (lote, n_features) de metadatos codificados
+        full_model: Modelo completo de keras
+
+    Returns:
+        Tupla de (probabilidades, indices_predichos, heatmaps); un heatmap es None si falló.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    metadata = np.asarray(metadata, dtype=np.float32)
+    fused = cls.get_fused_function(full_model)
+    if fused is not None:
+      probabilities, pred_indices, heatmaps = fused(images, metadata)
+      return probabilities.numpy(), pred_indices.numpy(), list(heatmaps.numpy())
+
+    import tensorflow as tf
+    probabilities = full_model.predict([tf.constant(images), tf.constant(metadata)], verbose=0)
+    pred_indices = np.argmax(probabilities, axis=1)
+    heatmaps = [
+      cls.calculate_gradcam_image_only(images[i:i + 1], full_model, int(pred_indices[i]))[0]
+      for i in range(len(images))
+    ]
+    return probabilities, pred_indices, heatmaps
+
+  @classmethod
+  def calculate_gradcam_image_only(cls, img_array, full_model, actual_pred_index):
+    """
+    Calcula el mapa de calor Grad-CAM para la imagen usando solo la parte de imagen del modelo.
+
+    Args:
+        img_array: Array numpy de la imagen preprocesada
+        full_model: Modelo completo de keras
+        actual_pred_index: Índice de la clase predicha
+
+    Returns:
+        Tupla de (heatmap, nombre_capa) o (None, nombre_capa) si hay error
+    """
+    last_conv_layer_name = "Desconocida"
+    try:
+      gradcam, last_conv_layer_name = cls.get_gradcam_function(full_model)
+      heatmap_np = gradcam(np.asarray(img_array, dtype=np.float32), np.int32(actual_pred_index)).numpy()
+      print(
+        f"Heatmap generado exitosamente. Shape: {heatmap_np.shape}, Rango: [{np.min(heatmap_np)}, {np.max(heatmap_np)}]")
+      return heatmap_np, last_conv_layer_name
+
+    except Exception as e:
+      print(f"Error crítico al calcular Grad-CAM: {e}")
+      traceback.print_exc()
+      return None, last_conv_layer_name
+
+  @staticmethod
+  def default_ai_content(condition):
+    """Textos por defecto cuando Gemini no está disponible"""
+    return (
+      f"Descripción no disponible para {condition}. Consulte a un dermatólogo.",
+      f"Tratamiento no disponible para {condition}. Busque atención médica.",
+    )
+
+  @staticmethod
+  def _response_text(response):
+    """Texto de una respuesta de Gemini o None si viene vacía o bloqueada"""
+    try:
+      text = response.text
+    except (AttributeError, ValueError):
+      return None
+    return text.strip() or None
+
+  @staticmethod
+  def parse_structured_content(text):
+    """
+    Extrae los campos de la respuesta JSON del modo estructurado.
+
+    Returns:
+        Tupla de (reporte, tratamiento) truncados a 500 caracteres; cada campo es
+        None si falta o si el JSON no se pudo interpretar.
+    """
+    import json
+    if not text:
+      return None, None
+    start, end = text.find('{'), text.rfind('}')
+    try:
+      data = json.loads(text[start:end + 1] if start != -1 and end > start else text)
+    except ValueError:
+      print("Respuesta estructurada de Gemini no es JSON válido")
+      return None, None
+    if not isinstance(data, dict):
+      return None, None
+    fields = []
+    for key in ('report', 'treatment'):
+      value = data.get(key)
+      fields.append(value.strip()[:500] or None if isinstance(value, str) else None)
+    return tuple(fields)
+
+  @staticmethod
+  def _stream_text(response, field, partial, lock, abandoned):
+    """Acumula los fragmentos de una respuesta en streaming en `partial[field]`"""
+    text = ''
+    for chunk in response:
+      if abandoned.is_set():
+        break
+      # Sin strip por fragmento: los espacios entre fragmentos forman parte del texto
+      try:
+        text += chunk.text or ''
+      except (AttributeError, ValueError):
+        continue
+      with lock:
+        partial[field] = text.lstrip()[:500]
+    return text.strip() or None
+
+  @staticmethod
+  def request_ai_content(condition, gemini_model=None, breaker=None, deadline=None, executor=None, mode=None,
+                         on_progress=None):
+    """
+    Solicita a Gemini el reporte y el tratamiento de una condición. Las
+    peticiones se lanzan en paralelo con un plazo total; cada una lleva como
+    timeout del SDK el tiempo que queda del plazo, así que el hilo que la ejecuta
+    también termina a tiempo. Las que no terminan se abandonan y cuentan como
+    fallo por tiempo agotado en el circuit breaker.
+
+    Args:
+        condition: Clase predicha
+        gemini_model: Cliente con `generate_content` (por defecto `ai_components.gemini_model`)
+        breaker: CircuitBreaker a usar (por defecto `ai_components.gemini_breaker`)
+        deadline: Plazo total en segundos (por defecto `AI_GEMINI_DEADLINE`)
+        executor: Pool de hilos (por defecto `ai_components.gemini_executor`)
+        mode: 'split' (dos peticiones) o 'structured' (una petición JSON);
+            por defecto `AI_GEMINI_MODE`
+        on_progress: Función opcional que recibe {'report': ..., 'treatment': ...}
+            con el texto parcial; en modo 'split' las respuestas se piden en
+            streaming. Se invoca desde el hilo que llama a este método.
+
+    Returns:
+        Tupla de (reporte, tratamiento); cada campo es None si no se pudo generar.
+    """
+    from concurrent.futures import wait
+
+    gemini_model = gemini_model or ai_components.gemini_model
+    if not gemini_model:
+      print(f"Gemini AI no configurado. Usando valores por defecto para {condition}.")
+      return None, None
+    breaker = breaker or ai_components.gemini_breaker
+    if not breaker.allow_request():
+      print(f"Circuito de Gemini abierto. Usando valores por defecto para {condition}.")
+      return None, None
+    deadline = settings.AI_GEMINI_DEADLINE if deadline is None else deadline
+    executor = executor or ai_components.gemini_executor
+    structured = (mode or settings.AI_GEMINI_MODE) == 'structured'
+    stream = on_progress is not None and not structured
+
+    partial = {}
+    lock = threading.Lock()
+    abandoned = threading.Event()
+
+    expires = time.monotonic() + deadline
+
+    def generate(prompt, config, field):
+      # Una petición que espera en la cola del pool solo dispone de lo que queda del plazo
+      timeout = max(0.1, expires - time.monotonic())
+      kwargs = {'generation_config': config, 'request_options': {'timeout': timeout}}
+      if stream:
+        response = gemini_model.generate_content(prompt.format(condition=condition), stream=True, **kwargs)
+        return AIProcessor._stream_text(response, field, partial, lock, abandoned)
+      return AIProcessor._response_text(gemini_model.generate_content(prompt.format(condition=condition), **kwargs))
+
+    if structured:
+      requests = [(STRUCTURED_PROMPT, STRUCTURED_GENERATION_CONFIG, None)]
+    else:
+      requests = [(REPORT_PROMPT, GENERATION_CONFIG, 'report'), (TREATMENT_PROMPT, GENERATION_CONFIG, 'treatment')]
+    futures = [executor.submit(generate, *request) for request in requests]
+
+    interval = settings.AI_STREAM_FLUSH_INTERVAL if stream else deadline
+    reported = {}
+    while True:
+      done, not_done = wait(futures, timeout=max(0.0, min(interval, expires - time.monotonic())))
+      if stream:
+        with lock:
+          snapshot = dict(partial)
+        if snapshot != reported:
+          on_progress(snapshot)
+          reported = snapshot
+      if not not_done or time.monotonic() >= expires:
+        break
+
+    failed = timed_out = bool(not_done)
+    if not_done:
+      print(f"Gemini AI superó el plazo de {deadline}s para {condition}.")
+      abandoned.set()
+      # cancel() solo descarta las que siguen en cola; las que están en curso acaban por su timeout
+      for future in not_done:
+        future.cancel()
+
+    texts = []
+    for future in futures:
+      if future not in done:
+        texts.append(None)
+        continue
+      try:
+        texts.append(future.result())
+      except Exception as e:
+        failed = True
+        timed_out = timed_out or AIProcessor._is_timeout(e)
+        print(f"Error crítico al generar contenido con Gemini AI para {condition}: {e}")
+        texts.append(None)
+
+    if failed:
+      breaker.record_failure(timeout=timed_out)
+    else:
+      breaker.record_success()
+    if structured:
+      return AIProcessor.parse_structured_content(texts[0])
+    return tuple(text[:500] if text else None for text in texts)
+
+  @staticmethod
+  def _is_timeout(error):
+    """Indica si un error de Gemini es el vencimiento del timeout de la petición"""
+    if isinstance(error, TimeoutError):
+      return True
+    try:
+      from google.api_core.exceptions import DeadlineExceeded
+    except ImportError:
+      return False
+    return isinstance(error, DeadlineExceeded)
+
+  @staticmethod
+  def generate_ai_content(condition, on_progress=None):
+    """
+    Devuelve el reporte y el tratamiento de una condición, desde la caché
+    persistente si hay una variante vigente o generándolos con Gemini si no.
+    `on_progress` recibe el texto parcial mientras Gemini lo genera.
+    """
+    cached = ai_text_store.get(condition)
+    if cached is not None:
+      return cached
+    ai_report, ai_treatment = AIProcessor.request_ai_content(condition, on_progress=on_progress)
+    if ai_report and ai_treatment:
+      ai_text_store.put(condition, ai_report, ai_treatment)
+    default_report, default_treatment = AIProcessor.default_ai_content(condition)
+    return ai_report or default_report, ai_treatment or default_treatment
@@ -0,0 +1,141 @@
+# core/Dermatologia_IA/utils/aiTextCache.py
+"""
+Caché persistente de los textos de Gemini por condición.
+
+Los prompts de `AIProcessor.generate_ai_content` solo dependen de la condición
+predicha, así que el reporte y el tratamiento se guardan en la tabla
+`AITextCache` (clave: condición, versión del prompt con el modo de Gemini y modelo) con una vigencia
+(`AI_TEXT_CACHE_TTL`) y hasta `AI_TEXT_CACHE_VARIANTS` variantes por condición.
+Delante de la base de datos hay una LRU en memoria por proceso; sus entradas
+caducan a los `AI_TEXT_CACHE_LOCAL_TTL` segundos para recoger los cambios que
+otros procesos hagan en la tabla (`put`, `refresh_ai_texts`). El comando
+`refresh_ai_texts` repuebla la tabla sin pasar por el análisis.
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.Dermatologia_IA.models import AITextCache
+from apps.Dermatologia_IA.utils.aiComponents import GEMINI_MODEL_NAME
+from apps.Dermatologia_IA.utils.statsCounters import hit_miss_stats, increment
+
+# Incrementar al cambiar los prompts para no servir textos generados con los anteriores
+PROMPT_VERSION = 'v1'
+HITS_KEY = 'ai_text_cache:hits'
+MISSES_KEY = 'ai_text_cache:misses'
+
+
+class AITextStore:
+  """LRU en memoria delante de la tabla AITextCache"""
+
+  def __init__(self, max_entries=None, prompt_version=PROMPT_VERSION, model_name=GEMINI_MODEL_NAME):
+    self.max_entries = max_entries or settings.AI_TEXT_CACHE_LRU_SIZE
+    self.prompt_version = prompt_version
+    self.model_name = model_name
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def prompt_key(self, mode=None):
+    """Versión guardada en la tabla: los modos 'split' y 'structured' usan prompts distintos"""
+    return f'{self.prompt_version}-{mode or settings.AI_GEMINI_MODE}'
+
+  def _queryset(self, condition, mode=None):
+    return AITextCache.objects.filter(
+      condition=condition,
+      prompt_version=self.prompt_key(mode),
+      model_name=self.model_name,
+    )
+
+  def _local_get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      expires_at, variants = entry
+      if expires_at <= timezone.now():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return variants
+
+  def _local_set(self, key, expires_at, variants):
+    with self._lock:
+      self._entries[key] = (expires_at, variants)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def invalidate(self, condition=None):
+    """Descarta la LRU local de una condición en todos los modos (o completa)"""
+    with self._lock:
+      if condition is None:
+        self._entries.clear()
+      else:
+        for key in [key for key in self._entries if key[1] == condition]:
+          del self._entries[key]
+
+  def get(self, condition, mode=None):
+    """
+    Returns:
+        Tupla de (reporte, tratamiento) de una variante vigente al azar o None.
+    """
+    key = (self.prompt_key(mode), condition)
+    variants = self._local_get(key)
+    if variants is None:
+      rows = list(
+        self._queryset(condition, mode)
+        .filter(expires_at__gt=timezone.now())
+        .values_list('report', 'treatment', 'expires_at')
+      )
+      if rows:
+        variants = [(report, treatment) for report, treatment, _ in rows]
+        # invalidate() solo limpia la LRU de este proceso: la de los demás se renueva por tiempo
+        local_expires_at = timezone.now() + timedelta(seconds=settings.AI_TEXT_CACHE_LOCAL_TTL)
+        self._local_set(key, min(local_expires_at, *(expires_at for _, _, expires_at in rows)), variants)
+    if not variants:
+      increment(MISSES_KEY)
+      return None
+    increment(HITS_KEY)
+    return random.choice(variants)
+
+  def put(self, condition, report, treatment, variant=None, mode=None):
+    """
+    Guarda una variante generada en `mode` (por defecto `AI_GEMINI_MODE`). Sin
+    `variant` explícita ocupa el primer hueco libre o reemplaza la variante más antigua.
+    """
+    now = timezone.now()
+    if variant is None:
+      existing = dict(self._queryset(condition, mode).values_list('variant', 'created_at'))
+      free = [v for v in range(settings.AI_TEXT_CACHE_VARIANTS) if v not in existing]
+      variant = free[0] if free else min(existing, key=existing.get)
+    AITextCache.objects.update_or_create(
+      condition=condition,
+      prompt_version=self.prompt_key(mode),
+      model_name=self.model_name,
+      variant=variant,
+      defaults={
+        'report': report,
+        'treatment': treatment,
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=settings.AI_TEXT_CACHE_TTL),
+      },
+    )
+    self.invalidate(condition)
+
+  def purge_expired(self):
+    """Elimina las variantes vencidas; devuelve cuántas se borraron"""
+    deleted, _ = AITextCache.objects.filter(expires_at__lte=timezone.now()).delete()
+    self.invalidate()
+    return deleted
+
+  @staticmethod
+  def stats():
+    return hit_miss_stats(HITS_KEY, MISSES_KEY)
+
+
+ai_text_store = AITextStore()
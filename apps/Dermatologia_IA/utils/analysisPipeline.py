@@ -0,0 +1,321 @@
+# core/Dermatologia_IA/utils/analysisPipeline.py
+"""
+Pipeline de análisis en segundo plano.
+
+`UploadImageView` encola un `AnalysisJob` en la base de datos y un pool de workers
+(comando `run_analysis_workers`) lo consume: preprocesado, predicción, Grad-CAM,
+contenido de Gemini y guardado del resultado en `SkinImage`.
+
+Cada etapa se guarda en la fila en cuanto termina (diagnóstico, Grad-CAM y
+texto parcial de Gemini) para que `AnalysisStreamView` la transmita por SSE
+antes de que el análisis completo finalice.
+"""
+
+import threading
+import traceback
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.Dermatologia_IA.models import AnalysisJob, SkinImage
+from apps.Dermatologia_IA.utils.aiComponents import ai_components, index_to_class
+from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+from apps.Dermatologia_IA.utils.gradcamRenderer import encode_heatmap
+from apps.Dermatologia_IA.utils.predictionCache import reuse_cached_prediction
+from apps.Dermatologia_IA.utils.thumbnails import generate_thumbnails
+from apps.core.utils.analytics import record_processed
+
+
+def enqueue_analysis(skin_image):
+  """
+  Marca la imagen como pendiente y encola su trabajo de análisis.
+
+  Returns:
+      AnalysisJob: El trabajo creado.
+  """
+  with transaction.atomic():
+    SkinImage.objects.filter(pk=skin_image.pk).update(status=SkinImage.STATUS_PENDING, error_message=None)
+    skin_image.status = SkinImage.STATUS_PENDING
+    return AnalysisJob.objects.create(skin_image=skin_image)
+
+
+def save_partial_result(skin_image, **fields):
+  """Guarda una etapa intermedia del análisis sin marcar la imagen como procesada"""
+  SkinImage.objects.filter(pk=skin_image.pk).update(**fields)
+
+
+def prepare_inputs(skin_image):
+  """
+  Preprocesa la imagen y los metadatos de una SkinImage.
+
+  Returns:
+      Tupla de (tensor de imagen sin dimensión de lote, vector de metadatos)
+
+  Raises:
+      ValueError: Si la imagen o los metadatos no se pudieron preprocesar.
+  """
+  # La superposición se renderiza bajo demanda, así que solo se construye el tensor del modelo
+  img_array, _ = AIProcessor.preprocess_image_for_model(skin_image.image.path, model_only=True)
+  if img_array is None:
+    raise ValueError('No se pudo preprocesar la imagen')
+
+  meta = AIProcessor.preprocess_metadata_for_model({
+    'age_approx': skin_image.age_approx,
+    'sex': skin_image.sex,
+    'anatom_site_general': skin_image.anatom_site_general,
+    'dataset': 'ISIC'
+  }, ai_components.metadata_preprocessor, encoder=ai_components.metadata_encoder)
+  if meta is None:
+    raise ValueError('No se pudo preprocesar metadatos')
+  return img_array[0], meta[0]
+
+
+def finish_analysis(skin_image, preds, idx, heatmap):
+  """
+  Guarda el diagnóstico, el Grad-CAM y el contenido de Gemini de una predicción.
+
+  Returns:
+      list: Advertencias no fatales (p. ej. fallo del Grad-CAM).
+  """
+  warnings = []
+  idx = int(idx)
+  skin_image.condition = index_to_class.get(idx, 'Condición desconocida')
+  skin_image.confidence = float(preds[idx] * 100)
+  skin_image.model_version = ai_components.model_version
+  save_partial_result(skin_image, condition=skin_image.condition, confidence=skin_image.confidence,
+                      model_version=skin_image.model_version)
+
+  # Grad-CAM: solo se guarda el heatmap; la superposición se renderiza al pedirla
+  if heatmap is not None:
+    skin_image.gradcam_heatmap = encode_heatmap(heatmap)
+    skin_image.gradcam_path = None
+    save_partial_result(skin_image, gradcam_heatmap=skin_image.gradcam_heatmap, gradcam_path=None)
+  else:
+    warnings.append('No se pudo generar el mapa de calor: heatmap vacío')
+
+  # Miniaturas de la imagen original para las páginas de resultados y listados
+  try:
+    generate_thumbnails(skin_image.image.name)
+  except Exception as thumb_error:
+    print(f"Error al generar miniaturas: {thumb_error}")
+
+  # Contenido IA
+  skin_image.ai_report, skin_image.ai_treatment = AIProcessor.generate_ai_content(
+    skin_image.condition,
+    on_progress=lambda partial: save_partial_result(
+      skin_image, ai_report=partial.get('report'), ai_treatment=partial.get('treatment')
+    ),
+  )
+
+  was_processed = skin_image.processed
+  skin_image.processed = True
+  skin_image.status = SkinImage.STATUS_DONE
+  skin_image.error_message = '\n'.join(warnings) or None
+  skin_image.save()
+  if not was_processed:
+    record_processed([skin_image])
+  return warnings
+
+
+def run_analysis(skin_image):
+  """
+  Ejecuta el análisis completo de una imagen y guarda el resultado.
+
+  Args:
+      skin_image: Instancia de SkinImage a procesar.
+
+  Returns:
+      list: Advertencias no fatales (p. ej. fallo del Grad-CAM).
+
+  Raises:
+      Exception: Si el análisis no puede completarse.
+  """
+  # Una imagen idéntica pudo terminar de procesarse mientras esta esperaba en la cola
+  if reuse_cached_prediction(skin_image, record_miss=False):
+    return []
+
+  if not ai_components.is_available():
+    raise RuntimeError('Sistema de IA no disponible')
+
+  image, meta = prepare_inputs(skin_image)
+  # Predicción y Grad-CAM en una sola pasada (agrupada con otros análisis concurrentes)
+  preds, idx, heatmap = ai_components.inference_batcher.predict(image, meta)
+  return finish_analysis(skin_image, preds, idx, heatmap)
+
+
+def run_batch_analysis(skin_images):
+  """
+  Analiza las imágenes de una subida múltiple con una sola pasada del modelo.
+
+  Args:
+      skin_images: Lista de SkinImage del mismo lote.
+
+  Returns:
+      dict: Error por id de imagen para las que no pudieron completarse.
+  """
+  errors = {}
+  pending = [si for si in skin_images if not reuse_cached_prediction(si, record_miss=False)]
+  if not pending:
+    return errors
+  if not ai_components.is_available():
+    return {si.id: RuntimeError('Sistema de IA no disponible') for si in pending}
+
+  prepared = []
+  for si in pending:
+    try:
+      prepared.append((si, *prepare_inputs(si)))
+    except Exception as error:
+      traceback.print_exc()
+      errors[si.id] = error
+  if not prepared:
+    return errors
+
+  images = np.stack([item[1] for item in prepared])
+  metadata = np.stack([item[2] for item in prepared])
+  try:
+    preds, indices, heatmaps = AIProcessor.predict_with_gradcam(images, metadata, ai_components.keras_model)
+  except Exception as error:
+    traceback.print_exc()
+    errors.update({item[0].id: error for item in prepared})
+    return errors
+
+  for i, (si, _, _) in enumerate(prepared):
+    try:
+      finish_analysis(si, preds[i], indices[i], heatmaps[i] if heatmaps is not None else None)
+    except Exception as error:
+      traceback.print_exc()
+      errors[si.id] = error
+  return errors
+
+
+def retry_delay(attempts):
+  """Espera antes del siguiente intento tras `attempts` intentos fallidos"""
+  return timedelta(seconds=settings.AI_ANALYSIS_RETRY_BACKOFF * 2 ** max(attempts - 1, 0))
+
+
+def _claimable_jobs():
+  now = timezone.now()
+  stale_before = now - timedelta(seconds=settings.AI_ANALYSIS_JOB_TIMEOUT)
+  return (
+    AnalysisJob.objects
+    .select_for_update(skip_locked=True, of=('self',))
+    .filter(
+      Q(status=SkinImage.STATUS_PENDING, next_attempt_at__lte=now) |
+      Q(status=SkinImage.STATUS_RUNNING, started_at__lt=stale_before)
+    )
+    .order_by('created_at')
+  )
+
+
+def _mark_running(jobs):
+  now = timezone.now()
+  for job in jobs:
+    job.status = SkinImage.STATUS_RUNNING
+    job.attempts += 1
+    job.started_at = now
+  AnalysisJob.objects.bulk_update(jobs, ['status', 'attempts', 'started_at'])
+  SkinImage.objects.filter(pk__in=[job.skin_image_id for job in jobs]).update(status=SkinImage.STATUS_RUNNING)
+
+
+def claim_next_jobs():
+  """
+  Reserva el siguiente trabajo y, si pertenece a una subida múltiple, el resto de
+  trabajos disponibles del mismo lote (hasta `AI_BATCH_UPLOAD_MAX_IMAGES`).
+
+  Returns:
+      list: Trabajos reservados (vacía si la cola está vacía).
+  """
+  with transaction.atomic():
+    job = _claimable_jobs().select_related('skin_image').first()
+    if job is None:
+      return []
+    jobs = [job]
+    batch_id = job.skin_image.batch_id
+    if batch_id is not None:
+      jobs += list(
+        _claimable_jobs()
+        .select_related('skin_image')
+        .filter(skin_image__batch_id=batch_id)
+        .exclude(pk=job.pk)[:settings.AI_BATCH_UPLOAD_MAX_IMAGES - 1]
+      )
+    _mark_running(jobs)
+  return jobs
+
+
+def _finish_job(job, error=None):
+  now = timezone.now()
+  if error is None:
+    job.status = SkinImage.STATUS_DONE
+    job.last_error = None
+  else:
+    job.last_error = str(error)
+    if job.attempts < settings.AI_ANALYSIS_MAX_ATTEMPTS:
+      job.status = SkinImage.STATUS_PENDING
+      job.next_attempt_at = now + retry_delay(job.attempts)
+    else:
+      job.status = SkinImage.STATUS_FAILED
+    SkinImage.objects.filter(pk=job.skin_image_id).update(status=job.status, error_message=str(error))
+  job.finished_at = now
+  job.save(update_fields=['status', 'last_error', 'finished_at', 'next_attempt_at'])
+  return job
+
+
+def process_job(job):
+  """Ejecuta un trabajo reservado y actualiza su estado y el de la imagen"""
+  try:
+    skin_image = SkinImage.objects.get(pk=job.skin_image_id)
+    run_analysis(skin_image)
+    print(f"Análisis completado para imagen ID {skin_image.id}: {skin_image.condition}")
+  except Exception as error:
+    traceback.print_exc()
+    return _finish_job(job, error)
+  return _finish_job(job)
+
+
+def process_jobs(jobs):
+  """Ejecuta trabajos reservados; los de un mismo lote comparten una pasada del modelo"""
+  if len(jobs) == 1:
+    return [process_job(jobs[0])]
+  errors = run_batch_analysis([job.skin_image for job in jobs])
+  print(f"Lote de {len(jobs)} imágenes analizado ({len(errors)} con error)")
+  return [_finish_job(job, errors.get(job.skin_image_id)) for job in jobs]
+
+
+class AnalysisWorkerPool:
+  """Pool de hilos que consume la cola de trabajos de análisis"""
+
+  def __init__(self, workers=None, poll_interval=None):
+    self.workers = workers or settings.AI_ANALYSIS_WORKERS
+    self.poll_interval = poll_interval or settings.AI_ANALYSIS_POLL_INTERVAL
+    self._stop = threading.Event()
+    self._threads = []
+
+  def start(self):
+    for i in range(self.workers):
+      thread = threading.Thread(target=self._run, name=f'analysis-worker-{i}', daemon=True)
+      thread.start()
+      self._threads.append(thread)
+
+  def stop(self, timeout=None):
+    self._stop.set()
+    for thread in self._threads:
+      thread.join(timeout)
+
+  def _run(self):
+    while not self._stop.is_set():
+      close_old_connections()
+      try:
+        jobs = claim_next_jobs()
+        if jobs:
+          process_jobs(jobs)
+          continue
+      except Exception as e:
+        print(f"Error crítico en el worker de análisis: {e}")
+        traceback.print_exc()
+      finally:
+        close_old_connections()
+      self._stop.wait(self.poll_interval)
@@ -0,0 +1,90 @@
+# core/Dermatologia_IA/utils/circuitBreaker.py
+"""
+Circuit breaker para servicios externos (Gemini).
+
+Tras `failure_threshold` fallos consecutivos el circuito se abre y las llamadas
+se rechazan sin tocar el servicio durante `reset_timeout` segundos. Pasado ese
+tiempo se deja pasar una única llamada de prueba (semiabierto): si tiene éxito el
+circuito se cierra, si falla se vuelve a abrir. Los fallos por tiempo agotado
+cuentan igual que el resto y además se acumulan aparte en `get_stats()`.
+"""
+
+import threading
+import time
+
+
+class CircuitBreaker:
+  """Circuit breaker seguro entre hilos con reloj inyectable"""
+
+  CLOSED = 'closed'
+  OPEN = 'open'
+  HALF_OPEN = 'half_open'
+
+  def __init__(self, failure_threshold=5, reset_timeout=60.0, clock=time.monotonic):
+    """
+    Args:
+        failure_threshold: Fallos consecutivos que abren el circuito.
+        reset_timeout: Segundos que permanece abierto antes de la llamada de prueba.
+        clock: Función que devuelve el tiempo actual en segundos (para pruebas).
+    """
+    if failure_threshold < 1:
+      raise ValueError("failure_threshold debe ser al menos 1")
+    self.failure_threshold = int(failure_threshold)
+    self.reset_timeout = float(reset_timeout)
+    self.clock = clock
+    self._lock = threading.Lock()
+    self._state = self.CLOSED
+    self._failures = 0
+    self._timeouts = 0
+    self._opened_at = 0.0
+    self._probe_in_flight = False
+
+  @property
+  def state(self):
+    with self._lock:
+      if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+        return self.HALF_OPEN
+      return self._state
+
+  def allow_request(self):
+    """Indica si se puede llamar al servicio; en semiabierto solo autoriza una llamada de prueba"""
+    with self._lock:
+      if self._state == self.CLOSED:
+        return True
+      if self._state == self.OPEN:
+        if self.clock() - self._opened_at < self.reset_timeout:
+          return False
+        self._state = self.HALF_OPEN
+        self._probe_in_flight = False
+      if self._probe_in_flight:
+        return False
+      self._probe_in_flight = True
+      return True
+
+  def record_success(self):
+    with self._lock:
+      self._state = self.CLOSED
+      self._failures = 0
+      self._probe_in_flight = False
+
+  def record_failure(self, timeout=False):
+    """Registra un fallo; `timeout` indica que la llamada agotó su plazo"""
+    with self._lock:
+      self._failures += 1
+      if timeout:
+        self._timeouts += 1
+      self._probe_in_flight = False
+      if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+
+  def get_stats(self):
+    state = self.state
+    with self._lock:
+      return {
+        'state': state,
+        'consecutive_failures': self._failures,
+        'timeouts': self._timeouts,
+        'failure_threshold': self.failure_threshold,
+        'reset_timeout': self.reset_timeout,
+      }
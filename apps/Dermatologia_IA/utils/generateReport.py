@@ -2,157 +2,150 @@
 import os
 
 from django.conf import settings
-from django.http import HttpResponse
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as ReportlabImage
 
-from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.gradcamRenderer import render_overlay
+from apps.Dermatologia_IA.utils.pdfImages import prepare_pdf_image, target_pixels
 
+# Recuadro (ancho, alto) en pulgadas de la imagen original y del Grad-CAM
+PDF_IMAGE_BOX = (2.5, 2.5)
 
-def generate_report(image_id):
+
+def report_filename(image_id):
+  return f"reporte_dermatologico_{image_id}.pdf"
+
+
+def build_report_pdf(skin_image, output, dpi=None, quality=None, grayscale=None):
   """
-  Genera un reporte PDF para una imagen dermatológica procesada.
+  Construye el documento PDF de una imagen procesada con ReportLab.
   Args:
-      image_id (int): ID de la imagen en la base de datos.
-  Returns:
-      HttpResponse: Respuesta con el PDF generado o None si hay un error.
+      skin_image (SkinImage): Imagen procesada.
+      output: Ruta o archivo binario donde escribir el PDF.
+      dpi, quality, grayscale: Opciones de las imágenes incrustadas (ver `prepare_pdf_image`).
   """
-  try:
-    # Obtener la instancia de SkinImage
-    skin_image = SkinImage.objects.get(id=image_id, processed=True)
+  image_options = {'dpi': dpi, 'quality': quality, 'grayscale': grayscale}
+  box_width, box_height = PDF_IMAGE_BOX[0] * inch, PDF_IMAGE_BOX[1] * inch
+  dpi = settings.REPORT_IMAGE_DPI if dpi is None else dpi
+  # El Grad-CAM se renderiza al tamaño de caché más cercano a los píxeles del recuadro
+  gradcam_size = max(target_pixels(PDF_IMAGE_BOX, dpi)) if dpi > 0 else max(settings.AI_GRADCAM_SIZES)
 
-    # Crear una respuesta HttpResponse con tipo de contenido PDF
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-      f'attachment; filename="reporte_dermatologico_{image_id}.pdf"'
-    )
+  # Configurar el documento PDF con ReportLab
+  doc = SimpleDocTemplate(
+    output,
+    pagesize=letter,
+    leftMargin=0.75 * inch,
+    rightMargin=0.75 * inch,
+    topMargin=0.75 * inch,
+    bottomMargin=0.75 * inch,
+  )
+  styles = getSampleStyleSheet()
+  h1 = styles['h1']
+  h2 = styles['h2']
+  h3 = styles['h3']
+  normal = styles['Normal']
+  normal.wordWrap = 'CJK'
+  italic = styles['Italic']
 
-    # Configurar el documento PDF con ReportLab
-    doc = SimpleDocTemplate(
-      response,
-      pagesize=letter,
-      leftMargin=0.75 * inch,
-      rightMargin=0.75 * inch,
-      topMargin=0.75 * inch,
-      bottomMargin=0.75 * inch,
-    )
-    styles = getSampleStyleSheet()
-    h1 = styles['h1']
-    h2 = styles['h2']
-    h3 = styles['h3']
-    normal = styles['Normal']
-    normal.wordWrap = 'CJK'
-    italic = styles['Italic']
-
-    # Construir contenido
-    story = [
-      Paragraph("Reporte de Análisis Dermatológico Preliminar", h1),
-      Spacer(1, 0.2 * inch),
-      Paragraph("Datos del Paciente e Imagen:", h2),
-      Paragraph(f"<b>ID de Imagen:</b> {skin_image.id}", normal),
-    ]
-
-    # Datos de paciente
-    if skin_image.first_name or skin_image.last_name:
-      nombre = f"{skin_image.first_name or ''} {skin_image.last_name or ''}".strip()
-      story.append(Paragraph(f"<b>Nombre:</b> {nombre}", normal))
-    if skin_image.dni:
-      story.append(Paragraph(f"<b>DNI:</b> {skin_image.dni}", normal))
-    if skin_image.phone:
-      story.append(Paragraph(f"<b>Teléfono:</b> {skin_image.phone}", normal))
-    if skin_image.email:
-      story.append(Paragraph(f"<b>Correo Electrónico:</b> {skin_image.email}", normal))
-    if skin_image.uploaded_at:
-      story.append(
-        Paragraph(
-          f"<b>Fecha de Análisis:</b> {skin_image.uploaded_at.strftime('%Y-%m-%d %H:%M')}",
-          normal,
-        )
-      )
-    if skin_image.age_approx is not None:
-      story.append(
-        Paragraph(f"<b>Edad Aproximada:</b> {skin_image.age_approx}", normal)
-      )
-    if skin_image.sex:
-      story.append(
-        Paragraph(f"<b>Sexo:</b> {skin_image.get_sex_display()}", normal)
+  # Construir contenido
+  story = [
+    Paragraph("Reporte de Análisis Dermatológico Preliminar", h1),
+    Spacer(1, 0.2 * inch),
+    Paragraph("Datos del Paciente e Imagen:", h2),
+    Paragraph(f"<b>ID de Imagen:</b> {skin_image.id}", normal),
+  ]
+
+  # Datos de paciente
+  if skin_image.first_name or skin_image.last_name:
+    nombre = f"{skin_image.first_name or ''} {skin_image.last_name or ''}".strip()
+    story.append(Paragraph(f"<b>Nombre:</b> {nombre}", normal))
+  if skin_image.dni:
+    story.append(Paragraph(f"<b>DNI:</b> {skin_image.dni}", normal))
+  if skin_image.phone:
+    story.append(Paragraph(f"<b>Teléfono:</b> {skin_image.phone}", normal))
+  if skin_image.email:
+    story.append(Paragraph(f"<b>Correo Electrónico:</b> {skin_image.email}", normal))
+  if skin_image.uploaded_at:
+    story.append(
+      Paragraph(
+        f"<b>Fecha de Análisis:</b> {skin_image.uploaded_at.strftime('%Y-%m-%d %H:%M')}",
+        normal,
       )
-    if skin_image.anatom_site_general:
-      story.append(
-        Paragraph(
-          f"<b>Localización Anatómica:</b> {skin_image.get_anatom_site_general_display()}",
-          normal,
-        )
+    )
+  if skin_image.age_approx is not None:
+    story.append(
+      Paragraph(f"<b>Edad Aproximada:</b> {skin_image.age_approx}", normal)
+    )
+  if skin_image.sex:
+    story.append(
+      Paragraph(f"<b>Sexo:</b> {skin_image.get_sex_display()}", normal)
+    )
+  if skin_image.anatom_site_general:
+    story.append(
+      Paragraph(
+        f"<b>Localización Anatómica:</b> {skin_image.get_anatom_site_general_display()}",
+        normal,
       )
-    story.append(Spacer(1, 0.2 * inch))
-
-    # Imagen original
-    img_path = skin_image.image.path
-    if os.path.exists(img_path):
-      story.append(Paragraph("Imagen Analizada:", h3))
-      try:
-        img = ReportlabImage(img_path, width=2.5 * inch, height=2.5 * inch)
-        img.hAlign = 'CENTER'
-        story.extend([img, Spacer(1, 0.1 * inch)])
-      except Exception:
-        story.append(Paragraph("<i>Error al cargar imagen original.</i>", italic))
-    else:
-      story.append(Paragraph("<i>Imagen original no encontrada.</i>", italic))
-
-    # Grad-CAM
+    )
+  story.append(Spacer(1, 0.2 * inch))
+
+  # Imagen original
+  img_path = skin_image.image.path
+  if os.path.exists(img_path):
+    story.append(Paragraph("Imagen Analizada:", h3))
+    try:
+      img = ReportlabImage(prepare_pdf_image(img_path, PDF_IMAGE_BOX, **image_options), width=box_width, height=box_height)
+      img.hAlign = 'CENTER'
+      story.extend([img, Spacer(1, 0.1 * inch)])
+    except Exception:
+      story.append(Paragraph("<i>Error al cargar imagen original.</i>", italic))
+  else:
+    story.append(Paragraph("<i>Imagen original no encontrada.</i>", italic))
+
+  # Grad-CAM
+  try:
+    grad_fs = render_overlay(skin_image, gradcam_size, 'jpg')
+  except Exception:
     grad_fs = None
-    if skin_image.gradcam_path:
-      try:
-        rel = skin_image.gradcam_path.replace(settings.MEDIA_URL, '').lstrip('/')
-        grad_fs = os.path.join(settings.MEDIA_ROOT, rel)
-      except Exception:
-        grad_fs = None
-    if grad_fs and os.path.exists(grad_fs):
-      story.append(Paragraph("Mapa de Calor (Grad-CAM):", h3))
-      try:
-        grad_img = ReportlabImage(grad_fs, width=2.5 * inch, height=2.5 * inch)
-        grad_img.hAlign = 'CENTER'
-        story.extend([grad_img, Spacer(1, 0.2 * inch)])
-      except Exception:
-        story.append(Paragraph("<i>Error al cargar Grad-CAM.</i>", italic))
-    else:
-      story.append(Paragraph("<i>Mapa de calor no disponible.</i>", italic))
-
-    # Diagnóstico preliminar
-    story.append(Paragraph("Diagnóstico Preliminar (Basado en IA):", h2))
+  if grad_fs and os.path.exists(grad_fs):
+    story.append(Paragraph("Mapa de Calor (Grad-CAM):", h3))
+    try:
+      grad_img = ReportlabImage(prepare_pdf_image(grad_fs, PDF_IMAGE_BOX, **image_options), width=box_width, height=box_height)
+      grad_img.hAlign = 'CENTER'
+      story.extend([grad_img, Spacer(1, 0.2 * inch)])
+    except Exception:
+      story.append(Paragraph("<i>Error al cargar Grad-CAM.</i>", italic))
+  else:
+    story.append(Paragraph("<i>Mapa de calor no disponible.</i>", italic))
+
+  # Diagnóstico preliminar
+  story.append(Paragraph("Diagnóstico Preliminar (Basado en IA):", h2))
+  story.append(
+    Paragraph(
+      f"<b>Condición Sugerida:</b> {skin_image.condition or 'No determinada'}", normal
+    )
+  )
+  if skin_image.confidence is not None:
     story.append(
       Paragraph(
-        f"<b>Condición Sugerida:</b> {skin_image.condition or 'No determinada'}", normal
+        f"<b>Confianza del Modelo:</b> {skin_image.confidence:.2f}%", normal
       )
     )
-    if skin_image.confidence is not None:
-      story.append(
-        Paragraph(
-          f"<b>Confianza del Modelo:</b> {skin_image.confidence:.2f}%", normal
-        )
-      )
-    story.append(Spacer(1, 0.2 * inch))
-
-    # Reporte IA
-    story.append(Paragraph("Reporte (Generado por IA):", h2))
-    report = (skin_image.ai_report or "No disponible.").replace('**', '').strip()
-    story.append(Paragraph(report.replace('\n', '<br/>'), normal))
-    story.append(Spacer(1, 0.2 * inch))
-
-    # Tratamiento IA
-    story.append(Paragraph("Tratamiento (Generado por IA):", h2))
-    treat = (skin_image.ai_treatment or "No disponible.").replace('**', '').strip()
-    story.append(Paragraph(treat.replace('\n', '<br/>'), normal))
-    story.append(Spacer(1, 0.3 * inch))
-
-    # Construir PDF
-    doc.build(story)
-    return response
-
-  except SkinImage.DoesNotExist:
-    return None
-  except Exception as e:
-    print(f"Error crítico al generar PDF para ID {image_id}: {e}")
-    return None
+  story.append(Spacer(1, 0.2 * inch))
+
+  # Reporte IA
+  story.append(Paragraph("Reporte (Generado por IA):", h2))
+  report = (skin_image.ai_report or "No disponible.").replace('**', '').strip()
+  story.append(Paragraph(report.replace('\n', '<br/>'), normal))
+  story.append(Spacer(1, 0.2 * inch))
+
+  # Tratamiento IA
+  story.append(Paragraph("Tratamiento (Generado por IA):", h2))
+  treat = (skin_image.ai_treatment or "No disponible.").replace('**', '').strip()
+  story.append(Paragraph(treat.replace('\n', '<br/>'), normal))
+  story.append(Spacer(1, 0.3 * inch))
+
+  # Construir PDF
+  doc.build(story)
@@ -0,0 +1,179 @@
+# core/Dermatologia_IA/utils/gradcamRenderer.py
+"""
+Almacenamiento compacto del heatmap Grad-CAM y renderizado diferido de la superposición.
+
+El análisis solo guarda el heatmap de baja resolución (p. ej. 7x7) en float16 en
+`SkinImage.gradcam_heatmap`. La superposición (JPEG o WebP) se genera la primera vez que
+se pide un tamaño (página de resultados, PDF, miniatura), se guarda en
+MEDIA_ROOT/gradcam_cache y se expulsan los archivos menos usados recientemente
+cuando la carpeta supera `AI_GRADCAM_CACHE_MAX_BYTES`.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+
+GRADCAM_CACHE_DIR = 'gradcam_cache'
+OVERLAY_FORMATS = ('jpg', 'webp')
+EVICTION_TARGET_RATIO = 0.9
+
+_eviction_lock = threading.Lock()
+
+
+def encode_heatmap(heatmap):
+  """Serializa el heatmap como .npy en float16 (incluye forma y tipo)"""
+  heatmap = np.nan_to_num(np.asarray(heatmap, dtype=np.float32))
+  buffer = io.BytesIO()
+  np.save(buffer, np.clip(heatmap, 0.0, 1.0).astype(np.float16), allow_pickle=False)
+  return buffer.getvalue()
+
+
+def decode_heatmap(data):
+  """Inverso de `encode_heatmap`; devuelve un array float32"""
+  return np.load(io.BytesIO(bytes(data)), allow_pickle=False).astype(np.float32)
+
+
+def snap_size(size):
+  """Ajusta el tamaño pedido al menor de `AI_GRADCAM_SIZES` que lo cubre para acotar las variantes en caché"""
+  sizes = sorted(settings.AI_GRADCAM_SIZES)
+  for candidate in sizes:
+    if size <= candidate:
+      return candidate
+  return sizes[-1]
+
+
+def cache_dir():
+  return os.path.join(settings.MEDIA_ROOT, GRADCAM_CACHE_DIR)
+
+
+def legacy_overlay_path(skin_image):
+  """Ruta en disco del JPEG de Grad-CAM de filas analizadas antes de guardar el heatmap"""
+  if not skin_image.gradcam_path:
+    return None
+  rel = skin_image.gradcam_path.replace(settings.MEDIA_URL, '').lstrip('/')
+  path = os.path.join(settings.MEDIA_ROOT, rel)
+  return path if os.path.exists(path) else None
+
+
+def _load_base_image(image_path, size):
+  """Decodifica la imagen original reducida a `size` píxeles en su lado mayor (RGB)"""
+  import cv2
+  from apps.Dermatologia_IA.utils.aiProcessor import AIProcessor
+  flag, _ = AIProcessor.reduced_decode_flag(image_path, size)
+  image = cv2.imread(image_path, flag)
+  if image is None:
+    return None
+  h, w = image.shape[:2]
+  scale = size / max(h, w)
+  if scale < 1:
+    image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+  return image
+
+
+def render_overlay_image(heatmap, base_bgr):
+  """Superpone el heatmap (COLORMAP_JET, 40%) sobre la imagen base BGR"""
+  import cv2
+  h, w = base_bgr.shape[:2]
+  heatmap_resized = cv2.resize(heatmap, (w, h), interpolation=cv2.INTER_LINEAR)
+  heatmap_color = cv2.applyColorMap(np.uint8(255 * np.clip(heatmap_resized, 0.0, 1.0)), cv2.COLORMAP_JET)
+  return cv2.addWeighted(base_bgr, 0.6, heatmap_color, 0.4, 0)
+
+
+def render_overlay(skin_image, size, fmt='jpg'):
+  """
+  Devuelve la ruta de la superposición del tamaño pedido, generándola si no está
+  en caché.
+
+  Args:
+      skin_image: SkinImage con `gradcam_heatmap` (o con un JPEG antiguo en `gradcam_path`)
+      size: Lado mayor deseado en píxeles (se ajusta con `snap_size`)
+      fmt: 'jpg' o 'webp' (los JPEG antiguos solo existen en 'jpg')
+
+  Returns:
+      str: Ruta del archivo o None si no hay Grad-CAM disponible.
+  """
+  import cv2
+  if fmt not in OVERLAY_FORMATS:
+    raise ValueError(f"Formato de Grad-CAM no soportado: {fmt}")
+  if not skin_image.gradcam_heatmap:
+    return legacy_overlay_path(skin_image) if fmt == 'jpg' else None
+
+  size = snap_size(size)
+  data = bytes(skin_image.gradcam_heatmap)
+  digest = hashlib.sha1(data).hexdigest()[:12]
+  path = os.path.join(cache_dir(), f'{skin_image.id}_{size}_{digest}.{fmt}')
+  if os.path.exists(path):
+    os.utime(path)
+    return path
+
+  base = _load_base_image(skin_image.image.path, size)
+  if base is None:
+    print(f"No se pudo leer la imagen original de ID {skin_image.id} para el Grad-CAM")
+    return None
+  overlay = render_overlay_image(decode_heatmap(data), base)
+
+  os.makedirs(cache_dir(), exist_ok=True)
+  # Nombre temporal único en el mismo directorio: otro hilo o proceso puede estar
+  # renderizando la misma superposición y os.replace solo es atómico dentro del volumen
+  fd, tmp_path = tempfile.mkstemp(dir=cache_dir(), suffix=f'.tmp.{fmt}')
+  os.close(fd)
+  quality = [cv2.IMWRITE_WEBP_QUALITY, 80] if fmt == 'webp' else [cv2.IMWRITE_JPEG_QUALITY, 90]
+  try:
+    if not cv2.imwrite(tmp_path, overlay, quality):
+      print(f"¡ERROR! No se pudo guardar el Grad-CAM en: {path}")
+      return None
+    os.replace(tmp_path, path)
+  finally:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+  evict_cache()
+  return path
+
+
+def evict_cache(max_bytes=None):
+  """
+  Elimina las superposiciones usadas hace más tiempo hasta dejar la caché por
+  debajo del 90% de `max_bytes` si lo supera.
+
+  Returns:
+      int: Número de archivos eliminados.
+  """
+  max_bytes = settings.AI_GRADCAM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+  if not _eviction_lock.acquire(blocking=False):
+    return 0
+  try:
+    try:
+      entries = list(os.scandir(cache_dir()))
+    except FileNotFoundError:
+      return 0
+    files = []
+    for entry in entries:
+      # Los temporales de renders en curso no se cuentan ni se borran: desaparecen al terminar
+      if not entry.is_file() or '.tmp.' in entry.name:
+        continue
+      try:
+        stat = entry.stat()
+      except FileNotFoundError:
+        continue
+      files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+      return 0
+    removed = 0
+    for _, size, path in sorted(files):
+      if total <= max_bytes * EVICTION_TARGET_RATIO:
+        break
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      total -= size
+      removed += 1
+    return removed
+  finally:
+    _eviction_lock.release()
@@ -0,0 +1,117 @@
+# core/Dermatologia_IA/utils/inferenceBatcher.py
+"""
+Motor de micro-batching dinámico para la inferencia del clasificador Keras.
+
+Las peticiones concurrentes encolan pares (tensor de imagen, vector de metadatos);
+un hilo de fondo agrupa hasta `max_batch_size` elementos o espera como máximo
+`max_wait_ms` milisegundos, ejecuta una sola pasada hacia adelante y devuelve a
+cada llamador su propia fila de predicción.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class InferenceBatcher:
+  """Agrupa predicciones individuales en lotes para aprovechar el throughput del modelo"""
+
+  def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10):
+    """
+    Args:
+        predict_fn: Función que recibe (imagenes, metadatos) con dimensión de lote y
+            devuelve un array (o tupla de arrays) cuya primera dimensión es el lote.
+        max_batch_size: Número máximo de elementos por pasada hacia adelante.
+        max_wait_ms: Tiempo máximo que espera el primer elemento de un lote.
+    """
+    if max_batch_size < 1:
+      raise ValueError("max_batch_size debe ser al menos 1")
+    self.predict_fn = predict_fn
+    self.max_batch_size = int(max_batch_size)
+    self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+    self._queue = queue.Queue()
+    self._lock = threading.Lock()
+    self._worker = None
+    self._batch_sizes = Counter()
+
+  def submit(self, image, metadata):
+    """
+    Encola un único par (imagen, metadatos) sin dimensión de lote.
+
+    Returns:
+        Future: Se resuelve con la fila de predicción correspondiente.
+    """
+    future = Future()
+    self._ensure_worker()
+    self._queue.put((np.asarray(image), np.asarray(metadata), future))
+    return future
+
+  def predict(self, image, metadata, timeout=None):
+    """Versión bloqueante de `submit`"""
+    return self.submit(image, metadata).result(timeout=timeout)
+
+  def get_stats(self):
+    """
+    Devuelve las estadísticas de los tamaños de lote alcanzados.
+
+    Returns:
+        dict: Número de lotes, elementos procesados, tamaño medio e histograma.
+    """
+    with self._lock:
+      histogram = dict(sorted(self._batch_sizes.items()))
+    batches = sum(histogram.values())
+    items = sum(size * count for size, count in histogram.items())
+    return {
+      'batches': batches,
+      'items': items,
+      'mean_batch_size': round(items / batches, 2) if batches else 0.0,
+      'max_batch_size': self.max_batch_size,
+      'max_wait_ms': self.max_wait * 1000.0,
+      'histogram': histogram,
+    }
+
+  def _ensure_worker(self):
+    if self._worker is not None and self._worker.is_alive():
+      return
+    with self._lock:
+      if self._worker is None or not self._worker.is_alive():
+        self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._worker.start()
+
+  def _collect_batch(self):
+    batch = [self._queue.get()]
+    deadline = time.monotonic() + self.max_wait
+    while len(batch) < self.max_batch_size:
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        break
+      try:
+        batch.append(self._queue.get(timeout=remaining))
+      except queue.Empty:
+        break
+    return batch
+
+  def _run(self):
+    while True:
+      batch = self._collect_batch()
+      futures = [item[2] for item in batch]
+      try:
+        images = np.stack([item[0] for item in batch])
+        metadata = np.stack([item[1] for item in batch])
+        outputs = self.predict_fn(images, metadata)
+        with self._lock:
+          self._batch_sizes[len(batch)] += 1
+        for i, future in enumerate(futures):
+          if isinstance(outputs, tuple):
+            future.set_result(tuple(None if output is None else output[i] for output in outputs))
+          else:
+            future.set_result(outputs[i])
+      except Exception as e:
+        print(f"Error crítico en la inferencia por lotes ({len(batch)} elementos): {e}")
+        for future in futures:
+          if not future.done():
+            future.set_exception(e)
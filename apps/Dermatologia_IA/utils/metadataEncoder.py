@@ -0,0 +1,168 @@
+# core/Dermatologia_IA/utils/metadataEncoder.py
+"""
+Codificador vectorizado de metadatos derivado del `metadata_preprocessor` ajustado.
+
+Evita construir un DataFrame de pandas y llamar al ColumnTransformer de sklearn
+en cada análisis: las columnas categóricas se codifican con tablas de búsqueda
+one-hot y la edad con las constantes de escalado precalculadas. Produce la misma
+salida que `ColumnTransformer.transform` para filas individuales o lotes NumPy.
+"""
+
+import numpy as np
+
+METADATA_COLUMNS = ['age_approx', 'sex', 'anatom_site_general', 'dataset']
+DEFAULT_AGE = 50
+
+
+def _unwrap_pipeline(transformer):
+  """Devuelve el último paso de un Pipeline, validando que los anteriores sean imputadores inocuos"""
+  steps = getattr(transformer, 'steps', None)
+  if steps is None:
+    return transformer
+  for name, step in steps[:-1]:
+    if type(step).__name__ != 'SimpleImputer':
+      raise ValueError(f"Paso de pipeline no soportado: {name} ({type(step).__name__})")
+    missing = step.missing_values
+    if not (missing is None or (isinstance(missing, float) and np.isnan(missing))):
+      raise ValueError(f"SimpleImputer con missing_values={missing!r} no soportado")
+  return steps[-1][1]
+
+
+def _coerce_ages(values):
+  """Equivalente a pd.to_numeric(errors='coerce').fillna(50)"""
+  values = np.asarray(values)
+  if values.dtype.kind in 'iuf':
+    ages = values.astype(np.float64)
+  else:
+    ages = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+      try:
+        ages[i] = float(value)
+      except (TypeError, ValueError):
+        ages[i] = np.nan
+  ages[np.isnan(ages)] = DEFAULT_AGE
+  return ages
+
+
+class MetadataEncoder:
+  """Codificador compilado a partir de un ColumnTransformer ajustado"""
+
+  def __init__(self, blocks, n_features):
+    """
+    Args:
+        blocks: Lista de bloques en el orden de salida del ColumnTransformer:
+            ('numeric', columna, (media, desviacion, escala, minimo), clip) o
+            ('onehot', columna, tabla_de_busqueda, ancho, ignorar_desconocidas).
+        n_features: Número total de columnas de salida.
+    """
+    self.blocks = blocks
+    self.n_features = n_features
+
+  @classmethod
+  def from_column_transformer(cls, column_transformer):
+    """
+    Deriva las tablas y constantes del preprocesador ajustado.
+
+    Raises:
+        ValueError: Si el preprocesador usa transformaciones no soportadas.
+    """
+    blocks = []
+    offset = 0
+    for name, transformer, columns in column_transformer.transformers_:
+      if isinstance(columns, str):
+        columns = [columns]
+      columns = [METADATA_COLUMNS[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+      if transformer == 'drop' or len(columns) == 0:
+        continue
+      unknown = set(columns) - set(METADATA_COLUMNS)
+      if unknown:
+        raise ValueError(f"Columnas no soportadas en '{name}': {sorted(unknown)}")
+
+      transformer = _unwrap_pipeline(transformer)
+      kind = 'passthrough' if transformer == 'passthrough' else type(transformer).__name__
+
+      if kind == 'OneHotEncoder':
+        if any(c == 'age_approx' for c in columns):
+          raise ValueError("La edad no puede codificarse como categoría")
+        if any(cats is not None for cats in (getattr(transformer, 'infrequent_categories_', None) or [])):
+          raise ValueError("Categorías infrecuentes no soportadas")
+        drop_idx = getattr(transformer, 'drop_idx_', None)
+        for j, column in enumerate(columns):
+          categories = list(transformer.categories_[j])
+          dropped = None if drop_idx is None or drop_idx[j] is None else int(drop_idx[j])
+          lookup = {}
+          position = 0
+          for k, category in enumerate(categories):
+            if k == dropped:
+              continue
+            lookup[str(category)] = position
+            position += 1
+          blocks.append(('onehot', column, lookup, position, transformer.handle_unknown != 'error'))
+          offset += position
+        continue
+
+      for j, column in enumerate(columns):
+        if column != 'age_approx':
+          raise ValueError(f"Transformación numérica no soportada para '{column}'")
+        if kind == 'StandardScaler':
+          mean = float(transformer.mean_[j]) if transformer.with_mean else 0.0
+          std = float(transformer.scale_[j]) if transformer.with_std else 1.0
+          blocks.append(('numeric', column, (mean, std, 1.0, 0.0), None))
+        elif kind == 'MinMaxScaler':
+          clip = transformer.feature_range if transformer.clip else None
+          blocks.append(('numeric', column, (0.0, 1.0, float(transformer.scale_[j]), float(transformer.min_[j])), clip))
+        elif kind == 'passthrough':
+          blocks.append(('numeric', column, (0.0, 1.0, 1.0, 0.0), None))
+        else:
+          raise ValueError(f"Transformador no soportado en '{name}': {kind}")
+        offset += 1
+
+    return cls(blocks, offset)
+
+  def encode_batch(self, ages, sexes, sites, datasets):
+    """
+    Codifica un lote de metadatos.
+
+    Args:
+        ages, sexes, sites, datasets: Secuencias o arrays de igual longitud.
+
+    Returns:
+        np.ndarray: Matriz (lote, n_features) en float64.
+    """
+    columns = {
+      'age_approx': _coerce_ages(ages),
+      'sex': np.asarray(sexes, dtype=object),
+      'anatom_site_general': np.asarray(sites, dtype=object),
+      'dataset': np.asarray(datasets, dtype=object),
+    }
+    n = len(columns['age_approx'])
+    output = np.zeros((n, self.n_features), dtype=np.float64)
+    rows = np.arange(n)
+    offset = 0
+    for block in self.blocks:
+      if block[0] == 'numeric':
+        # Mismo orden de operaciones que StandardScaler/MinMaxScaler para obtener valores idénticos
+        _, column, (mean, std, scale, minimum), clip = block
+        values = (columns[column] - mean) / std * scale + minimum
+        if clip is not None:
+          values = np.clip(values, clip[0], clip[1])
+        output[:, offset] = values
+        offset += 1
+      else:
+        _, column, lookup, width, ignore_unknown = block
+        indices = np.fromiter((lookup.get(str(v), -1) for v in columns[column]), dtype=np.int64, count=n)
+        known = indices >= 0
+        if not ignore_unknown and not known.all():
+          unknown = sorted({str(v) for v in columns[column][~known]})
+          raise ValueError(f"Categorías desconocidas en '{column}': {unknown}")
+        output[rows[known], offset + indices[known]] = 1.0
+        offset += width
+    return output
+
+  def encode_rows(self, metadata_dicts):
+    """Codifica una lista de diccionarios con las claves de METADATA_COLUMNS"""
+    return self.encode_batch(*([row.get(column) for row in metadata_dicts] for column in METADATA_COLUMNS))
+
+  def encode(self, metadata_dict):
+    """Codifica una sola fila; devuelve una matriz (1, n_features)"""
+    return self.encode_rows([metadata_dict])
@@ -0,0 +1,123 @@
+# core/Dermatologia_IA/utils/pagination.py
+"""
+Paginación por clave (keyset/cursor).
+
+En lugar de OFFSET, cada página filtra por los valores de la última fila de la
+anterior (`(uploaded_at, id) < (cursor)`), de modo que con un índice sobre las
+columnas de orden cada página cuesta lo mismo sin importar su posición en la
+tabla. Los cursores son opacos (JSON en base64) y se pasan como `?after=` o
+`?before=`. No se cuenta el total de filas.
+"""
+
+import base64
+import json
+from urllib.parse import urlencode
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+  pass
+
+
+class KeysetPage:
+  """Página con la interfaz que usan las plantillas (`has_next`, `has_previous`, `has_other_pages`)"""
+
+  def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+    self.object_list = object_list
+    self.paginator = paginator
+    self.next_cursor = next_cursor
+    self.previous_cursor = previous_cursor
+
+  def __iter__(self):
+    return iter(self.object_list)
+
+  def __len__(self):
+    return len(self.object_list)
+
+  def has_next(self):
+    return self.next_cursor is not None
+
+  def has_previous(self):
+    return self.previous_cursor is not None
+
+  def has_other_pages(self):
+    return self.has_next() or self.has_previous()
+
+  @property
+  def next_query(self):
+    return urlencode({'after': self.next_cursor}) if self.next_cursor else ''
+
+  @property
+  def previous_query(self):
+    return urlencode({'before': self.previous_cursor}) if self.previous_cursor else ''
+
+
+class KeysetPaginator:
+  """
+  Pagina un queryset ordenado de forma descendente por `keys` (la última clave
+  debe ser única, p. ej. el id).
+  """
+
+  def __init__(self, queryset, per_page, keys=('uploaded_at', 'id')):
+    self.queryset = queryset
+    self.per_page = per_page
+    self.keys = tuple(keys)
+    self.fields = [queryset.model._meta.get_field(key) for key in self.keys]
+
+  def encode_cursor(self, obj):
+    values = [field.value_to_string(obj) for field in self.fields]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+  def decode_cursor(self, cursor):
+    try:
+      padded = cursor + '=' * (-len(cursor) % 4)
+      values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+      if not isinstance(values, list) or len(values) != len(self.fields):
+        raise ValueError(cursor)
+      return [field.to_python(value) for field, value in zip(self.fields, values)]
+    except Exception as e:
+      raise InvalidCursor(f"Cursor no válido: {cursor}") from e
+
+  def _seek(self, values, lookup):
+    """(k1, k2, ...) `lookup` (valores) como OR de prefijos iguales y una desigualdad"""
+    condition = Q()
+    for i, key in enumerate(self.keys):
+      prefix = {k: v for k, v in zip(self.keys[:i], values[:i])}
+      condition |= Q(**prefix, **{f'{key}__{lookup}': values[i]})
+    # Cota redundante sobre la primera clave para que el índice acote el rango
+    return Q(**{f'{self.keys[0]}__{lookup}e': values[0]}) & condition
+
+  def page_queryset(self, after=None, before=None):
+    """Consulta de una página (con una fila extra para saber si hay más)"""
+    if before:
+      queryset = self.queryset.filter(self._seek(self.decode_cursor(before), 'gt')).order_by(*self.keys)
+    else:
+      queryset = self.queryset.order_by(*[f'-{key}' for key in self.keys])
+      if after:
+        queryset = queryset.filter(self._seek(self.decode_cursor(after), 'lt'))
+    return queryset[:self.per_page + 1]
+
+  def page(self, after=None, before=None):
+    """
+    Devuelve la página siguiente a `after`, la anterior a `before` o la primera.
+
+    Raises:
+        InvalidCursor: Si el cursor no se puede decodificar.
+    """
+    rows = list(self.page_queryset(after=after, before=before))
+    has_more = len(rows) > self.per_page
+    if before:
+      rows = rows[:self.per_page][::-1]
+      return KeysetPage(
+        rows, self,
+        next_cursor=self.encode_cursor(rows[-1]) if rows else None,
+        previous_cursor=self.encode_cursor(rows[0]) if rows and has_more else None,
+      )
+
+    rows = rows[:self.per_page]
+    return KeysetPage(
+      rows, self,
+      next_cursor=self.encode_cursor(rows[-1]) if rows and has_more else None,
+      previous_cursor=self.encode_cursor(rows[0]) if rows and after else None,
+    )
@@ -0,0 +1,78 @@
+# core/Dermatologia_IA/utils/patientSearch.py
+"""
+Búsqueda de reportes por paciente.
+
+- DNI (solo dígitos): búsqueda exacta con el índice `skinimage_processed_dni`.
+- Nombre, apellido o email: similitud de trigramas (`<%` de pg_trgm, tolera
+  errores de escritura) respaldada por índices GIN parciales creados en la
+  migración 0011. Cada palabra de la búsqueda debe parecerse a alguno de los campos.
+
+Si la extensión pg_trgm no está instalada (o la base no es PostgreSQL) se usa
+`icontains`, que da resultados exactos por subcadena pero sin índice. La
+comprobación se repite cada `PATIENT_SEARCH_TRIGRAM_CHECK_TTL` segundos, así que
+instalar o quitar la extensión no requiere reiniciar los procesos.
+"""
+
+import re
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+DNI_PATTERN = re.compile(r'^\d{6,20}$')
+NAME_FIELDS = ('first_name', 'last_name')
+# Palabras más cortas no tienen trigramas suficientes para una similitud útil
+MIN_TRIGRAM_TERM = 3
+
+_trigram_available = {}
+
+
+def trigram_available():
+  """True si la base de datos actual tiene la extensión pg_trgm (se guarda por alias durante un tiempo)"""
+  alias = connection.alias
+  previous, checked_at = _trigram_available.get(alias, (None, None))
+  if checked_at is None or time.monotonic() - checked_at >= settings.PATIENT_SEARCH_TRIGRAM_CHECK_TTL:
+    available = False
+    if connection.vendor == 'postgresql':
+      try:
+        with connection.cursor() as cursor:
+          cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+          available = cursor.fetchone() is not None
+      except Exception as e:
+        print(f"No se pudo comprobar la extensión pg_trgm: {e}")
+    if not available and previous is not False:
+      print("Extensión pg_trgm no disponible: la búsqueda de pacientes usará icontains sin índice")
+    _trigram_available[alias] = (available, time.monotonic())
+  return _trigram_available[alias][0]
+
+
+def _term_filter(term, fields, use_trigram):
+  condition = Q()
+  for field in fields:
+    if use_trigram and len(term) >= MIN_TRIGRAM_TERM:
+      condition |= Q(**{f'{field}__trigram_word_similar': term})
+    else:
+      condition |= Q(**{f'{field}__icontains': term})
+  return condition
+
+
+def search_reports(queryset, query):
+  """
+  Filtra `queryset` por DNI, nombre/apellido o email del paciente.
+
+  Returns:
+      QuerySet: Filtrado (sin ordenar; el paginador ordena por fecha).
+  """
+  query = ' '.join((query or '').split())
+  if not query:
+    return queryset
+  if DNI_PATTERN.match(query):
+    return queryset.filter(dni=query)
+
+  use_trigram = trigram_available()
+  if '@' in query:
+    return queryset.filter(_term_filter(query, ['email'], use_trigram))
+  for term in query.split(' '):
+    queryset = queryset.filter(_term_filter(term, NAME_FIELDS, use_trigram))
+  return queryset
@@ -0,0 +1,72 @@
+# core/Dermatologia_IA/utils/pdfImages.py
+"""
+Preparación de las imágenes incrustadas en los reportes PDF.
+
+ReportLab incrusta el mapa de bits tal cual lo recibe, así que una foto de 4000 px
+mostrada a 2.5 pulgadas ocupa varios MB en el PDF. Aquí se decodifica la imagen
+reducida (draft de PIL), se remuestrea a los píxeles que necesita el recuadro a
+`REPORT_IMAGE_DPI` y se recomprime en JPEG con `REPORT_JPEG_QUALITY`; ReportLab
+incrusta ese JPEG sin volver a codificarlo. Si `REPORT_IMAGE_GRAYSCALE` está activo,
+las imágenes sin color (todos los canales iguales) se guardan con un solo canal.
+"""
+
+import io
+
+import numpy as np
+from django.conf import settings
+
+# Diferencia máxima entre canales para considerar una imagen en escala de grises
+GRAYSCALE_TOLERANCE = 2
+
+
+def target_pixels(box_inches, dpi):
+  """Píxeles (ancho, alto) que ocupa un recuadro de `box_inches` pulgadas impreso a `dpi`"""
+  width, height = box_inches
+  return max(1, round(width * dpi)), max(1, round(height * dpi))
+
+
+def is_grayscale(image):
+  """True si la imagen RGB no tiene información de color"""
+  pixels = np.asarray(image, dtype=np.int16)
+  if pixels.ndim < 3:
+    return True
+  spread = pixels.max(axis=2) - pixels.min(axis=2)
+  return int(spread.max()) <= GRAYSCALE_TOLERANCE
+
+
+def prepare_pdf_image(path, box_inches, dpi=None, quality=None, grayscale=None):
+  """
+  Devuelve la imagen lista para incrustarse en el PDF.
+
+  Args:
+      path: Ruta de la imagen original (JPEG, PNG o WebP)
+      box_inches: Tupla (ancho, alto) en pulgadas del recuadro del PDF
+      dpi: Resolución de impresión (por defecto `REPORT_IMAGE_DPI`; 0 incrusta el original)
+      quality: Calidad JPEG (por defecto `REPORT_JPEG_QUALITY`)
+      grayscale: Guardar con un canal las imágenes sin color (por defecto `REPORT_IMAGE_GRAYSCALE`)
+
+  Returns:
+      BytesIO con el JPEG remuestreado, o `path` si dpi es 0.
+  """
+  from PIL import Image, ImageOps
+  dpi = settings.REPORT_IMAGE_DPI if dpi is None else dpi
+  quality = settings.REPORT_JPEG_QUALITY if quality is None else quality
+  grayscale = settings.REPORT_IMAGE_GRAYSCALE if grayscale is None else grayscale
+  if dpi <= 0:
+    return path
+
+  width, height = target_pixels(box_inches, dpi)
+  with Image.open(path) as source:
+    source.draft('RGB', (width, height))
+    image = ImageOps.exif_transpose(source).convert('RGB')
+  # Nunca se amplía: si el original es menor que el recuadro se conserva su resolución
+  size = (min(width, image.width), min(height, image.height))
+  if size != image.size:
+    image = image.resize(size, Image.LANCZOS)
+  if grayscale and is_grayscale(image):
+    image = image.convert('L')
+
+  buffer = io.BytesIO()
+  image.save(buffer, 'JPEG', quality=quality, optimize=True)
+  buffer.seek(0)
+  return buffer
@@ -0,0 +1,118 @@
+# core/Dermatologia_IA/utils/predictionCache.py
+"""
+Caché de predicciones por contenido.
+
+Cada `SkinImage` guarda un hash SHA-256 de los bytes de la imagen y de sus
+metadatos normalizados. Si ya existe una fila procesada con el mismo hash, se
+copian su condición, confianza, Grad-CAM y textos de IA en lugar de repetir la
+inferencia. Los contadores de aciertos y fallos se guardan en la caché de Django
+para que sean visibles entre procesos cuando se usa un backend compartido.
+"""
+
+import hashlib
+import json
+
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.aiComponents import ai_components
+from apps.Dermatologia_IA.utils.statsCounters import hit_miss_stats, increment
+from apps.core.utils.analytics import record_processed
+
+HASH_CHUNK_SIZE = 64 * 1024
+DEFAULT_DATASET = 'ISIC'
+HITS_KEY = 'prediction_cache:hits'
+MISSES_KEY = 'prediction_cache:misses'
+
+# Campos del resultado que se copian desde la fila ya procesada
+CACHED_RESULT_FIELDS = ['condition', 'confidence', 'model_version', 'gradcam_path', 'gradcam_heatmap', 'ai_report', 'ai_treatment']
+
+
+def normalize_metadata(age_approx, sex, anatom_site_general, dataset=DEFAULT_DATASET):
+  """Normaliza los metadatos que influyen en la predicción"""
+  try:
+    age = int(float(age_approx))
+  except (TypeError, ValueError):
+    age = None
+  return {
+    'age_approx': age,
+    'sex': str(sex or 'unknown').strip().lower(),
+    'anatom_site_general': str(anatom_site_general or 'unknown').strip().lower(),
+    'dataset': str(dataset or DEFAULT_DATASET).strip(),
+  }
+
+
+def compute_content_hash(image_file, age_approx, sex, anatom_site_general, dataset=DEFAULT_DATASET):
+  """
+  Calcula el hash de contenido de una imagen subida y sus metadatos.
+
+  Args:
+      image_file: Archivo (UploadedFile, File o archivo abierto en modo binario)
+
+  Returns:
+      str: Hash SHA-256 en hexadecimal.
+  """
+  digest = hashlib.sha256()
+  if hasattr(image_file, 'chunks'):
+    for chunk in image_file.chunks(HASH_CHUNK_SIZE):
+      digest.update(chunk)
+  else:
+    for chunk in iter(lambda: image_file.read(HASH_CHUNK_SIZE), b''):
+      digest.update(chunk)
+  if hasattr(image_file, 'seek'):
+    image_file.seek(0)
+  metadata = normalize_metadata(age_approx, sex, anatom_site_general, dataset)
+  digest.update(b'\0')
+  digest.update(json.dumps(metadata, sort_keys=True).encode('utf-8'))
+  return digest.hexdigest()
+
+
+def find_cached_prediction(skin_image):
+  """Devuelve la fila procesada más reciente con el mismo hash de contenido y modelo vigente o None"""
+  if not skin_image.content_hash:
+    return None
+  return (
+    SkinImage.objects
+    .filter(content_hash=skin_image.content_hash, processed=True, model_version=ai_components.model_version)
+    .exclude(pk=skin_image.pk)
+    .only(*CACHED_RESULT_FIELDS)
+    .order_by('-uploaded_at')
+    .first()
+  )
+
+
+def reuse_cached_prediction(skin_image, record_miss=True):
+  """
+  Copia el resultado de una fila idéntica ya procesada, si existe.
+
+  Args:
+      skin_image: Instancia de SkinImage pendiente de análisis.
+      record_miss: Si un fallo debe contabilizarse (False para reintentos del mismo análisis).
+
+  Returns:
+      bool: True si se reutilizó un resultado previo.
+  """
+  cached = find_cached_prediction(skin_image)
+  if cached is None:
+    if record_miss:
+      increment(MISSES_KEY)
+    return False
+
+  for field in CACHED_RESULT_FIELDS:
+    setattr(skin_image, field, getattr(cached, field))
+  was_processed = skin_image.processed
+  skin_image.processed = True
+  skin_image.status = SkinImage.STATUS_DONE
+  skin_image.error_message = None
+  skin_image.save()
+  if not was_processed:
+    record_processed([skin_image])
+  increment(HITS_KEY)
+  print(f"Resultado reutilizado para imagen ID {skin_image.id} desde imagen ID {cached.id}")
+  return True
+
+
+def prediction_cache_stats():
+  """
+  Returns:
+      dict: Aciertos, fallos y tasa de aciertos de la caché de predicciones.
+  """
+  return hit_miss_stats(HITS_KEY, MISSES_KEY)
@@ -0,0 +1,81 @@
+# core/Dermatologia_IA/utils/reportCache.py
+"""
+Caché en disco de los reportes PDF.
+
+Cada PDF se guarda en `REPORT_CACHE_DIR` con una clave formada por el id de la
+imagen y una versión de contenido: el hash de todos los campos que aparecen en
+el reporte. Cualquier cambio en la fila (incluidos `.update()` y `bulk_update`)
+produce una versión nueva, así que nunca se sirve un PDF desactualizado; al
+generarla se borran las versiones anteriores de esa imagen. La versión sirve
+también como ETag.
+"""
+
+import glob
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from apps.Dermatologia_IA.utils.generateReport import build_report_pdf
+
+# Incrementar al cambiar el diseño del PDF para descartar los reportes guardados
+REPORT_LAYOUT_VERSION = 'v2'
+REPORT_FIELDS = (
+  'id', 'first_name', 'last_name', 'dni', 'phone', 'email', 'uploaded_at', 'age_approx', 'sex',
+  'anatom_site_general', 'condition', 'confidence', 'gradcam_path', 'ai_report', 'ai_treatment',
+)
+
+
+def report_version(skin_image):
+  """Versión de contenido (16 caracteres) del reporte de una imagen"""
+  digest = hashlib.sha256(REPORT_LAYOUT_VERSION.encode('utf-8'))
+  digest.update(
+    f'\0images={settings.REPORT_IMAGE_DPI}/{settings.REPORT_JPEG_QUALITY}/{settings.REPORT_IMAGE_GRAYSCALE}'.encode('utf-8')
+  )
+  for field in REPORT_FIELDS:
+    digest.update(f'\0{field}={getattr(skin_image, field)!r}'.encode('utf-8'))
+  digest.update(f'\0image={skin_image.image.name}'.encode('utf-8'))
+  digest.update(b'\0gradcam_heatmap=' + bytes(skin_image.gradcam_heatmap or b''))
+  return digest.hexdigest()[:16]
+
+
+def cached_report_path(image_id, version):
+  return os.path.join(settings.REPORT_CACHE_DIR, f'report_{image_id}_{version}.pdf')
+
+
+def invalidate_report(image_id, keep=None):
+  """Elimina los PDF guardados de una imagen (salvo la ruta `keep`)"""
+  for path in glob.glob(os.path.join(settings.REPORT_CACHE_DIR, f'report_{image_id}_*.pdf')):
+    if path != keep:
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+
+
+def get_cached_report(skin_image):
+  """
+  Devuelve el PDF de una imagen procesada, generándolo si no está en caché.
+
+  Returns:
+      Tupla de (ruta del PDF, versión de contenido)
+  """
+  version = report_version(skin_image)
+  path = cached_report_path(skin_image.id, version)
+  if os.path.exists(path):
+    return path, version
+
+  os.makedirs(settings.REPORT_CACHE_DIR, exist_ok=True)
+  # Dos descargas simultáneas del mismo reporte generan cada una su propio temporal;
+  # el nombre no coincide con el patrón de invalidate_report, que no lo borra a medias
+  fd, tmp_path = tempfile.mkstemp(dir=settings.REPORT_CACHE_DIR, suffix='.pdf.tmp')
+  os.close(fd)
+  try:
+    build_report_pdf(skin_image, tmp_path)
+    os.replace(tmp_path, path)
+  finally:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+  invalidate_report(skin_image.id, keep=path)
+  return path, version
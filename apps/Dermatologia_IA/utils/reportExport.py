@@ -0,0 +1,118 @@
+# core/Dermatologia_IA/utils/reportExport.py
+"""
+Exportación de muchos reportes PDF en un ZIP transmitido por partes.
+
+Los PDF se obtienen con `get_cached_report` (se reutilizan los que ya están en
+caché y los demás se generan en un pool de hilos con una ventana acotada de
+reportes por delante). El ZIP se escribe sobre un búfer que se vacía tras cada
+bloque, así que ni el archivo completo ni todos los PDF están en memoria a la vez.
+Los PDF ya están comprimidos, por lo que se guardan sin volver a comprimir.
+"""
+
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.generateReport import report_filename
+from apps.Dermatologia_IA.utils.reportCache import get_cached_report
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer:
+  """Destino no posicionable para ZipFile; `drain` entrega lo escrito desde la última vez"""
+
+  def __init__(self):
+    self._chunks = []
+
+  def write(self, data):
+    self._chunks.append(bytes(data))
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def drain(self):
+    if self._chunks:
+      data = b''.join(self._chunks)
+      self._chunks = []
+      yield data
+
+
+def filter_reports(dni=None, date_from=None, date_to=None):
+  """Reportes procesados de un paciente (DNI) y/o de un rango de fechas de subida"""
+  queryset = SkinImage.objects.filter(processed=True)
+  if dni:
+    queryset = queryset.filter(dni=dni)
+  # Límites como datetime (no `__date`) para que la consulta pueda usar el índice de uploaded_at
+  if date_from:
+    queryset = queryset.filter(uploaded_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+  if date_to:
+    queryset = queryset.filter(
+      uploaded_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    )
+  return queryset.order_by('uploaded_at', 'id')
+
+
+def archive_name(skin_image):
+  return f"{skin_image.uploaded_at:%Y-%m-%d}_{report_filename(skin_image.id)}"
+
+
+def _build(skin_image):
+  try:
+    path, _ = get_cached_report(skin_image)
+    return skin_image, path, None
+  except Exception as e:
+    return skin_image, None, e
+
+
+def iter_report_files(skin_images, workers=None):
+  """
+  Genera los PDF en paralelo conservando el orden.
+
+  Yields:
+      tuple: (skin_image, ruta del PDF o None, excepción o None)
+  """
+  workers = workers or settings.REPORT_EXPORT_WORKERS
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-export') as pool:
+    pending = deque()
+    for skin_image in skin_images:
+      pending.append(pool.submit(_build, skin_image))
+      if len(pending) >= workers * 2:
+        yield pending.popleft().result()
+    while pending:
+      yield pending.popleft().result()
+
+
+def stream_reports_zip(skin_images, workers=None):
+  """
+  Escribe los reportes en un ZIP y lo entrega por bloques (para StreamingHttpResponse
+  o para escribirlo en un archivo).
+
+  Yields:
+      bytes: Siguiente bloque del ZIP.
+  """
+  buffer = _StreamBuffer()
+  errors = []
+  with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+    for skin_image, path, error in iter_report_files(skin_images, workers):
+      if error is not None:
+        print(f"Error al generar el PDF de la imagen ID {skin_image.id} para la exportación: {error}")
+        errors.append(f"ID {skin_image.id}: {error}")
+        continue
+      with open(path, 'rb') as pdf_file, archive.open(archive_name(skin_image), 'w') as entry:
+        while True:
+          data = pdf_file.read(CHUNK_SIZE)
+          if not data:
+            break
+          entry.write(data)
+          yield from buffer.drain()
+      yield from buffer.drain()
+    if errors:
+      archive.writestr('errores.txt', '\n'.join(errors))
+  yield from buffer.drain()
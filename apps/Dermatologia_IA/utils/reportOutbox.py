@@ -0,0 +1,120 @@
+# core/Dermatologia_IA/utils/reportOutbox.py
+"""
+Bandeja de salida de los emails con reportes.
+
+`SendReportEmailView` solo inserta un `ReportEmail` y responde; el comando
+`run_email_worker` reserva los pendientes por lotes y los envía por una única
+conexión SMTP abierta para todo el lote. Cada email guarda su propio estado: los
+fallidos se reintentan con espera exponencial (`REPORT_EMAIL_RETRY_BACKOFF` ·
+2^(intentos-1)) hasta `REPORT_EMAIL_MAX_ATTEMPTS`.
+"""
+
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.Dermatologia_IA.models import ReportEmail, SkinImage
+from apps.Dermatologia_IA.utils.sendReportEmail import build_report_email
+
+
+def enqueue_report_email(skin_image, email_address):
+  """Encola el envío del reporte de `skin_image` a `email_address`"""
+  return ReportEmail.objects.create(skin_image=skin_image, email_address=email_address)
+
+
+def retry_delay(attempts):
+  """Espera antes del siguiente intento tras `attempts` intentos fallidos"""
+  return timedelta(seconds=settings.REPORT_EMAIL_RETRY_BACKOFF * 2 ** max(attempts - 1, 0))
+
+
+def claim_pending_emails(limit=None):
+  """
+  Reserva hasta `limit` emails listos para enviarse (incluidos los que quedaron
+  en proceso por un worker caído).
+
+  Returns:
+      list: Emails reservados, con su `skin_image` cargada.
+  """
+  now = timezone.now()
+  stale_before = now - timedelta(seconds=settings.REPORT_EMAIL_SEND_TIMEOUT)
+  with transaction.atomic():
+    emails = list(
+      ReportEmail.objects
+      .select_for_update(skip_locked=True, of=('self',))
+      .select_related('skin_image')
+      .filter(
+        Q(status=SkinImage.STATUS_PENDING, next_attempt_at__lte=now) |
+        Q(status=SkinImage.STATUS_RUNNING, started_at__lt=stale_before)
+      )
+      .order_by('next_attempt_at')[:limit or settings.REPORT_EMAIL_BATCH_SIZE]
+    )
+    for email in emails:
+      email.status = SkinImage.STATUS_RUNNING
+      email.attempts += 1
+      email.started_at = now
+    ReportEmail.objects.bulk_update(emails, ['status', 'attempts', 'started_at'])
+  return emails
+
+
+def _finish_email(email, error=None):
+  now = timezone.now()
+  if error is None:
+    email.status = SkinImage.STATUS_DONE
+    email.last_error = None
+    email.sent_at = now
+  else:
+    email.last_error = str(error)
+    if email.attempts < settings.REPORT_EMAIL_MAX_ATTEMPTS:
+      email.status = SkinImage.STATUS_PENDING
+      email.next_attempt_at = now + retry_delay(email.attempts)
+    else:
+      email.status = SkinImage.STATUS_FAILED
+  email.save(update_fields=['status', 'last_error', 'sent_at', 'next_attempt_at'])
+  return email
+
+
+def send_emails(emails, connection=None):
+  """
+  Envía los emails reservados reutilizando una sola conexión.
+
+  Returns:
+      tuple: (enviados, fallidos)
+  """
+  sent = failed = 0
+  connection = connection or get_connection()
+  try:
+    connection.open()
+  except Exception as e:
+    # Sin servidor de correo no se intenta ningún envío del lote
+    print(f"Error al conectar con el servidor de correo: {e}")
+    for email in emails:
+      _finish_email(email, e)
+    return 0, len(emails)
+
+  try:
+    for email in emails:
+      try:
+        build_report_email(email.skin_image, email.email_address, connection=connection).send()
+        _finish_email(email)
+        sent += 1
+      except Exception as e:
+        print(f"Error al enviar el email {email.id} (reporte ID {email.skin_image_id}): {e}")
+        traceback.print_exc()
+        _finish_email(email, e)
+        failed += 1
+  finally:
+    connection.close()
+  return sent, failed
+
+
+def send_pending_emails(limit=None):
+  """Reserva y envía un lote de la bandeja de salida; devuelve (enviados, fallidos)"""
+  emails = claim_pending_emails(limit)
+  if not emails:
+    return 0, 0
+  return send_emails(emails)
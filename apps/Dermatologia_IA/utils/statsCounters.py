@@ -0,0 +1,31 @@
+# core/Dermatologia_IA/utils/statsCounters.py
+"""
+Contadores de aciertos/fallos de las cachés de IA guardados en la caché de Django,
+compartidos entre procesos cuando se configura un backend compartido.
+"""
+
+from django.core.cache import cache
+
+
+def increment(key):
+  """Incrementa un contador, creándolo si no existe"""
+  cache.add(key, 0, timeout=None)
+  try:
+    cache.incr(key)
+  except ValueError:
+    cache.set(key, 1, timeout=None)
+
+
+def hit_miss_stats(hits_key, misses_key):
+  """
+  Returns:
+      dict: Aciertos, fallos y tasa de aciertos.
+  """
+  hits = cache.get(hits_key, 0)
+  misses = cache.get(misses_key, 0)
+  total = hits + misses
+  return {
+    'hits': hits,
+    'misses': misses,
+    'hit_rate': round(hits / total, 4) if total else 0.0,
+  }
@@ -0,0 +1,105 @@
+# core/Dermatologia_IA/utils/thumbnails.py
+"""
+Miniaturas de las imágenes subidas en anchos fijos (`AI_THUMBNAIL_WIDTHS`) y en
+WebP con JPEG como alternativa.
+
+Se guardan junto a la imagen original (skin_images/thumbs/<nombre>_w<ancho>.<ext>).
+El worker las genera al terminar el análisis; si falta alguna, `thumbnail_url`
+apunta a `ThumbnailView`, que la genera en la primera petición.
+"""
+
+import os
+import tempfile
+
+from django.conf import settings
+from django.urls import reverse
+
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_FORMATS = {
+  'webp': ('WEBP', {'quality': 80, 'method': 4}),
+  'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_name(image_name, width, fmt):
+  """Nombre relativo a MEDIA_ROOT de la miniatura de una imagen"""
+  base, _ = os.path.splitext(image_name)
+  directory, filename = os.path.split(base)
+  return os.path.join(directory, THUMBNAIL_DIR, f'{filename}_w{width}.{fmt}').replace(os.sep, '/')
+
+
+def _save_atomic(image, path, fmt):
+  pil_format, options = THUMBNAIL_FORMATS[fmt]
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  # El worker y ThumbnailView pueden generar la misma miniatura a la vez: cada uno
+  # escribe su propio temporal y solo una versión completa llega a `path`
+  fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=f'.tmp.{fmt}')
+  try:
+    with os.fdopen(fd, 'wb') as tmp_file:
+      image.save(tmp_file, pil_format, **options)
+    os.replace(tmp_path, path)
+  finally:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+
+
+def generate_thumbnails(image_name, widths=None, formats=None):
+  """
+  Genera las miniaturas que falten de una imagen subida.
+
+  Args:
+      image_name: Nombre de la imagen relativo a MEDIA_ROOT (`SkinImage.image.name`)
+      widths: Anchos a generar (por defecto `AI_THUMBNAIL_WIDTHS`)
+      formats: Formatos a generar (por defecto WebP y JPEG)
+
+  Returns:
+      list: Rutas de las miniaturas generadas.
+  """
+  from PIL import Image, ImageOps
+  widths = sorted(widths or settings.AI_THUMBNAIL_WIDTHS, reverse=True)
+  formats = formats or list(THUMBNAIL_FORMATS)
+  missing = [
+    (width, fmt) for width in widths for fmt in formats
+    if not os.path.exists(os.path.join(settings.MEDIA_ROOT, thumbnail_name(image_name, width, fmt)))
+  ]
+  if not missing:
+    return []
+
+  created = []
+  with Image.open(os.path.join(settings.MEDIA_ROOT, image_name)) as source:
+    # En JPEG, draft() decodifica directamente a 1/2, 1/4 u 1/8 de resolución
+    source.draft('RGB', (widths[0], widths[0]))
+    image = ImageOps.exif_transpose(source).convert('RGB')
+  for width in widths:
+    if image.width > width:
+      image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    for fmt in formats:
+      if (width, fmt) not in missing:
+        continue
+      path = os.path.join(settings.MEDIA_ROOT, thumbnail_name(image_name, width, fmt))
+      _save_atomic(image, path, fmt)
+      created.append(path)
+  return created
+
+
+def ensure_thumbnail(skin_image, width, fmt):
+  """Devuelve la ruta de una miniatura, generándola si no existe"""
+  path = os.path.join(settings.MEDIA_ROOT, thumbnail_name(skin_image.image.name, width, fmt))
+  if not os.path.exists(path):
+    generate_thumbnails(skin_image.image.name, widths=[width], formats=[fmt])
+  return path
+
+
+def thumbnail_url(skin_image, width, fmt):
+  """URL de la miniatura en MEDIA_URL si ya existe o de `ThumbnailView` si hay que generarla"""
+  name = thumbnail_name(skin_image.image.name, width, fmt)
+  if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+    return settings.MEDIA_URL + name
+  return reverse('dermatology:thumbnail', kwargs={'image_id': skin_image.id, 'width': width, 'fmt': fmt})
+
+
+def thumbnail_srcset(skin_image, fmt):
+  """Atributo srcset con todos los anchos de miniatura en un formato"""
+  return ', '.join(
+    f'{thumbnail_url(skin_image, width, fmt)} {width}w' for width in sorted(settings.AI_THUMBNAIL_WIDTHS)
+  )
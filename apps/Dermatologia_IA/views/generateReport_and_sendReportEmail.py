@@ -1,27 +1,52 @@
 # core/Dermatologia_IA/views/generateReport_and_sendReportEmail.py
+import os
 
 from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.http import FileResponse
 from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views import View
 
-from apps.Dermatologia_IA.utils.generateReport import generate_report
-from apps.Dermatologia_IA.utils.sendReportEmail import send_report_email
+from apps.Dermatologia_IA.models import SkinImage
+from apps.Dermatologia_IA.utils.generateReport import report_filename
+from apps.Dermatologia_IA.utils.reportCache import get_cached_report
+from apps.Dermatologia_IA.utils.reportOutbox import enqueue_report_email
 from apps.auth.views.view_auth import CustomLoginRequiredMixin
 
 
 class GenerateReportView(CustomLoginRequiredMixin, View):
   """
-   generar y descargar el reporte PDF.
+   generar y descargar el reporte PDF (cacheado en disco, con ETag y Last-Modified).
   """
 
   def get(self, request, image_id):
     try:
-      pdf_response = generate_report(image_id)
-      if pdf_response:
-        return pdf_response
-      else:
-        messages.error(request, "Error al generar el reporte PDF.")
-        return redirect('dermatology:process_image', image_id=image_id)
+      skin_image = SkinImage.objects.get(id=image_id, processed=True)
+      pdf_path, version = get_cached_report(skin_image)
+      etag = quote_etag(version)
+      last_modified = int(os.path.getmtime(pdf_path))
+
+      # Si el navegador ya tiene esta versión responde 304 sin leer el archivo
+      not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+      if not_modified is not None:
+        return not_modified
+
+      response = FileResponse(
+        open(pdf_path, 'rb'),
+        as_attachment=True,
+        filename=report_filename(image_id),
+        content_type='application/pdf',
+      )
+      response['ETag'] = etag
+      response['Last-Modified'] = http_date(last_modified)
+      response['Cache-Control'] = 'private, no-cache'
+      return response
+    except SkinImage.DoesNotExist:
+      messages.error(request, "Error al generar el reporte PDF.")
+      return redirect('dermatology:process_image', image_id=image_id)
     except Exception as e:
       print(f"Error crítico al generar el reporte PDF para imagen ID {image_id}: {e}")
       messages.error(request, "Ocurrió un error al generar el reporte. Por favor, contacte soporte.")
@@ -30,21 +55,24 @@ class GenerateReportView(CustomLoginRequiredMixin, View):
 
 class SendReportEmailView(CustomLoginRequiredMixin, View):
   """
-  enviar el reporte por email.
+  encolar el envío del reporte por email (lo envía el comando run_email_worker).
   """
 
   def post(self, request, image_id):
-    email_address = request.POST.get('email')
-    if email_address:
-      try:
-        success = send_report_email(image_id, email_address)
-        if success:
-          messages.success(request, f"Reporte enviado a {email_address} con éxito.")
-        else:
-          messages.error(request, "Error al enviar el email. Por favor, inténtelo de nuevo o contacte soporte.")
-      except Exception as e:
-        print(f"Error crítico al enviar el email para reporte ID {image_id}: {e}")
-        messages.error(request, "Ocurrió un error al enviar el email. Por favor, contacte soporte.")
-    else:
+    email_address = (request.POST.get('email') or '').strip()
+    try:
+      validate_email(email_address)
+    except ValidationError:
       messages.error(request, "Por favor, proporcione una dirección de email válida.")
+      return redirect('dermatology:process_image', image_id=image_id)
+
+    try:
+      skin_image = SkinImage.objects.get(id=image_id, processed=True)
+      enqueue_report_email(skin_image, email_address)
+      messages.success(request, f"El reporte se enviará a {email_address} en unos momentos.")
+    except SkinImage.DoesNotExist:
+      messages.error(request, "Error al enviar el email. Por favor, inténtelo de nuevo o contacte soporte.")
+    except Exception as e:
+      print(f"Error crítico al encolar el email para reporte ID {image_id}: {e}")
+      messages.error(request, "Ocurrió un error al enviar el email. Por favor, contacte soporte.")
     return redirect('dermatology:process_image', image_id=image_id)
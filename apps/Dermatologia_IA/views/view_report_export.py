@@ -0,0 +1,36 @@
+# core/Dermatologia_IA/views/view_report_export.py
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views import View
+
+from apps.Dermatologia_IA.utils.reportExport import filter_reports, stream_reports_zip
+from apps.auth.views.view_auth import CustomLoginRequiredMixin
+
+
+class ReportExportView(CustomLoginRequiredMixin, View):
+  """
+  exportar (solo administradores) los reportes de un paciente o de un rango de
+  fechas como un ZIP transmitido por partes.
+  Parámetros GET: dni, date_from y date_to (AAAA-MM-DD).
+  """
+
+  def get(self, request):
+    if not request.user.is_staff:
+      raise PermissionDenied
+    dni = request.GET.get('dni', '').strip()
+    dates = {}
+    for key in ('date_from', 'date_to'):
+      value = request.GET.get(key, '').strip()
+      dates[key] = parse_date(value) if value else None
+      if value and dates[key] is None:
+        return HttpResponseBadRequest(f"Fecha no válida en '{key}': use AAAA-MM-DD")
+    if not dni and not any(dates.values()):
+      return HttpResponseBadRequest("Indique un DNI o un rango de fechas")
+
+    skin_images = filter_reports(dni=dni, **dates).iterator(chunk_size=200)
+    response = StreamingHttpResponse(stream_reports_zip(skin_images), content_type='application/zip')
+    filename = f"reportes_{dni or 'rango'}_{timezone.localdate():%Y%m%d}.zip"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
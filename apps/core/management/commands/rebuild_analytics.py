@@ -0,0 +1,18 @@
+# apps/core/management/commands/rebuild_analytics.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.utils.analytics import rebuild_summary
+
+
+class Command(BaseCommand):
+  help = ("Reconstruye la tabla de resumen de análisis desde SkinImage (corrige cualquier desvío "
+          "de las actualizaciones incrementales).")
+
+  def handle(self, *args, **options):
+    started = time.perf_counter()
+    rows = rebuild_summary()
+    self.stdout.write(self.style.SUCCESS(
+      f"Resumen reconstruido: {rows} filas en {time.perf_counter() - started:.1f} s"
+    ))
@@ -1,3 +1,27 @@
+# apps/core/models.py
 from django.db import models
 
-# Create your models here.
+
+class AnalysisSummary(models.Model):
+  """
+  Resumen de los análisis procesados por día, condición y localización.
+  Se actualiza incrementalmente al procesar cada imagen (apps.core.utils.analytics)
+  y se reconstruye con el comando rebuild_analytics.
+  """
+  day = models.DateField()
+  condition = models.CharField(max_length=50, blank=True, default='')
+  anatom_site_general = models.CharField(max_length=50, blank=True, default='')
+  count = models.IntegerField(default=0)
+  confidence_count = models.IntegerField(default=0)
+  confidence_sum = models.FloatField(default=0.0)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(
+        fields=['day', 'condition', 'anatom_site_general'],
+        name='analysissummary_unique_bucket'
+      ),
+    ]
+
+  def __str__(self):
+    return f"{self.day} - {self.condition or 'Sin condición'} ({self.anatom_site_general}): {self.count}"
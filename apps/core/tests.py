@@ -1,3 +1,61 @@
+from types import SimpleNamespace
+
 from django.test import TestCase
 
-# Create your tests here.
+from apps.Dermatologia_IA.models import SkinImage
+from apps.core.models import AnalysisSummary
+from apps.core.utils.analytics import dashboard_stats, rebuild_summary, record_processed, record_rescored
+
+
+class AnalyticsSummaryTest(TestCase):
+  """Resumen incremental de análisis frente a la reconstrucción completa"""
+
+  def _create(self, condition, site, confidence):
+    return SkinImage.objects.create(
+      image='skin_images/a.jpg', age_approx=40, processed=True, condition=condition,
+      anatom_site_general=site, confidence=confidence,
+    )
+
+  def _summary(self):
+    return sorted(
+      AnalysisSummary.objects.filter(count__gt=0)
+      .values_list('day', 'condition', 'anatom_site_general', 'count', 'confidence_count', 'confidence_sum')
+    )
+
+  def test_incremental_updates_match_rebuild(self):
+    images = [
+      self._create('Nevus', 'torso', 90.0),
+      self._create('Nevus', 'torso', 70.0),
+      self._create('Melanoma', 'head/neck', 60.0),
+      self._create(None, 'torso', None),
+    ]
+    record_processed(images[:2])
+    record_processed(images[2:])
+
+    # Cambio de diagnóstico como el que hace el comando rescore
+    previous = SimpleNamespace(
+      uploaded_at=images[1].uploaded_at, anatom_site_general='torso', condition='Nevus', confidence=70.0
+    )
+    images[1].condition, images[1].confidence = 'Melanoma', 80.0
+    images[1].save()
+    record_rescored([(previous, images[1])])
+
+    incremental = self._summary()
+    rebuild_summary()
+    self.assertEqual(incremental, self._summary())
+
+  def test_dashboard_reads_summary(self):
+    record_processed([
+      self._create('Nevus', 'torso', 90.0),
+      self._create('Nevus', 'torso', 70.0),
+      self._create('Melanoma', 'head/neck', 60.0),
+    ])
+    with self.assertNumQueries(3):
+      stats = dashboard_stats(days=7)
+    self.assertEqual(stats['total'], 3)
+    nevus = stats['conditions'][0]
+    self.assertEqual((nevus['key'], nevus['count'], nevus['mean_confidence']), ('Nevus', 2, 80.0))
+    self.assertAlmostEqual(nevus['percent'], 200 / 3)
+    self.assertEqual([row['key'] for row in stats['sites']], ['torso', 'head/neck'])
+    self.assertEqual(len(stats['daily']), 7)
+    self.assertEqual(stats['daily'][-1]['count'], 3)
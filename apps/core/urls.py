@@ -8,7 +8,8 @@ from django.urls import path
 
 from apps.core.views.views import (
   HomeView,
-  CharacteristicsView
+  CharacteristicsView,
+  AnalyticsDashboardView,
 )
 
 app_name = 'core'
@@ -19,4 +20,7 @@ urlpatterns = [
 
   # URLs para información y características
   path('characteristics/', CharacteristicsView.as_view(), name='characteristics'),
+
+  # URL del dashboard de estadísticas
+  path('dashboard/', AnalyticsDashboardView.as_view(), name='dashboard'),
 ]
@@ -0,0 +1,195 @@
+# apps/core/utils/analytics.py
+"""
+Estadísticas de los análisis a partir de la tabla `AnalysisSummary`.
+
+Cada fila acumula, para un día, condición y localización, el número de análisis
+y la suma de confianzas. El pipeline suma la imagen a su fila al marcarla como
+procesada (`record_processed`) y `rescore` mueve las filas cuyo diagnóstico cambia
+(`record_rescored`), de modo que el dashboard agrega como mucho
+días × condiciones × localizaciones filas sin importar cuántas imágenes haya.
+`rebuild_summary` la recalcula desde `SkinImage` (comando rebuild_analytics).
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.core.models import AnalysisSummary
+from apps.Dermatologia_IA.models import SkinImage
+
+DASHBOARD_DAYS = 30
+
+
+def summary_key(skin_image):
+  """Fila del resumen (día local de subida, condición, localización) a la que pertenece una imagen"""
+  uploaded_at = skin_image.uploaded_at or timezone.now()
+  return (
+    timezone.localdate(uploaded_at),
+    skin_image.condition or '',
+    skin_image.anatom_site_general or '',
+  )
+
+
+def _add(deltas, skin_image, sign):
+  key = summary_key(skin_image)
+  deltas[key][0] += sign
+  if skin_image.confidence is not None:
+    deltas[key][1] += sign
+    deltas[key][2] += sign * skin_image.confidence
+
+
+def _apply(deltas):
+  """Suma los incrementos con UPDATE atómicos (crea la fila la primera vez)"""
+  for (day, condition, site), (count, confidence_count, confidence_sum) in deltas.items():
+    if not count and not confidence_count:
+      continue
+    bucket = AnalysisSummary.objects.filter(day=day, condition=condition, anatom_site_general=site)
+    increments = {
+      'count': F('count') + count,
+      'confidence_count': F('confidence_count') + confidence_count,
+      'confidence_sum': F('confidence_sum') + confidence_sum,
+    }
+    if bucket.update(**increments):
+      continue
+    try:
+      with transaction.atomic():
+        AnalysisSummary.objects.create(
+          day=day, condition=condition, anatom_site_general=site,
+          count=count, confidence_count=confidence_count, confidence_sum=confidence_sum,
+        )
+    except IntegrityError:
+      # Otro worker creó la fila entre el UPDATE y el INSERT
+      bucket.update(**increments)
+
+
+def record_processed(skin_images):
+  """Suma al resumen las imágenes recién marcadas como procesadas"""
+  deltas = defaultdict(lambda: [0, 0, 0.0])
+  for skin_image in skin_images:
+    _add(deltas, skin_image, 1)
+  try:
+    _apply(deltas)
+  except Exception as e:
+    # El resumen se puede reconstruir; un fallo aquí no debe perder el análisis
+    print(f"Error al actualizar el resumen de análisis: {e}")
+
+
+def record_rescored(changes):
+  """
+  Mueve en el resumen las imágenes cuyo diagnóstico cambió.
+
+  Args:
+      changes: Pares (valores anteriores, imagen actualizada); los anteriores
+          pueden ser cualquier objeto con condition, confidence, uploaded_at y
+          anatom_site_general.
+  """
+  deltas = defaultdict(lambda: [0, 0, 0.0])
+  for previous, skin_image in changes:
+    _add(deltas, previous, -1)
+    _add(deltas, skin_image, 1)
+  try:
+    _apply(deltas)
+  except Exception as e:
+    print(f"Error al actualizar el resumen de análisis: {e}")
+
+
+def rebuild_summary():
+  """
+  Recalcula el resumen completo desde SkinImage en una transacción.
+
+  Returns:
+      int: Filas del resumen creadas.
+  """
+  rows = (
+    SkinImage.objects
+    .filter(processed=True)
+    .annotate(day=TruncDate('uploaded_at'))
+    .values('day', 'condition', 'anatom_site_general')
+    .annotate(
+      total=Count('id'),
+      with_confidence=Count('id', filter=Q(confidence__isnull=False)),
+      confidence_total=Sum('confidence'),
+    )
+    .order_by()
+  )
+  merged = defaultdict(lambda: [0, 0, 0.0])
+  for row in rows.iterator():
+    # condition nulo y vacío comparten fila en el resumen
+    bucket = merged[(row['day'], row['condition'] or '', row['anatom_site_general'] or '')]
+    bucket[0] += row['total']
+    bucket[1] += row['with_confidence']
+    bucket[2] += row['confidence_total'] or 0.0
+
+  with transaction.atomic():
+    AnalysisSummary.objects.all().delete()
+    AnalysisSummary.objects.bulk_create(
+      [
+        AnalysisSummary(
+          day=day, condition=condition, anatom_site_general=site,
+          count=count, confidence_count=confidence_count, confidence_sum=confidence_sum,
+        )
+        for (day, condition, site), (count, confidence_count, confidence_sum) in merged.items()
+      ],
+      batch_size=1000,
+    )
+  return len(merged)
+
+
+def _grouped(field, labels):
+  """Total, porcentaje y confianza media agrupados por `field`"""
+  rows = (
+    AnalysisSummary.objects
+    .values(field)
+    .annotate(total=Sum('count'), with_confidence=Sum('confidence_count'), confidence_total=Sum('confidence_sum'))
+    .filter(total__gt=0)
+    .order_by('-total')
+  )
+  grand_total = sum(row['total'] for row in rows) or 1
+  return [
+    {
+      'key': row[field],
+      'label': labels.get(row[field], row[field]) or 'Sin dato',
+      'count': row['total'],
+      'percent': 100.0 * row['total'] / grand_total,
+      'mean_confidence': row['confidence_total'] / row['with_confidence'] if row['with_confidence'] else None,
+    }
+    for row in rows
+  ]
+
+
+def dashboard_stats(days=DASHBOARD_DAYS):
+  """
+  Datos del dashboard leídos solo del resumen.
+
+  Returns:
+      dict: Total, distribución por condición y por localización, y volumen diario
+      de los últimos `days` días (con ceros en los días sin análisis).
+  """
+  conditions = _grouped('condition', {'': 'Sin condición'})
+  sites = _grouped('anatom_site_general', dict(SkinImage.ANATOM_SITE_CHOICES))
+
+  today = timezone.localdate()
+  start = today - timedelta(days=days - 1)
+  per_day = Counter(dict(
+    AnalysisSummary.objects
+    .filter(day__gte=start)
+    .values('day')
+    .annotate(total=Sum('count'))
+    .values_list('day', 'total')
+  ))
+  daily = [{'day': start + timedelta(days=i), 'count': per_day.get(start + timedelta(days=i), 0)} for i in range(days)]
+  max_daily = max((entry['count'] for entry in daily), default=0) or 1
+  for entry in daily:
+    entry['percent'] = 100.0 * entry['count'] / max_daily
+
+  return {
+    'total': sum(row['count'] for row in conditions),
+    'conditions': conditions,
+    'sites': sites,
+    'daily': daily,
+    'days': days,
+  }
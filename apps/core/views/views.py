@@ -10,6 +10,7 @@ from django.db.models import QuerySet
 
 from apps.Dermatologia_IA.models import SkinImage
 from apps.auth.views.view_auth import CustomLoginRequiredMixin
+from apps.core.utils.analytics import dashboard_stats
 
 
 class HomeView(CustomLoginRequiredMixin, TemplateView):
@@ -131,3 +132,23 @@ class CharacteristicsView(CustomLoginRequiredMixin, TemplateView):
       ]
     })
     return context
+
+
+class AnalyticsDashboardView(CustomLoginRequiredMixin, TemplateView):
+  """
+  Vista del dashboard de estadísticas.
+  Lee solo la tabla de resumen, por lo que su costo no depende del número de imágenes.
+  """
+  template_name = "core/dashboard.html"
+
+  def get_context_data(self, **kwargs) -> dict:
+    """
+    Prepara el contexto con la distribución por condición y localización y el
+    volumen diario reciente.
+    """
+    context = super().get_context_data(**kwargs)
+    context.update({
+      'current_page': 'dashboard',
+      'stats': dashboard_stats(),
+    })
+    return context